@@ -1,12 +1,13 @@
 from PyQt6.QtCore import QTimer
 from PyQt6.QtGui import QPalette
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QMessageBox, QTableWidget, QHeaderView, QComboBox
-from datetime import datetime
 from decimal import Decimal, InvalidOperation
 import uuid
 
-from constants import red, green, light_gray
+from constants import light_gray
 from custom_double_validator import CustomDoubleValidator
+from side_color_delegate import side_color
+from core import Trade, day_ordinal
 
 
 class AddTradeDialog(QDialog):
@@ -128,15 +129,14 @@ class AddTradeDialog(QDialog):
 
     def update_row_color(self, table, row, text):
         """
-        Updates the background color of the row based on the text value ('Buy' or 'Sell').
+        Updates the background color of the row based on the text value ('Buy' or 'Sell'). A single palette is made for the row and shared by its widgets.
         """
-        color = green if text == 'Buy' else red if text == 'Sell' else light_gray
+        palette = table.palette()
+        palette.setColor(QPalette.ColorRole.Base, side_color(text, light_gray))
 
         for col in range(1, 7):
             widget = table.cellWidget(row, col)
             if widget is not None:
-                palette = widget.palette()
-                palette.setColor(QPalette.ColorRole.Base, color)
                 widget.setPalette(palette)
 
     def validate_and_save_trade(self):
@@ -160,8 +160,8 @@ class AddTradeDialog(QDialog):
 
                 # Third column (2) is "Date", and it's a line edit widget
                 date_cell_widget = self.table.cellWidget(row, 3)
-                date = date_cell_widget.text()
-                datetime.strptime(date.replace(" ", ""), '%Y-%m-%d')  # Validates date format
+                date = date_cell_widget.text().replace(" ", "")
+                day_ordinal(date)  # Validates date format, and caches its ordinal for the positions engine
 
                 # For "Quantity" and "Price", they are line edit widgets
                 quantity_cell_widget = self.table.cellWidget(row, 4)
@@ -176,7 +176,7 @@ class AddTradeDialog(QDialog):
                 except InvalidOperation:
                     raise ValueError("Invalid price")
 
-                self.new_data.append([trade_id, pair, side, date, quantity, price])
+                self.new_data.append(Trade(trade_id, pair, side, date, quantity, price))
 
             self.accept()  # Close the dialog successfully
         except ValueError as e:
@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from decimal import Decimal
+
+# The GUI parts are timed without showing any window, unless another Qt platform is asked for
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication, QMessageBox
+from PyQt6.QtCore import Qt, QEventLoop, PYQT_VERSION_STR, QT_VERSION_STR
+
+from core import TradeStore, write_data_file, generate_trades
+from core.vectorized_positions import batch_available
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [1000, 100000, 1000000]
+BENCHMARK_RESULTS_VERSION = 1
+
+
+def parse_arguments(arguments=None):
+    """
+    Parses the command line arguments of the benchmark suite.
+    """
+    parser = argparse.ArgumentParser(description="Times loading, processing, refreshing, sorting, filtering and saving synthetic portfolios of increasing sizes, and writes the results as JSON.")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="numbers of trades to benchmark, defaults to 1000 100000 1000000")
+    parser.add_argument('-p', '--pairs', type=int, default=20, help="number of pairs of the synthetic portfolios, defaults to 20")
+    parser.add_argument('--sell-ratio', type=float, default=0.3, help="share of sells among the trades, defaults to 0.3")
+    parser.add_argument('--start-date', default='2020-01-01', help="date of the first trades, defaults to 2020-01-01")
+    parser.add_argument('--end-date', default='2024-12-31', help="date of the last trades, defaults to 2024-12-31")
+    parser.add_argument('--changes', type=float, default=0.01, help="share of trades added, edited or deleted before processing the change log, defaults to 0.01")
+    parser.add_argument('--format', choices=('ctt', 'sqlite'), default='ctt', help="data file format to load and save, defaults to ctt")
+    parser.add_argument('-r', '--repeat', type=int, default=1, help="number of runs per size, the fastest one is reported, defaults to 1")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic portfolios, defaults to 0")
+    parser.add_argument('-o', '--output', help="write the results to this file instead of the standard output")
+    return parser.parse_args(arguments)
+
+
+def raise_error(parent, title, text, *args):
+    """
+    Replaces the error message boxes of the main window, which would wait forever for a click on the offscreen platform, so that errors stop the benchmark instead.
+    """
+    raise RuntimeError(text)
+
+
+class Timer:
+    def __init__(self):
+        """
+        Initializes an empty set of timings, each operation keeping the duration of every run in seconds.
+        """
+        self.timings = {}
+
+    def __call__(self, name, function, *args):
+        """
+        Runs a function, records its duration under the given name and returns its result.
+        """
+        start = time.perf_counter()
+        result = function(*args)
+        self.timings.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+
+def load_data(app, window, file_path):
+    """
+    Loads a data file into the window and waits for the background loader to finish, so the duration includes reading the file and refreshing the tables.
+    """
+    window.load_data(file_path)
+    while window.data_file_loader is not None:
+        app.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents)
+
+
+def record_changes(window, change_count, seed):
+    """
+    Records a mix of added, edited and deleted trades in the window's change log, without processing them.
+    """
+    generator = random.Random(seed)
+    trades = list(window.full_history_data)
+    touched = generator.sample(trades, min(len(trades), 2 * (change_count // 3)))
+    edited, deleted = touched[:len(touched) // 2], touched[len(touched) // 2:]
+
+    for trade in edited:
+        window.change_log.add(window.file_path, 'edit', trade, trade.replace(price=(trade.price * Decimal('1.01')).quantize(Decimal('1E-8'))))
+    for trade in deleted:
+        window.change_log.add(window.file_path, 'delete', trade, None)
+    for trade in generate_trades(change_count - len(touched), seed=seed + 1):
+        window.change_log.add(window.file_path, 'add', None, trade)
+
+
+def run(app, arguments, trade_count, run_index, directory):
+    """
+    Runs every benchmarked operation once on a synthetic portfolio of the given size, with a new main window started from an empty directory, and returns the timer.
+    """
+    from main import MainWindow
+
+    # Each window gets its own settings and change logs, so it doesn't reopen the file of the previous run
+    directory = os.path.join(directory, f"{trade_count}_{run_index}")
+    os.mkdir(directory)
+    os.chdir(directory)
+
+    timer = Timer()
+    seed = arguments.seed + run_index
+    trades = timer('generate', generate_trades, trade_count, arguments.pairs, arguments.sell_ratio, arguments.start_date, arguments.end_date, seed)
+
+    file_path = os.path.join(directory, f"benchmark_{trade_count}_{run_index}.{arguments.format}").replace(os.sep, '/')
+    saved_path = os.path.join(directory, f"benchmark_{trade_count}_{run_index}_saved.{arguments.format}").replace(os.sep, '/')
+    timer('write', write_data_file, file_path, TradeStore(trades))
+    del trades
+
+    window = MainWindow()
+    try:
+        timer('load_data', load_data, app, window, file_path)
+
+        record_changes(window, max(1, int(trade_count * arguments.changes)), seed)
+        processed = timer('change_log_process', window.change_log.process, window.file_path, window.full_history_data)
+
+        # Refreshing after changes only touches the changed rows and pairs
+        timer('update_history', window.update_history, processed)
+        timer('update_positions', window.update_positions, processed)
+
+        # Refreshing from scratch, as after opening a file
+        window.history_model.set_trades([])
+        timer('update_history_full', window.update_history, processed)
+        window.reset_positions()
+        timer('update_positions_full', window.update_positions, processed)
+
+        # Sorting on a new column, then reversing it
+        timer('sort_history', window.history_table.sortByColumn, 4, Qt.SortOrder.AscendingOrder)
+        timer('sort_history_reversed', window.history_table.sortByColumn, 4, Qt.SortOrder.DescendingOrder)
+
+        timer('filter_table', window.filter_table, window.positions_table, 'USDT', True)
+        timer('filter_history', window.history_proxy_model.set_filter_text, 'BTC', False)
+        window.history_proxy_model.set_filter_text('', False)
+
+        timer('save_data', window.save_data, saved_path)
+    finally:
+        # The change log is compacted in the background after saving, and is relative to the current directory
+        window.change_log.journal.wait()
+        # Closing would ask about unsaved changes if a step failed, the window is only destroyed
+        window.deleteLater()
+        app.processEvents()
+
+    return timer
+
+
+def git_revision():
+    """
+    Returns the commit the benchmarked code was checked out from, or None outside of a git repository.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SOURCE_DIRECTORY, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(arguments=None):
+    """
+    Runs the benchmark suite and returns the process exit code. Results are machine-readable JSON: the environment, the parameters, then for each size the duration of every run and the fastest one, in seconds.
+    """
+    arguments = parse_arguments(arguments)
+    # main.py is imported from here, so the benchmark works from any directory
+    sys.path.insert(0, SOURCE_DIRECTORY)
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    QMessageBox.critical = raise_error
+
+    results = []
+    working_directory = os.getcwd()
+    # Settings and change logs are written to the current directory, keep them away from the user's
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            for trade_count in arguments.sizes:
+                timings = {}
+                for run_index in range(arguments.repeat):
+                    for name, durations in run(app, arguments, trade_count, run_index, directory).timings.items():
+                        timings.setdefault(name, []).extend(durations)
+                results.append({
+                    'trades': trade_count,
+                    'timings': {name: {'best': min(durations), 'runs': durations} for name, durations in timings.items()},
+                })
+                print(f"{trade_count} trades: " + ', '.join(f"{name} {min(durations):.3f}s" for name, durations in timings.items()), file=sys.stderr)
+        finally:
+            os.chdir(working_directory)
+
+    report = {
+        'version': BENCHMARK_RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'numpy': batch_available(),
+        },
+        'parameters': {key: value for key, value in vars(arguments).items() if key != 'output'},
+        'results': results,
+    }
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=2)
+            output.write('\n')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
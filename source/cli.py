@@ -0,0 +1,106 @@
+import os
+import sys
+import csv
+import json
+import argparse
+
+from core import ChangeLog, PositionsEngine, ARITHMETICS, read_data_file
+
+POSITIONS_HEADERS = ['Pair', 'Quantity', 'Average Price', 'Value', 'PnL']
+OUTPUT_FORMATS = ('table', 'csv', 'json')
+
+
+def parse_arguments(arguments=None):
+    """
+    Parses the command line arguments of the positions report.
+    """
+    parser = argparse.ArgumentParser(description="Prints the positions of a Crypto Trades Tracker data file, without starting the GUI.")
+    parser.add_argument('file', help="data file to report on (.ctt, .json or SQLite)")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='table', help="output format, defaults to table")
+    parser.add_argument('-o', '--output', help="write the report to this file instead of the standard output")
+    parser.add_argument('-p', '--pair', action='append', help="only report this pair, can be repeated")
+    parser.add_argument('--hide-closed', action='store_true', help="leave out closed positions")
+    parser.add_argument('--pending', action='store_true', help="include the unsaved changes recorded in the change log of the current directory")
+    parser.add_argument('--arithmetic', choices=ARITHMETICS, default='fixed', help="integer arithmetic, Decimal, or both checked against each other, defaults to fixed")
+    return parser.parse_args(arguments)
+
+
+def load_positions(file_path, pending=False, arithmetic='fixed'):
+    """
+    Reads a data file and returns its positions as [pair, quantity, average price, value, pnl] rows sorted by pair. If pending is True, the unsaved changes recorded in the change log are applied first, without modifying the change log.
+    """
+    history_data = read_data_file(file_path)
+    if pending:
+        change_log = ChangeLog()
+        change_log.load(file_path)
+        history_data = change_log.apply_pending(history_data)
+
+    engine = PositionsEngine(arithmetic)
+    engine.sync(history_data)
+    return [[pair, *values] for pair, values in sorted(engine.positions().items())]
+
+
+def write_table(rows, output):
+    """
+    Writes the positions as a plain text table, with right-aligned numbers.
+    """
+    rows = [POSITIONS_HEADERS] + [[str(value) for value in row] for row in rows]
+    widths = [max(len(row[col]) for row in rows) for col in range(len(POSITIONS_HEADERS))]
+    for row in rows:
+        cells = [row[0].ljust(widths[0])] + [value.rjust(width) for value, width in zip(row[1:], widths[1:])]
+        output.write('  '.join(cells).rstrip() + '\n')
+
+
+def write_csv(rows, output):
+    """
+    Writes the positions as CSV, with a header row.
+    """
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(POSITIONS_HEADERS)
+    writer.writerows([[str(value) for value in row] for row in rows])
+
+
+def write_json(rows, output):
+    """
+    Writes the positions as a JSON list of objects, numbers as strings so no precision is lost, and null for closed positions.
+    """
+    keys = ['pair', 'quantity', 'average_price', 'value', 'pnl']
+    positions = [{key: None if value == '-' else str(value) for key, value in zip(keys, row)} for row in rows]
+    json.dump(positions, output, indent=2)
+    output.write('\n')
+
+
+def main(arguments=None):
+    """
+    Runs the positions report and returns the process exit code.
+    """
+    arguments = parse_arguments(arguments)
+    # The change log is keyed by the paths of Qt file dialogs, which use forward slashes
+    file_path = os.path.abspath(arguments.file).replace(os.sep, '/')
+
+    try:
+        rows = load_positions(file_path, arguments.pending, arguments.arithmetic)
+    except FileNotFoundError:
+        print(f"File not found: {file_path}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error loading file: {e}", file=sys.stderr)
+        return 1
+
+    if arguments.pair:
+        pairs = {pair.upper() for pair in arguments.pair}
+        rows = [row for row in rows if row[0].upper() in pairs]
+    if arguments.hide_closed:
+        rows = [row for row in rows if row[1] != '-']
+
+    writers = {'table': write_table, 'csv': write_csv, 'json': write_json}
+    if arguments.output:
+        with open(arguments.output, 'w', newline='') as output:
+            writers[arguments.format](rows, output)
+    else:
+        writers[arguments.format](rows, sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,8 +2,12 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QPushButton, QHBoxLayout, QTableWidget, QTableWidgetItem, QLabel, QHeaderView
 from decimal_table_widget_item import DecimalTableWidgetItem
+from side_color_delegate import SideColorDelegate
 
-from constants import red, green, light_gray
+from constants import light_gray
+
+# Trades of a batch change shown in each table of the dialog, larger batches only show their first ones
+CONFIRM_BATCH_ROWS = 100
 
 
 class ConfirmChangeDialog(QDialog):
@@ -23,7 +27,11 @@ class ConfirmChangeDialog(QDialog):
         layout = QVBoxLayout(self)
 
         # Header
-        header_label = QLabel(f"{change_string.capitalize()} {change_type.capitalize()}")
+        header_text = f"{change_string.capitalize()} {change_type.capitalize()}"
+        batch_changes = change_data.get("changes", [])
+        if change_type == "batch":
+            header_text += f" of {len(batch_changes)} changes"
+        header_label = QLabel(header_text)
         header_font = header_label.font()
         header_font.setBold(True)
         header_label.setFont(header_font)
@@ -31,15 +39,22 @@ class ConfirmChangeDialog(QDialog):
         layout.addWidget(header_label)
 
         # Tables to show change details
-        if change_type == "add" and new_data:
+        table1 = table2 = None
+        if change_type == "batch" and batch_changes:
+            # Trades before the batch, edited or deleted, then after it, added or edited
+            original_trades = [change["original_data"] for change in batch_changes if change["original_data"]]
+            new_trades = [change["new_data"] for change in batch_changes if change["new_data"]]
+            table1 = self.create_table(original_trades[:CONFIRM_BATCH_ROWS] or None)
+            table2 = self.create_table(new_trades[:CONFIRM_BATCH_ROWS] or None)
+        elif change_type == "add" and new_data:
             table1 = self.create_table(None)
-            table2 = self.create_table(new_data[1:])
+            table2 = self.create_table(new_data)
         elif change_type == "delete" and original_data:
-            table1 = self.create_table(original_data[1:])
+            table1 = self.create_table(original_data)
             table2 = self.create_table(None)
         elif change_type == "edit" and original_data and new_data:
-            table1 = self.create_table(original_data[1:])
-            table2 = self.create_table(new_data[1:])
+            table1 = self.create_table(original_data)
+            table2 = self.create_table(new_data)
 
         if table1:
             layout.addWidget(table1)
@@ -67,36 +82,34 @@ class ConfirmChangeDialog(QDialog):
 
         layout.addLayout(btn_layout)
 
-    def create_table(self, change_data):
+    def create_table(self, trade):
         """
-        Creates a table widget to display change details in the confirmation dialog.
+        Creates a table widget to display a trade of the change in the confirmation dialog, or an empty row if trade is None. A list of trades, from a batch change, is shown one trade per row and can be scrolled.
         """
-        table = QTableWidget(1, 5)  # Single row, 5 columns
+        trades = trade if isinstance(trade, list) else [trade]
+        table = QTableWidget(len(trades), 5)  # One row per trade, 5 columns
         table.setHorizontalHeaderLabels(["Pair", "Side", "Date", "Quantity", "Price"])
         table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         table.verticalHeader().setVisible(False)
-        table.setEnabled(False)
-
-        if change_data:
-            row_color = green if change_data[1] == 'Buy' else red if change_data[1] == 'Sell' else None
+        # Rows are colored by side when painted, the empty row in light gray
+        table.setItemDelegate(SideColorDelegate(1, light_gray, table))
+        if len(trades) == 1:
+            table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            table.setEnabled(False)
+        else:
+            table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
 
-            for i, value in enumerate(change_data, start=0):
-                if i in [4, 5]:
-                    item = DecimalTableWidgetItem(str(value))
-                    table.setItem(0, i, DecimalTableWidgetItem(str(value)))
-                else:
-                    item = QTableWidgetItem(str(value))
+        if trade:
+            for row, trade in enumerate(trades):
+                change_data = [trade.pair, trade.side, trade.date, trade.quantity, trade.price]
 
-                if row_color:
-                    item.setBackground(row_color)
+                for i, value in enumerate(change_data, start=0):
+                    if i in [4, 5]:
+                        item = DecimalTableWidgetItem(str(value))
+                    else:
+                        item = QTableWidgetItem(str(value))
 
-                table.setItem(0, i, item)
-        else:
-            for col in range(table.columnCount()):
-                item = QTableWidgetItem()
-                item.setBackground(light_gray)
-                table.setItem(0, col, item)
+                    table.setItem(row, i, item)
 
         return table
 
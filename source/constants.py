@@ -1,5 +1,9 @@
+from decimal import Decimal
 from PyQt6.QtGui import QColor
 
 green = QColor(0, 196, 0, 32)
 red = QColor(196, 0, 0, 32)
 light_gray = QColor(211, 211, 211, 32)
+
+# Set the desired precision: 8 decimal places
+decimal_places = Decimal('1E-8')
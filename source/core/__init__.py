@@ -0,0 +1,17 @@
+"""
+Qt-free core of Crypto Trades Tracker: the trade store, the positions engine, the change log and the data file formats. Nothing in this package imports PyQt, so it can be used from scripts and the command line without starting the GUI.
+"""
+from core.trade import Trade, BUY, SELL
+from core.trade_store import TradeStore
+from core.trade_overlay import TradeOverlay
+from core.positions_engine import PositionsEngine, PositionsMismatch, ARITHMETICS
+from core.day_ordinals import day_ordinal
+from core.change_log import ChangeLog
+from core.decimal_encoder import DecimalEncoder
+from core.data_file import read_data_file, write_data_file, write_json_data_file, is_sqlite_file, LoadCancelled, DataFileVersionError
+from core.sqlite_data_file import SQLiteDataFile
+from core.synthetic_portfolio import generate_trades
+from core.instrumentation import Instrumentation, INSTRUMENTATION
+from core.csv_importer import read_csv_file, load_csv_layouts, CSVImportError, CSV_LAYOUTS
+from core.filter_index import FilterIndex, FilterCancelled, filter_rows
+from core.sort_keys import decimal_sort_key, decimal_sort_keys, sort_order
@@ -0,0 +1,203 @@
+import re
+import sys
+import mmap
+import struct
+from array import array
+from decimal import Decimal
+
+from core.compression import open_compressed
+from core.day_ordinals import day_ordinal, day_string
+from core.trade import Trade, BUY, SELL
+
+BINARY_MAGIC = b'CTTB'
+BINARY_DATA_FILE_VERSION = 2
+
+# Magic, version, reserved, number of trades, number of pairs
+HEADER = struct.Struct('<4sHHII')
+PAIR_LENGTH = struct.Struct('<H')
+
+# Quantities and prices are stored as integers of 1e-8 units, matching decimal_places
+SCALE_DIGITS = 8
+SCALE = 10 ** SCALE_DIGITS
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# Side bits, 1 for buys
+SIDES = (SELL, BUY)
+
+# Trade IDs stored as 16 bytes, others can only be written to JSON since the reader rebuilds IDs in this form
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z')
+
+
+class BinaryFormatUnsupported(ValueError):
+    pass
+
+
+def scale(value):
+    """
+    Converts a Decimal to an integer number of 1e-8 units, raising BinaryFormatUnsupported if it has more than 8 decimals or doesn't fit in 64 bits.
+    """
+    scaled = Decimal(value).scaleb(SCALE_DIGITS)
+    if scaled != scaled.to_integral_value():
+        raise BinaryFormatUnsupported(f"{value} has more than {SCALE_DIGITS} decimals")
+    scaled = int(scaled)
+    if not INT64_MIN <= scaled <= INT64_MAX:
+        raise BinaryFormatUnsupported(f"{value} is too large for the binary format")
+    return scaled
+
+
+def unscale(scaled):
+    """
+    Converts an integer number of 1e-8 units back to a Decimal, without trailing zeros.
+    """
+    if scaled % SCALE == 0:
+        return Decimal(scaled // SCALE)
+    return Decimal(scaled).scaleb(-SCALE_DIGITS).normalize()
+
+
+def padding(offset):
+    """
+    Returns the number of bytes needed to align an offset on 8 bytes.
+    """
+    return -offset % 8
+
+
+def read_column(read, typecode, count):
+    """
+    Reads a little-endian column of count integers through read(size), which returns the next size bytes of the file, and skips its alignment padding. Returns the column as an array.
+    """
+    column = array(typecode)
+    data = read(column.itemsize * count)
+    column.frombytes(data)
+    read(padding(len(data)))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def write_column(file, column):
+    """
+    Writes a column of integers in little-endian order, followed by its alignment padding.
+    """
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    data = column.tobytes()
+    file.write(data)
+    file.write(bytes(padding(len(data))))
+
+
+def is_binary_data_file(file):
+    """
+    Returns True if the file, opened in binary mode, starts with the binary format's magic bytes, leaving it positioned at the start.
+    """
+    magic = file.read(len(BINARY_MAGIC))
+    file.seek(0)
+    return magic == BINARY_MAGIC
+
+
+class BinaryDataFileReader:
+    def __init__(self, file, stream=False):
+        """
+        Initializes a reader over a binary data file opened in binary mode. The file is memory-mapped, or read front to back if stream is True, as decompressed files are, and each column is read in one go, rows are only rebuilt while iterating.
+        """
+        if stream:
+            self.read_columns(file.read)
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            offset = 0
+
+            def read(size):
+                nonlocal offset
+                offset += size
+                return buffer[offset - size:offset]
+
+            self.read_columns(read)
+
+    def read_columns(self, read):
+        """
+        Reads the header, the pair dictionary and the columns in the order they are stored, through read(size), which returns the next size bytes of the file.
+        """
+        _, version, _, self.count, pair_count = HEADER.unpack(read(HEADER.size))
+        self.version = str(version)
+        offset = HEADER.size
+
+        # Pair dictionary
+        self.pairs = []
+        for _ in range(pair_count):
+            length, = PAIR_LENGTH.unpack(read(PAIR_LENGTH.size))
+            self.pairs.append(read(length).decode('utf-8'))
+            offset += PAIR_LENGTH.size + length
+        read(padding(offset))
+
+        # Columns
+        self.uuids = read(16 * self.count)
+        read(padding(len(self.uuids)))
+        self.pair_column = read_column(read, 'I', self.count)
+        self.sides = read((self.count + 7) // 8)
+        read(padding(len(self.sides)))
+        self.date_column = read_column(read, 'i', self.count)
+        self.quantity_column = read_column(read, 'q', self.count)
+        self.price_column = read_column(read, 'q', self.count)
+
+    def rows(self):
+        """
+        Returns an iterator over the trades. Each column is decoded in one pass, then the columns are zipped into trades.
+        """
+        hex_uuids = self.uuids.hex()
+        trade_ids = [f"{hex_uuids[i:i + 8]}-{hex_uuids[i + 8:i + 12]}-{hex_uuids[i + 12:i + 16]}-{hex_uuids[i + 16:i + 20]}-{hex_uuids[i + 20:i + 32]}" for i in range(0, 32 * self.count, 32)]
+        pairs = [self.pairs[index] for index in self.pair_column]
+        sides = [SIDES[(self.sides[i >> 3] >> (i & 7)) & 1] for i in range(self.count)]
+        # Many trades share a date, only convert each day once
+        days = {}
+        dates = [days.get(ordinal) or days.setdefault(ordinal, day_string(ordinal)) for ordinal in self.date_column]
+        quantities = map(unscale, self.quantity_column)
+        prices = map(unscale, self.price_column)
+        return map(Trade.from_canonical, trade_ids, pairs, sides, dates, quantities, prices)
+
+
+def write_binary_data_file(file_path, trades, compression=None):
+    """
+    Writes trades to a binary data file, column by column: UUIDs as 16 bytes, pairs as indexes into a dictionary, sides as bits, dates as day ordinals, and quantities and prices as 64-bit integers of 1e-8 units. The file is compressed as it is written if a compression is given. Raises BinaryFormatUnsupported before the file is opened if a trade ID isn't a lowercase UUID, a date isn't valid or an amount doesn't fit.
+    """
+    pairs = {}
+    uuids = bytearray()
+    pair_column = array('I')
+    sides = bytearray()
+    date_column = array('i')
+    quantity_column = array('q')
+    price_column = array('q')
+
+    for i, (trade_id, pair, side, trade_date, quantity, price) in enumerate(trades):
+        if not UUID_PATTERN.match(trade_id):
+            raise BinaryFormatUnsupported(f"{trade_id} is not a lowercase UUID")
+        uuids += bytes.fromhex(trade_id.replace('-', ''))
+        pair_column.append(pairs.setdefault(pair, len(pairs)))
+        if i & 7 == 0:
+            sides.append(0)
+        if side == BUY:
+            sides[-1] |= 1 << (i & 7)
+        try:
+            date_column.append(day_ordinal(trade_date))
+        except ValueError:
+            raise BinaryFormatUnsupported(f"{trade_date} is not a valid date")
+        quantity_column.append(scale(quantity))
+        price_column.append(scale(price))
+
+    with open_compressed(file_path, 'wb', compression) as file:
+        file.write(HEADER.pack(BINARY_MAGIC, BINARY_DATA_FILE_VERSION, 0, len(pair_column), len(pairs)))
+        offset = HEADER.size
+        for pair in pairs:
+            encoded = pair.encode('utf-8')
+            file.write(PAIR_LENGTH.pack(len(encoded)) + encoded)
+            offset += PAIR_LENGTH.size + len(encoded)
+        file.write(bytes(padding(offset)))
+
+        file.write(uuids)
+        file.write(bytes(padding(len(uuids))))
+        write_column(file, pair_column)
+        file.write(sides)
+        file.write(bytes(padding(len(sides))))
+        write_column(file, date_column)
+        write_column(file, quantity_column)
+        write_column(file, price_column)
@@ -0,0 +1,430 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from decimal import Decimal
+from core.decimal_encoder import DecimalEncoder
+from core.instrumentation import INSTRUMENTATION
+from core.trade import Trade
+
+# Every data file has its own change log file and journal in this directory, named after a hash of its path
+CHANGE_LOG_DIRECTORY = 'ctt_change_logs'
+CHANGE_LOG_VERSION = '3'
+
+# Single change log file and journal shared by every data file, up to version 2, migrated on the first write
+LEGACY_CHANGE_LOG_FILE = 'ctt_change_log.json'
+LEGACY_CHANGE_LOG_JOURNAL_FILE = 'ctt_change_log.jsonl'
+
+# Compact a journal into its change log file once it grows past this size, in bytes
+CHANGE_LOG_COMPACT_SIZE = 1024 * 1024
+
+# Change logs of data files that no longer exist are removed once they weren't written for this many days
+CHANGE_LOG_ORPHAN_DAYS = 30
+
+# Default number of saved changes that can still be undone, older ones are pruned
+CHANGE_LOG_HISTORY_SIZE = 10
+
+
+def apply_record(changes, record):
+    """
+    Applies a single journal record to a list of changes and returns the resulting list. This is the only place where the change log state is modified, so replaying the journal rebuilds exactly what was in memory.
+    """
+    op = record['op']
+
+    if op == 'snapshot':
+        changes = record['changes']
+    elif op == 'add':
+        # Undone changes can't be redone anymore, those already saved to the data file are kept reverted by their inverse
+        reverted = [inverse_change(change) for change in changes if change['undone'] and change['applied']]
+        changes = [change for change in changes if not change['undone']]
+        changes.extend(reversed(reverted))
+        changes.append(record['change'])
+    elif op == 'undo':
+        # Mark the last change that has not been undone as undone
+        for change in reversed(changes):
+            if not change.get('undone', False):
+                change['undone'] = True
+                break
+    elif op == 'redo':
+        # Mark the first change that has been undone as not undone
+        for change in changes:
+            if change.get('undone', True):
+                change['undone'] = False
+                break
+    elif op == 'clear':
+        # Back to the data file: unsaved changes are undone, saved changes that were undone are redone
+        for change in changes:
+            change['undone'] = not change.get('applied', False)
+    elif op == 'process':
+        changes = process_flags(changes, record['change_applied'], record.get('history_size', CHANGE_LOG_HISTORY_SIZE))[0]
+
+    return changes
+
+
+def process_flags(changes, change_applied, history_size=CHANGE_LOG_HISTORY_SIZE):
+    """
+    Updates the applied flags of the changes after they were processed, then prunes them to keep only the last history_size applied ones and all the others, in order. Returns the new list and whether anything changed.
+    """
+    applied_changes = []
+    modified = False
+
+    for change in changes:
+        # Not applied and not undone -> applied
+        if not change['applied'] and not change['undone']:
+            modified = modified or change['applied'] != change_applied
+            change['applied'] = change_applied
+
+        # Applied and undone -> unapply, once the data file was written without it
+        elif change['applied'] and change['undone'] and change_applied:
+            change['applied'] = False
+            modified = True
+
+        # Applied and not undone -> pruning
+        if change['applied'] and not change['undone']:
+            applied_changes.append(change)
+
+        # Not applied and undone -> do nothing
+
+    # Prune to keep only the last applied changes, maintaining all other changes
+    if len(applied_changes) <= history_size:
+        return changes, modified
+    pruned = {id(change) for change in applied_changes[:len(applied_changes) - history_size]}
+    return [change for change in changes if id(change) not in pruned], True
+
+
+def inverse_change(change):
+    """
+    Returns a new, unapplied change reverting the given one: an add becomes a delete, a delete an add, an edit swaps its trades, and a batch holds the inverses of its changes in reverse order.
+    """
+    inverse = {
+        'change_type': {'add': 'delete', 'delete': 'add'}.get(change['change_type'], change['change_type']),
+        'original_data': change['new_data'],
+        'new_data': change['original_data'],
+    }
+    if change['change_type'] == 'batch':
+        inverse['changes'] = [inverse_change(batch_change) for batch_change in reversed(change['changes'])]
+    if 'applied' in change:
+        inverse['applied'] = False
+        inverse['undone'] = False
+    return inverse
+
+
+def expand_changes(changes):
+    """
+    Returns the given changes with batch changes replaced by the changes they hold.
+    """
+    expanded = []
+    for change in changes:
+        if change['change_type'] == 'batch':
+            expanded.extend(change['changes'])
+        else:
+            expanded.append(change)
+    return expanded
+
+
+def convert_change(change):
+    """
+    Converts a change's trades from the lists stored in JSON back to trades, with quantity and price as Decimal, including the changes held by a batch change.
+    """
+    for key in ('new_data', 'original_data'):
+        if key in change and change[key] is not None:
+            trade_id, pair, side, date, quantity, price = change[key]
+            change[key] = Trade(trade_id, pair, side, date, Decimal(quantity), Decimal(price))
+    for batch_change in change.get('changes', ()):
+        convert_change(batch_change)
+    return change
+
+
+class ChangeJournal:
+    def __init__(self, fsync=False, compact_size=CHANGE_LOG_COMPACT_SIZE, directory=CHANGE_LOG_DIRECTORY):
+        """
+        Initializes the journal. Each data file has its own change log: every modification is appended to its JSON lines journal as one record, and records are folded into its change log file by a background compaction, so writes never touch the changes of other data files. If fsync is True, every append is flushed to disk before returning.
+        """
+        self.fsync = fsync
+        self.compact_size = compact_size
+        self.directory = directory
+        self.sequences = {}
+        # When both are needed, compact_lock is always taken before append_lock
+        self.append_lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+        self.compaction = None
+
+    def log_file(self, file_path):
+        """
+        Returns the path of the change log file of a data file, named after a hash of the data file path so that any path maps to a valid and stable file name. Unsaved data, without a path, has its own change log too.
+        """
+        name = hashlib.sha256((file_path or '').encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, name + '.json')
+
+    def journal_file(self, file_path):
+        """
+        Returns the path of the journal of a data file.
+        """
+        return self.log_file(file_path) + 'l'
+
+    def compacting_file(self, file_path):
+        """
+        Returns the path of the file holding the records of a data file being folded by a compaction.
+        """
+        return self.journal_file(file_path) + '.compacting'
+
+    def load(self, file_path):
+        """
+        Returns the changes of the given file path, read from its change log file and replayed from the journal records that weren't compacted yet. Change logs that weren't migrated yet are read from the legacy file, without modifying it.
+        """
+        with self.compact_lock:
+            if self.legacy_exists():
+                return self.read_legacy().get(file_path, [])
+
+            changes, sequence = self.read_snapshot(self.log_file(file_path))
+            self.sequences[file_path] = sequence
+
+            for path in (self.compacting_file(file_path), self.journal_file(file_path)):
+                for record in self.read_records(path):
+                    self.sequences[file_path] = max(self.sequences[file_path], record['sequence'])
+                    if record['sequence'] > sequence:
+                        changes = apply_record(changes, self.convert_record(record))
+
+        return changes
+
+    def append(self, file_path, record):
+        """
+        Appends a record to the journal of the given file path, and starts a background compaction if the journal grew past its size threshold. The cost only depends on the size of the record.
+        """
+        if self.legacy_exists():
+            self.migrate()
+
+        # Read before taking append_lock, compactions take compact_lock first and then append_lock
+        last_sequence = None if file_path in self.sequences else self.last_sequence(file_path)
+
+        with INSTRUMENTATION.stage('write_changes', op=record['op']), self.append_lock:
+            if file_path not in self.sequences:
+                self.sequences[file_path] = last_sequence
+            self.sequences[file_path] += 1
+            line = json.dumps({'sequence': self.sequences[file_path], 'file': file_path, **record}, cls=DecimalEncoder)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.journal_file(file_path), 'a') as f:
+                f.write(line + '\n')
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                size = f.tell()
+        INSTRUMENTATION.count('journal_records')
+        INSTRUMENTATION.count('journal_bytes', len(line) + 1)
+
+        if size >= self.compact_size:
+            self.compact(file_path)
+
+    def last_sequence(self, file_path):
+        """
+        Returns the sequence number of the last record written for a data file, compacted or not, for appends to a change log that wasn't loaded.
+        """
+        with self.compact_lock:
+            sequence = self.read_snapshot(self.log_file(file_path))[1]
+            for path in (self.compacting_file(file_path), self.journal_file(file_path)):
+                for record in self.read_records(path):
+                    sequence = max(sequence, record['sequence'])
+        return sequence
+
+    def compact(self, file_path, background=True):
+        """
+        Folds the journal records of a data file into its change log file, on a background thread unless background is False. Does nothing if a compaction is already running.
+        """
+        if self.compaction is not None and self.compaction.is_alive():
+            return
+
+        if background:
+            self.compaction = threading.Thread(target=self.run_compaction, args=(file_path,), daemon=True)
+            self.compaction.start()
+        else:
+            self.run_compaction(file_path)
+
+    def wait(self):
+        """
+        Waits for a running background compaction to finish.
+        """
+        if self.compaction is not None:
+            self.compaction.join()
+
+    def run_compaction(self, file_path):
+        """
+        Moves the journal records of a data file aside, replays them over its change log file, then atomically replaces the change log file.
+        """
+        journal_file, compacting_file = self.journal_file(file_path), self.compacting_file(file_path)
+        with self.compact_lock:
+            # Move the current records aside, new appends start a fresh journal
+            with self.append_lock:
+                try:
+                    with open(journal_file, 'r') as f:
+                        pending = f.read()
+                except FileNotFoundError:
+                    pending = ''
+                if pending:
+                    with open(compacting_file, 'a') as f:
+                        f.write(pending)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    open(journal_file, 'w').close()
+
+            if not os.path.exists(compacting_file):
+                return
+
+            changes, sequence = self.read_snapshot(self.log_file(file_path))
+            for record in self.read_records(compacting_file):
+                if record['sequence'] > sequence:
+                    changes = apply_record(changes, record)
+                    sequence = record['sequence']
+
+            self.write_snapshot(file_path, changes, sequence)
+            os.remove(compacting_file)
+
+    def write_snapshot(self, file_path, changes, sequence):
+        """
+        Atomically replaces the change log file of a data file with the given changes and the sequence number of the last record they include.
+        """
+        log_file = self.log_file(file_path)
+        data = {"version": CHANGE_LOG_VERSION, "file": file_path, "sequence": sequence, "changes": changes}
+        os.makedirs(self.directory, exist_ok=True)
+        temp_file = log_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, indent=2, cls=DecimalEncoder)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, log_file)
+
+    @staticmethod
+    def read_snapshot(log_file):
+        """
+        Reads a change log file and returns its changes along with the sequence number of the last compacted record.
+        """
+        try:
+            with open(log_file, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return [], 0
+        except json.JSONDecodeError:
+            # Handle case where file is not valid JSON, the next compaction rewrites it
+            print(f"Error reading {log_file}. File is not valid JSON.")
+            return [], 0
+
+        if data.get('version') != CHANGE_LOG_VERSION:
+            # If version isn't correct, start from scratch, it doesn't matter for change log
+            return [], 0
+        return [convert_change(change) for change in data['changes']], data['sequence']
+
+    def legacy_exists(self):
+        """
+        Returns True if the change log file or journal shared by every data file up to version 2 is still around.
+        """
+        return any(os.path.exists(path) for path in (LEGACY_CHANGE_LOG_FILE, LEGACY_CHANGE_LOG_JOURNAL_FILE, LEGACY_CHANGE_LOG_JOURNAL_FILE + '.compacting'))
+
+    def read_legacy(self):
+        """
+        Returns the changes of every data file from the legacy change log file, version 1 or 2, replayed from the legacy journal.
+        """
+        try:
+            with open(LEGACY_CHANGE_LOG_FILE, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {'version': '2', 'sequence': 0, 'logs': {}}
+
+        if data.get('version', '1') == '1':
+            # Version 1 stored the changes of every file path at the top level
+            logs, sequence = {path: changes for path, changes in data.items() if path != 'version'}, 0
+        elif data['version'] == '2':
+            logs, sequence = data['logs'], data['sequence']
+        else:
+            logs, sequence = {}, 0
+        logs = {path: [convert_change(change) for change in changes] for path, changes in logs.items()}
+
+        for path in (LEGACY_CHANGE_LOG_JOURNAL_FILE + '.compacting', LEGACY_CHANGE_LOG_JOURNAL_FILE):
+            for record in self.read_records(path):
+                if record['sequence'] > sequence:
+                    logs[record['file']] = apply_record(logs.get(record['file'], []), self.convert_record(record))
+        return logs
+
+    def migrate(self):
+        """
+        Splits the legacy change log shared by every data file into one change log file per data file, then removes the legacy files. Interrupted migrations are resumed, the legacy files are only removed once every change log was written.
+        """
+        with self.compact_lock:
+            for file_path, changes in self.read_legacy().items():
+                self.write_snapshot(file_path, changes, 0)
+                self.sequences[file_path] = 0
+                for path in (self.compacting_file(file_path), self.journal_file(file_path)):
+                    if os.path.exists(path):
+                        os.remove(path)
+            for path in (LEGACY_CHANGE_LOG_FILE, LEGACY_CHANGE_LOG_JOURNAL_FILE + '.compacting', LEGACY_CHANGE_LOG_JOURNAL_FILE):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def cleanup(self, keep=(), now=None):
+        """
+        Removes the change logs of data files that no longer exist, once they weren't written for CHANGE_LOG_ORPHAN_DAYS, so a file on a drive that is only temporarily unavailable keeps its changes. The change log of unsaved data, without a path, and those of the given paths are kept. Returns the removed data file paths.
+        """
+        if now is None:
+            now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+
+        # A change log may only have a journal yet
+        log_files = {os.path.join(self.directory, name.split('.')[0] + '.json') for name in names if '.json' in name}
+
+        removed = []
+        with self.compact_lock:
+            for log_file in sorted(log_files):
+                file_path = self.logged_file_path(log_file)
+                if file_path is None or not file_path or file_path in keep or os.path.exists(file_path):
+                    continue
+                paths = [log_file, log_file + 'l', log_file + 'l.compacting']
+                if now - max(os.path.getmtime(path) for path in paths if os.path.exists(path)) < CHANGE_LOG_ORPHAN_DAYS * 86400:
+                    continue
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.sequences.pop(file_path, None)
+                removed.append(file_path)
+        return removed
+
+    def logged_file_path(self, log_file):
+        """
+        Returns the data file path a change log file belongs to, read from the file itself or the first record of its journal, or None if it can't be told.
+        """
+        try:
+            with open(log_file, 'r') as f:
+                return json.load(f)['file']
+        except (OSError, ValueError, KeyError):
+            pass
+        for record in self.read_records(log_file + 'l'):
+            return record.get('file')
+        return None
+
+    @staticmethod
+    def read_records(path):
+        """
+        Yields the records of a journal file in order, skipping lines left truncated by an interrupted write.
+        """
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def convert_record(record):
+        """
+        Converts the trades carried by a record back to Decimal.
+        """
+        if record['op'] == 'add':
+            convert_change(record['change'])
+        elif record['op'] == 'snapshot':
+            for change in record['changes']:
+                convert_change(change)
+        return record
@@ -0,0 +1,227 @@
+from contextlib import contextmanager
+
+from core.trade import Trade
+from core.trade_overlay import TradeOverlay
+from core.change_journal import ChangeJournal, CHANGE_LOG_HISTORY_SIZE, apply_record, process_flags, inverse_change, expand_changes
+from core.instrumentation import INSTRUMENTATION
+
+# Flush every journal append to disk before returning, slower but survives power loss
+CHANGE_LOG_FSYNC = False
+
+
+class ChangeLog:
+    def __init__(self, fsync=CHANGE_LOG_FSYNC, history_size=CHANGE_LOG_HISTORY_SIZE):
+        """
+        Initializes the object with an empty list to track changes, and the journal every modification is appended to. At most history_size saved changes can be undone.
+        """
+        self.changes = []
+        # Changes before this position form the undo stack, the undone ones from it the redo stack
+        self.position = 0
+        self.history_size = history_size
+        self.file_path = None
+        self.journal = ChangeJournal(fsync)
+        # Changes collected by the transaction in progress, if any
+        self.batch = None
+
+    def all_applied(self):
+        """
+        Determines if all changes in the list have been applied and not undone, returning True if so.
+        """
+        return all(change.get('applied', True) != change.get('undone', True) for change in self.changes)
+
+    def load(self, file_path):
+        """
+        Loads the changes of the given file path from the change log file and its journal.
+        """
+        self.changes = self.journal.load(file_path)
+        self.file_path = file_path
+        self.update_position()
+
+    def record(self, file_path, record):
+        """
+        Applies a record to the in-memory changes and appends it to the journal.
+        """
+        self.changes = apply_record(self.changes, record)
+        self.update_position()
+        self.append(file_path, record)
+
+    def update_position(self):
+        """
+        Moves the boundary between the undo and redo stacks after the changes were modified. Undone changes always follow the others, so only the redo stack is scanned.
+        """
+        position = len(self.changes)
+        while position and self.changes[position - 1].get('undone', False):
+            position -= 1
+        self.position = position
+
+    def append(self, file_path, record):
+        """
+        Appends a record, already applied in memory, to the journal. The cost doesn't depend on the size of the log, except when the changes start being tracked under a new file path, where the current state is recorded once in full instead.
+        """
+        if file_path != self.file_path:
+            self.journal.append(file_path, {'op': 'snapshot', 'changes': self.changes})
+            self.file_path = file_path
+        else:
+            self.journal.append(file_path, record)
+
+    def add(self, file_path, change_type, original_data=None, new_data=None):
+        """
+        Adds a new change to the change log, removing any undone changes, and records it for the given file path. Inside a transaction, the change is only collected. Trades may also be given as [trade_id, pair, side, date, quantity, price] lists.
+        """
+        change = {
+            'change_type': change_type,
+            'original_data': None if original_data is None else Trade.from_list(original_data),
+            'new_data': None if new_data is None else Trade.from_list(new_data),
+        }
+        if self.batch is not None:
+            self.batch.append(change)
+            return
+
+        self.record(file_path, {'op': 'add', 'change': {**change, 'applied': False, 'undone': False}})
+
+    def add_batch(self, file_path, trades):
+        """
+        Adds trades to the change log in a single transaction, such as the rows of an import.
+        """
+        with self.transaction(file_path):
+            for trade in trades:
+                self.add(file_path, 'add', None, trade)
+
+    @contextmanager
+    def transaction(self, file_path):
+        """
+        Collects the changes added inside the block and records them for the given file path when it exits, as one batch change written in a single journal record and undone or redone as one unit. A single change is recorded as is. Nothing is recorded if the block raises, and a transaction opened inside another one joins it.
+        """
+        if self.batch is not None:
+            yield
+            return
+
+        self.batch = []
+        try:
+            yield
+            batch = self.batch
+        finally:
+            self.batch = None
+
+        if len(batch) == 1:
+            self.record(file_path, {'op': 'add', 'change': {**batch[0], 'applied': False, 'undone': False}})
+        elif batch:
+            self.record(file_path, {'op': 'add', 'change': {
+                'change_type': 'batch',
+                'original_data': None,
+                'new_data': None,
+                'changes': batch,
+                'applied': False,
+                'undone': False
+            }})
+
+    def compact(self, background=True):
+        """
+        Folds the journal of the current file path into its change log file, on a background thread unless background is False.
+        """
+        self.journal.compact(self.file_path, background)
+
+    def cleanup(self, keep=()):
+        """
+        Removes the change logs of data files that were deleted a while ago, keeping those of the given file paths, and returns the removed file paths.
+        """
+        return self.journal.cleanup(keep)
+
+    def process(self, file_path, original_data, change_applied=False):
+        """
+        Processes the original data according to the changes recorded in the change log,
+        applying, unapplying, and pruning changes as necessary, and returns the processed data as a TradeOverlay.
+        """
+        with INSTRUMENTATION.stage('process', changes=len(self.changes)) as details:
+            processed_data = self.apply_pending(original_data)
+            self.update_flags(file_path, change_applied)
+            details['trades'] = len(processed_data)
+        return processed_data
+
+    def apply_pending(self, original_data):
+        """
+        Returns a TradeOverlay of the pending changes on top of the original data, which is shared rather than copied, without touching the flags or the journal.
+        """
+        processed_data = TradeOverlay(original_data)
+        self.apply_changes(processed_data, self.pending())
+        return processed_data
+
+    @staticmethod
+    def apply_changes(trade_store, changes):
+        """
+        Applies add, edit and delete changes to a TradeStore or TradeOverlay in place, in order.
+        """
+        for change in changes:
+            change_type = change['change_type']
+            original = change['original_data']
+            new = change['new_data']
+
+            if change_type == 'add':
+                # For 'add', append the new data to the processed store
+                trade_store.add(new)
+            elif change_type == 'edit':
+                # For 'edit', replace the record sharing the original's UUID with the new data
+                trade_store.replace(new)
+            elif change_type == 'delete':
+                # For 'delete', remove the original data from the store
+                trade_store.remove(original.trade_id)
+
+    def pending(self):
+        """
+        Returns the changes turning the data file into the current data, in the order process applies them, batch changes being expanded into the changes they hold: the inverses of the saved changes that were undone, latest first, then the changes that are neither applied nor undone.
+        """
+        reverted = [inverse_change(change) for change in reversed(self.changes) if change['applied'] and change['undone']]
+        return expand_changes(reverted + [change for change in self.changes if not change['applied'] and not change['undone']])
+
+    def commit(self, file_path):
+        """
+        Marks all pending changes as applied, to be called once the processed data was written to the data file.
+        """
+        self.update_flags(file_path, True)
+
+    def update_flags(self, file_path, change_applied):
+        """
+        Updates the applied flags of the changes and prunes them, only journaling when something actually changed.
+        """
+        self.changes, modified = process_flags(self.changes, change_applied, self.history_size)
+        self.update_position()
+        if modified or file_path != self.file_path:
+            self.append(file_path, {'op': 'process', 'change_applied': change_applied, 'history_size': self.history_size})
+
+    def clear_not_applied(self, file_path):
+        """
+        Clears all unapplied changes in the change log for the specified file path.
+        """
+        self.record(file_path, {'op': 'clear'})
+
+    def get_last_to_undo(self):
+        """
+        Returns the change on top of the undo stack, the last one that has not been undone, or None.
+        """
+        return self.changes[self.position - 1] if self.position else None
+
+    def get_next_to_redo(self):
+        """
+        Returns the change on top of the redo stack, the first one that has been undone, or None.
+        """
+        return self.changes[self.position] if self.position < len(self.changes) else None
+
+    def undo(self, file_path):
+        """
+        Marks the last change in the change log that has not been undone as undone for the given file path, and returns the changes reverting it, to be applied to the current data instead of processing the whole log again.
+        """
+        change = self.get_last_to_undo()
+        if change is None:
+            return []
+        self.record(file_path, {'op': 'undo'})
+        return expand_changes([inverse_change(change)])
+
+    def redo(self, file_path):
+        """
+        Marks the first change in the change log that has been undone as not undone for the given file path, effectively redoing the change, and returns the changes to apply to the current data.
+        """
+        change = self.get_next_to_redo()
+        if change is None:
+            return []
+        self.record(file_path, {'op': 'redo'})
+        return expand_changes([change])
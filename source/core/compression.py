@@ -0,0 +1,46 @@
+import os
+import bz2
+import gzip
+import lzma
+
+# Magic bytes of the compressed files that can be opened, and the module reading and writing each of them
+COMPRESSIONS = {
+    'gzip': (b'\x1f\x8b', gzip),
+    'bz2': (b'BZh', bz2),
+    'xz': (b'\xfd7zXZ\x00', lzma),
+}
+
+# Saving to a path with one of these extensions compresses the file, e.g. trades.ctt.gz
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+
+
+def detect_compression(file):
+    """
+    Returns the compression of a file opened in binary mode from its first bytes, or None if it isn't compressed, leaving it positioned at the start.
+    """
+    start = file.read(max(len(magic) for magic, _ in COMPRESSIONS.values()))
+    file.seek(0)
+    for compression, (magic, _) in COMPRESSIONS.items():
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def path_compression(file_path):
+    """
+    Returns the compression to save a file with: the one of its extension, else the one of the existing file, so saving a compressed file keeps it compressed, or None.
+    """
+    compression = COMPRESSION_EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+    if compression is None and os.path.isfile(file_path):
+        with open(file_path, 'rb') as file:
+            compression = detect_compression(file)
+    return compression
+
+
+def open_compressed(file, mode='rb', compression=None):
+    """
+    Opens a file path like open, or a path or file object through a streaming compressor or decompressor if compression is given. Data is compressed and decompressed one buffer at a time, the uncompressed file is never held in memory in full.
+    """
+    if compression is None:
+        return open(file, mode)
+    return COMPRESSIONS[compression][1].open(file, mode)
@@ -0,0 +1,182 @@
+import os
+import re
+import csv
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from core.trade import Trade, BUY, SELL
+from core.day_ordinals import day_ordinal
+from core.fixed_point import to_fixed
+
+# Column mappings of common exchange exports, tried in this order against the header of the file. 'id' is optional,
+# exports without one get trade UUIDs derived from the row contents
+CSV_LAYOUTS = {
+    'Kraken': {'id': 'txid', 'pair': 'pair', 'side': 'type', 'date': 'time', 'quantity': 'vol', 'price': 'price'},
+    'Coinbase': {'id': 'trade id', 'pair': 'product', 'side': 'side', 'date': 'created at', 'quantity': 'size', 'price': 'price'},
+    'Binance': {'pair': 'pair', 'side': 'side', 'date': 'date(utc)', 'quantity': 'executed', 'price': 'price'},
+    'Binance (legacy)': {'pair': 'market', 'side': 'type', 'date': 'date(utc)', 'quantity': 'amount', 'price': 'price'},
+    'Generic': {'pair': 'pair', 'side': 'side', 'date': 'date', 'quantity': 'quantity', 'price': 'price'},
+}
+
+# Additional column mappings, a JSON object of layout names to mappings, tried before the built-in ones
+CSV_LAYOUTS_FILE = 'ctt_csv_layouts.json'
+
+# Rows are parsed and validated this many at a time, with progress reported after each chunk
+CSV_CHUNK_SIZE = 5000
+
+# Imported trades get UUIDs derived from their exchange ID or row, importing the same export twice yields the same UUIDs
+CSV_IMPORT_NAMESPACE = uuid.UUID('5c7b1f4e-8a9d-4f0b-9a57-2f6c3e1d8b40')
+
+SIDE_NAMES = {'buy': BUY, 'sell': SELL}
+AMOUNT_PATTERN = re.compile(r'\s*([0-9][0-9,]*(?:\.[0-9]*)?|\.[0-9]+)')
+
+
+class CSVImportError(ValueError):
+    pass
+
+
+class CSVImport:
+    def __init__(self, layout):
+        """
+        Initializes the result of an import with the name of the layout the file was read with, no trades, no errors and no duplicates.
+        """
+        self.layout = layout
+        self.trades = []
+        self.errors = []
+        self.duplicates = 0
+
+
+def load_csv_layouts(layouts_path=CSV_LAYOUTS_FILE):
+    """
+    Returns the column mappings to try, those of the layouts file first if it exists, then the built-in ones.
+    """
+    layouts = {}
+    if os.path.exists(layouts_path):
+        with open(layouts_path, 'r') as f:
+            layouts.update(json.load(f))
+    for name, columns in CSV_LAYOUTS.items():
+        layouts.setdefault(name, columns)
+    return layouts
+
+
+def detect_layout(header, layouts):
+    """
+    Returns the name of the first layout whose columns are all in the header, compared case-insensitively, or raises CSVImportError.
+    """
+    columns = {column.strip().lower() for column in header}
+    for name, mapping in layouts.items():
+        if all(column.lower() in columns for column in mapping.values()):
+            return name
+    raise CSVImportError(f"Unknown CSV layout, the supported ones are: {', '.join(layouts)}")
+
+
+def parse_amount(text, field):
+    """
+    Returns a positive amount of at most 8 decimals from an export cell. Thousands separators and unit suffixes, such as the '0.5BTC' of Binance exports, are ignored.
+    """
+    match = AMOUNT_PATTERN.match(text)
+    try:
+        amount = Decimal(match.group(1).replace(',', ''))
+    except (AttributeError, InvalidOperation):
+        raise ValueError(f"Invalid {field}: {text!r}")
+    if amount <= 0:
+        raise ValueError(f"Invalid {field}: {text!r}")
+    if to_fixed(amount) is None:
+        raise ValueError(f"{field.capitalize()} has more than 8 decimals: {text!r}")
+    return amount
+
+
+def parse_row(row, indexes, layout_name, occurrences):
+    """
+    Returns the trade of a CSV row, or raises ValueError if a cell is invalid. Dates keep their day, times are dropped.
+    """
+    side = SIDE_NAMES.get(row[indexes['side']].strip().lower())
+    if side is None:
+        raise ValueError(f"Invalid side: {row[indexes['side']]!r}")
+
+    date = row[indexes['date']].strip()[:10]
+    day_ordinal(date)  # Validates the date, and caches its ordinal for the positions engine
+
+    pair = row[indexes['pair']].strip().upper().replace('-', '').replace('/', '').replace('_', '')
+    if not pair:
+        raise ValueError("Pair cannot be empty")
+
+    quantity = parse_amount(row[indexes['quantity']], 'quantity')
+    price = parse_amount(row[indexes['price']], 'price')
+
+    if 'id' in indexes:
+        name = f"{layout_name}:{row[indexes['id']].strip()}"
+    else:
+        # Identical fills may legitimately repeat, their occurrence keeps their UUIDs apart
+        key = '\x1f'.join(row)
+        occurrences[key] = occurrences.get(key, 0) + 1
+        name = f"{layout_name}:{key}:{occurrences[key]}"
+    trade_id = str(uuid.uuid5(CSV_IMPORT_NAMESPACE, name))
+
+    return Trade(trade_id, pair, side, date, quantity, price)
+
+
+def read_csv_file(file_path, layouts=None, existing=(), progress=None, is_cancelled=None, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Reads the trades of an exchange export, detecting its layout from the header. Rows are streamed and parsed chunk_size at a time, calling progress(done, total) in characters after each chunk and stopping as soon as is_cancelled() returns True. Invalid rows are collected as (line number, message) errors instead of failing the import, and trades whose UUID is in existing, typically from importing the same export before, are counted as duplicates and left out.
+    """
+    if layouts is None:
+        layouts = load_csv_layouts()
+    total = os.path.getsize(file_path)
+
+    # utf-8-sig drops the byte order mark some exchanges write
+    with open(file_path, 'r', newline='', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        try:
+            header = next(reader)
+        except StopIteration:
+            raise CSVImportError("The CSV file is empty")
+
+        layout_name = detect_layout(header, layouts)
+        positions = {column.strip().lower(): index for index, column in enumerate(header)}
+        indexes = {field: positions[column.lower()] for field, column in layouts[layout_name].items()}
+        width = max(indexes.values()) + 1
+
+        result = CSVImport(layout_name)
+        seen = set()
+        occurrences = {}
+        done = len(','.join(header))
+        chunk = []
+        for row in reader:
+            chunk.append((reader.line_num, row))
+            if len(chunk) == chunk_size:
+                done += parse_chunk(chunk, indexes, width, layout_name, occurrences, existing, seen, result)
+                chunk = []
+                if is_cancelled is not None and is_cancelled():
+                    raise CSVImportError("Import cancelled")
+                if progress is not None:
+                    progress(min(done, total), total)
+        parse_chunk(chunk, indexes, width, layout_name, occurrences, existing, seen, result)
+
+    return result
+
+
+def parse_chunk(chunk, indexes, width, layout_name, occurrences, existing, seen, result):
+    """
+    Parses a chunk of (line number, row) tuples into the import result and returns the approximate number of characters it covered.
+    """
+    characters = 0
+    for line_number, row in chunk:
+        characters += sum(map(len, row)) + len(row)
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < width:
+            result.errors.append((line_number, "Missing columns"))
+            continue
+        try:
+            trade = parse_row(row, indexes, layout_name, occurrences)
+        except ValueError as e:
+            result.errors.append((line_number, str(e)))
+            continue
+        if trade.trade_id in existing or trade.trade_id in seen:
+            result.duplicates += 1
+            continue
+        seen.add(trade.trade_id)
+        result.trades.append(trade)
+    return characters
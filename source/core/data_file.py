@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import codecs
+from decimal import Decimal
+from core.compression import COMPRESSION_EXTENSIONS, detect_compression, path_compression, open_compressed
+from core.decimal_encoder import DecimalEncoder
+from core.trade import Trade
+from core.trade_store import TradeStore
+from core.binary_data_file import BinaryDataFileReader, BinaryFormatUnsupported, BINARY_DATA_FILE_VERSION, is_binary_data_file, write_binary_data_file
+from core.sqlite_data_file import SQLiteDataFile, is_sqlite_data_file, is_sqlite_path
+
+DATA_FILE_VERSION = str(BINARY_DATA_FILE_VERSION)
+
+# Version of the JSON layout, still read and available as an export
+JSON_DATA_FILE_VERSION = '1'
+
+# Paths with this extension, possibly followed by a compression extension, are saved as JSON
+JSON_EXTENSION = '.json'
+
+# Report progress and check for cancellation every N rows
+PROGRESS_INTERVAL = 10000
+
+# Read data files by chunks of this many bytes
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class DataFileVersionError(Exception):
+    pass
+
+
+class DataFileReader:
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        """
+        Initializes a streaming reader over a data file opened in binary mode. Only the current chunk and the row being decoded are held in memory, whatever the size of the file.
+        """
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+        self.header = {}
+        self.state = 'start'
+
+    def read_more(self):
+        """
+        Appends the next chunk of the file to the buffer, dropping what was already consumed. Returns False at the end of the file.
+        """
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character without consuming it, or an empty string at the end of the file.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return ''
+
+    def expect(self, characters):
+        """
+        Consumes the next character, which must be one of the given characters, and returns it.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Invalid data file: expected one of {characters!r} at byte {self.bytes_read}")
+        self.pos += 1
+        return character
+
+    def decode_value(self):
+        """
+        Decodes the next JSON value, reading more of the file until the value is complete.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number could continue in the next chunk, only trust values followed by something
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read_more()
+
+    def read_header(self):
+        """
+        Reads the top-level values up to the start of the "data" array and returns them. The version comes first in the files we write, so this only reads the first chunk.
+        """
+        if self.state == 'start':
+            self.expect('{')
+            self.state = 'keys'
+            if self.peek() == '}':
+                self.expect('}')
+                self.state = 'end'
+
+        while self.state == 'keys':
+            key = self.decode_value()
+            self.expect(':')
+            if key == 'data' and self.peek() == '[':
+                self.expect('[')
+                self.state = 'data'
+                if self.peek() == ']':
+                    self.expect(']')
+                    self.end_value()
+                break
+            self.header[key] = self.decode_value()
+            self.end_value()
+
+        return self.header
+
+    def end_value(self):
+        """
+        Consumes the separator following a top-level value and moves on to the next key or to the end of the document.
+        """
+        self.state = 'keys' if self.expect(',}') == ',' else 'end'
+
+    def json_rows(self):
+        """
+        Yields the rows of the "data" array as trades, with quantities and prices converted to Decimal.
+        """
+        for trade_id, pair, side, date, quantity, price in self.rows():
+            yield Trade(trade_id, pair, side, date, Decimal(quantity), Decimal(price))
+
+    def rows(self):
+        """
+        Yields the rows of the "data" array one at a time, storing the other top-level values, like "version", in header as they are met.
+        """
+        self.read_header()
+        while self.state == 'data':
+            yield self.decode_value()
+            if self.expect(',]') == ']':
+                self.end_value()
+                self.read_header()
+
+
+def check_data_file_version(file_path, version):
+    """
+    Checks that a data file's version can be loaded. JSON files, with version 1 or from before versioning, are migrated to the binary format when saved under another extension than .json, other versions raise DataFileVersionError.
+    """
+    if version in (None, JSON_DATA_FILE_VERSION, DATA_FILE_VERSION):
+        return
+    raise DataFileVersionError(f"Wrong file version: {file_path} - {version} instead of {DATA_FILE_VERSION}")
+
+
+def read_data_file(file_path, progress=None, is_cancelled=None):
+    """
+    Reads a data file into a TradeStore in a single pass, detecting its format from its first bytes. Binary files are memory-mapped, SQLite files are queried in insertion order, JSON files are streamed with their version checked from the header before any row is read. Files compressed with gzip, bz2 or xz are decompressed as they are read, their format being detected from their decompressed first bytes. Calls progress(done, total) every PROGRESS_INTERVAL rows and raises LoadCancelled as soon as is_cancelled() returns True.
+    """
+    with open(file_path, 'rb') as file:
+        compression = detect_compression(file)
+        if compression is None:
+            return read_data(file_path, file, file, progress, is_cancelled)
+        with open_compressed(file, 'rb', compression) as stream:
+            return read_data(file_path, stream, file, progress, is_cancelled)
+
+
+def read_data(file_path, file, raw_file, progress=None, is_cancelled=None):
+    """
+    Reads the trades of an opened data file, like read_data_file. raw_file is the file on disk, file being a decompressed stream over it for compressed files, which are read front to back and report their progress in compressed bytes.
+    """
+    compressed = file is not raw_file
+    if is_binary_data_file(file):
+        reader = BinaryDataFileReader(file, stream=compressed)
+        check_data_file_version(file_path, reader.version)
+        return fill_store(reader.rows(), lambda i: (i, reader.count), progress, is_cancelled)
+
+    if is_sqlite_data_file(file):
+        if compressed:
+            raise ValueError(f"Compressed SQLite databases can't be opened, decompress {file_path} first")
+        with SQLiteDataFile(file_path) as sqlite_file:
+            count = sqlite_file.count()
+            return fill_store(sqlite_file.rows(), lambda i: (i, count), progress, is_cancelled)
+
+    total = os.fstat(raw_file.fileno()).st_size
+    reader = DataFileReader(file)
+    # The version comes first in the files we write, a wrong version fails before any row is read
+    if 'version' in reader.read_header():
+        check_data_file_version(file_path, reader.header['version'])
+
+    position = (lambda i: (raw_file.tell(), total)) if compressed else (lambda i: (reader.bytes_read, total))
+    store = fill_store(reader.json_rows(), position, progress, is_cancelled)
+
+    # Files written by other tools may put the version after the data
+    check_data_file_version(file_path, reader.header.get('version'))
+    return store
+
+
+def fill_store(rows, position, progress=None, is_cancelled=None):
+    """
+    Adds rows to a new TradeStore, calling progress with the reader's position(index) and checking is_cancelled every PROGRESS_INTERVAL rows.
+    """
+    store = TradeStore()
+    for i, row in enumerate(rows):
+        if i % PROGRESS_INTERVAL == 0:
+            if is_cancelled is not None and is_cancelled():
+                raise LoadCancelled()
+            if progress is not None:
+                progress(*position(i))
+        store.add(row)
+
+    if progress is not None:
+        total = position(len(store))[1]
+        progress(total, total)
+    return store
+
+
+def is_sqlite_file(file_path):
+    """
+    Returns True if the given path is an existing SQLite data file.
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return is_sqlite_data_file(file)
+    except FileNotFoundError:
+        return False
+
+
+def is_json_path(file_path):
+    """
+    Returns True if the given path has the JSON extension, e.g. trades.json or trades.json.gz.
+    """
+    root, extension = os.path.splitext(file_path)
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        extension = os.path.splitext(root)[1]
+    return extension.lower() == JSON_EXTENSION
+
+
+def write_data_file(file_path, trades, source_path=None, changes=None):
+    """
+    Writes trades to a data file. Paths with an SQLite extension, or existing SQLite files, use the SQLite backend: saving a file onto itself only applies the given pending changes in one transaction, otherwise all trades are replaced. Paths with the JSON extension keep the JSON format, so a file named .json always holds JSON. Every other path gets the binary format, compressed as it is written for paths ending in .gz, .bz2 or .xz and for existing compressed files. Trades the binary format can't hold, amounts with more than 8 decimals or beyond 64 bits and IDs that aren't lowercase UUIDs, are written as JSON instead, which is read back the same way.
+    """
+    if is_sqlite_path(file_path) or is_sqlite_file(file_path):
+        with SQLiteDataFile(file_path) as sqlite_file:
+            if changes is not None and source_path == file_path:
+                sqlite_file.apply_changes(changes)
+            else:
+                sqlite_file.replace_all(trades)
+    elif is_json_path(file_path):
+        write_json_data_file(file_path, trades)
+    else:
+        try:
+            write_binary_data_file(file_path, trades, path_compression(file_path))
+        except BinaryFormatUnsupported:
+            write_json_data_file(file_path, trades)
+
+
+def write_json_data_file(file_path, trades, version=JSON_DATA_FILE_VERSION):
+    """
+    Exports trades to a JSON data file one row at a time, producing the same layout as json.dump with indent=2 without building the whole document in memory. Paths ending in .gz, .bz2 or .xz are compressed as they are written.
+    """
+    with open_compressed(file_path, 'wt', path_compression(file_path)) as file:
+        file.write('{\n  "version": ' + json.dumps(version) + ',\n  "data": [')
+        separator = '\n    '
+        for trade in trades:
+            file.write(separator + json.dumps(trade.to_list(), indent=2, cls=DecimalEncoder).replace('\n', '\n    '))
+            separator = ',\n    '
+        file.write('\n  ]\n}' if separator != '\n    ' else ']\n}')
+
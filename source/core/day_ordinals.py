@@ -0,0 +1,41 @@
+import sys
+from datetime import date, datetime
+
+# Day ordinals of every date string seen so far. Trades share few distinct dates, so each one is only parsed once
+DAY_ORDINALS = {}
+
+# Canonical form of every date string seen so far
+CANONICAL_DAYS = {}
+
+
+def day_ordinal(day):
+    """
+    Returns the proleptic Gregorian ordinal of a 'YYYY-MM-DD' date string, parsing it only the first time it is seen. Raises ValueError for invalid dates, like datetime.strptime.
+    """
+    ordinal = DAY_ORDINALS.get(day)
+    if ordinal is None:
+        ordinal = DAY_ORDINALS[day] = datetime.strptime(day, '%Y-%m-%d').toordinal()
+    return ordinal
+
+
+def canonical_day(day):
+    """
+    Returns a date string in its 'YYYY-MM-DD' form, zero-padded and without spaces, or as is if it isn't a valid date. Each distinct string is only converted the first time it is seen, and the result is interned.
+    """
+    canonical = CANONICAL_DAYS.get(day)
+    if canonical is None:
+        try:
+            canonical = day_string(day_ordinal(day.replace(' ', '')))
+        except ValueError:
+            canonical = day
+        canonical = CANONICAL_DAYS[day] = sys.intern(canonical)
+    return canonical
+
+
+def day_string(ordinal):
+    """
+    Returns the 'YYYY-MM-DD' date string of a day ordinal, remembering its ordinal so it is never parsed.
+    """
+    day = date.fromordinal(ordinal).isoformat()
+    DAY_ORDINALS[day] = ordinal
+    return day
@@ -1,13 +1,17 @@
 import json
 from decimal import Decimal
 
+from core.trade import Trade
+
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         """
-        Encode Decimal objects to strings for JSON serialization. If the object is not a Decimal, let the base class handle the encoding.
+        Encode Decimal objects to strings and trades to lists for JSON serialization. If the object is neither, let the base class handle the encoding.
         """
         if isinstance(obj, Decimal):
             return str(obj)  # Convert Decimal to string
+        if isinstance(obj, Trade):
+            return obj.to_list()  # Trades are stored as [trade_id, pair, side, date, quantity, price]
         # Let the base class default method raise the TypeError
         return super(DecimalEncoder, self).default(obj)
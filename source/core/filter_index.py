@@ -0,0 +1,62 @@
+# Length of the lowercase substrings of pair names that are indexed, shorter filters scan the pair names instead
+FILTER_NGRAM_SIZE = 3
+
+# Rows filtered between two checks for cancellation
+FILTER_CHUNK_SIZE = 65536
+
+
+class FilterCancelled(Exception):
+    pass
+
+
+class FilterIndex:
+    def __init__(self, pairs=()):
+        """
+        Initializes the index from pair names. Filtering is done on pair names rather than rows: a filter is first resolved to the set of matching pairs, which portfolios only have a few of, then rows are kept by pair.
+        """
+        self.pairs = {}
+        self.ngrams = {}
+        for pair in pairs:
+            self.add(pair)
+
+    def add(self, pair):
+        """
+        Indexes a pair name under its lowercase form and every lowercase substring of FILTER_NGRAM_SIZE characters, if it isn't indexed yet.
+        """
+        lower = pair.lower()
+        names = self.pairs.setdefault(lower, set())
+        if pair in names:
+            return
+        names.add(pair)
+        for start in range(len(lower) - FILTER_NGRAM_SIZE + 1):
+            self.ngrams.setdefault(lower[start:start + FILTER_NGRAM_SIZE], set()).add(lower)
+
+    def __contains__(self, pair):
+        """
+        Returns True if the pair name is indexed.
+        """
+        return pair in self.pairs.get(pair.lower(), ())
+
+    def match(self, text):
+        """
+        Returns the set of indexed pair names containing the text, case-insensitively. Only the pairs sharing every substring of the text are compared.
+        """
+        text = text.lower()
+        if len(text) < FILTER_NGRAM_SIZE:
+            candidates = self.pairs
+        else:
+            postings = sorted((self.ngrams.get(text[start:start + FILTER_NGRAM_SIZE], ()) for start in range(len(text) - FILTER_NGRAM_SIZE + 1)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        return {pair for lower in candidates if text in lower for pair in self.pairs[lower]}
+
+
+def filter_rows(rows, trades, pairs, is_cancelled=None, chunk_size=FILTER_CHUNK_SIZE):
+    """
+    Returns the rows whose trade is of one of the given pairs, in the order given, trades being indexed by row. Raises FilterCancelled as soon as is_cancelled() returns True, checked every chunk_size rows.
+    """
+    filtered = []
+    for start in range(0, len(rows), chunk_size):
+        if is_cancelled is not None and is_cancelled():
+            raise FilterCancelled()
+        filtered.extend([row for row in rows[start:start + chunk_size] if trades[row].pair in pairs])
+    return filtered
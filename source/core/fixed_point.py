@@ -0,0 +1,99 @@
+from decimal import Decimal, getcontext
+
+# Amounts are integers of 1e-8 units, matching decimal_places, and products of two amounts are integers of 1e-16 units
+SCALE_DIGITS = 8
+SCALE = 10 ** SCALE_DIGITS
+
+# Decimal rounds any result with more significant digits than the context precision, and quantize fails beyond it.
+# Results that Decimal would have rounded raise FixedPointOverflow instead
+PRECISION = getcontext().prec
+LIMIT = 10 ** PRECISION
+
+# Quotients below this, in 1e-8 units, keep at least 8 more digits of precision after rounding to 8 decimals
+QUOTIENT_LIMIT = 10 ** (PRECISION - SCALE_DIGITS)
+
+
+class FixedPointOverflow(ArithmeticError):
+    pass
+
+
+def to_fixed(value):
+    """
+    Converts a Decimal to an integer of 1e-8 units, or returns None if it has more than 8 decimals.
+    """
+    numerator, denominator = value.as_integer_ratio()
+    if SCALE % denominator:
+        return None
+    return numerator * (SCALE // denominator)
+
+
+def to_decimal(value, negative=False):
+    """
+    Converts an integer of 1e-8 units to a Decimal with 8 decimals, as quantize(decimal_places) returns it, including the -0E-8 it returns when a negative amount rounds to zero.
+    """
+    result = Decimal(value).scaleb(-SCALE_DIGITS)
+    return result.copy_negate() if negative and not value else result
+
+
+def check(value):
+    """
+    Returns the value, or raises FixedPointOverflow if it has more significant digits, trailing zeros aside, than the Decimal context precision, in which case Decimal would have rounded it.
+    """
+    if -LIMIT < value < LIMIT:
+        return value
+    if value % 10 ** (len(str(abs(value))) - PRECISION) == 0:
+        return value
+    raise FixedPointOverflow(value)
+
+
+def round_half_up(value, digits):
+    """
+    Drops the given number of trailing digits of an integer, rounding ties away from zero like ROUND_HALF_UP.
+    """
+    divisor = 10 ** digits
+    quotient, remainder = divmod(abs(value), divisor)
+    if 2 * remainder >= divisor:
+        quotient += 1
+    return quotient if value >= 0 else -quotient
+
+
+def quantize_product(value):
+    """
+    Rounds a product of two amounts, in 1e-16 units, to 1e-8 units with ROUND_HALF_UP, raising FixedPointOverflow where quantize would fail because the result has more digits than the Decimal context precision.
+    """
+    value = round_half_up(value, SCALE_DIGITS)
+    if -LIMIT < value < LIMIT:
+        return value
+    raise FixedPointOverflow(value)
+
+
+def divide(numerator, denominator):
+    """
+    Divides a product, in 1e-16 units, by an amount, in 1e-8 units, and returns the quotient in 1e-8 units. Like the Decimal path, the exact quotient is rounded half-even to the context precision, then quantized half-up.
+    """
+    negative = (numerator < 0) != (denominator < 0)
+    numerator, denominator = abs(numerator), abs(denominator)
+
+    # The first rounding moves the quotient by less than 1e-8 of a unit, it can only matter right next to a tie
+    quotient, remainder = divmod(numerator, denominator)
+    distance = 2 * remainder - denominator
+    if quotient < QUOTIENT_LIMIT and abs(distance) * SCALE > denominator:
+        quotient += distance > 0
+        return -quotient if negative else quotient
+
+    # Exponent of the quotient's leading digit, then the scale at which it has exactly PRECISION digits
+    denominator *= SCALE
+    exponent = len(str(numerator)) - len(str(denominator))
+    if exponent >= 0:
+        exponent -= numerator < denominator * 10 ** exponent
+    else:
+        exponent -= numerator * 10 ** -exponent < denominator
+    scale = PRECISION - 1 - exponent
+    if scale < SCALE_DIGITS:
+        raise FixedPointOverflow(numerator // denominator)
+
+    quotient, remainder = divmod(numerator * 10 ** scale, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient & 1):
+        quotient += 1
+    quotient = round_half_up(quotient, scale - SCALE_DIGITS)
+    return -quotient if negative else quotient
@@ -0,0 +1,98 @@
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# Structured log of every timed stage, one JSON object per line, written only once a path is set
+INSTRUMENTATION_LOG_FILE = None
+
+# Number of functions listed in the text report of a profile
+PROFILE_REPORT_SIZE = 30
+
+
+class Instrumentation:
+    def __init__(self, log_path=INSTRUMENTATION_LOG_FILE):
+        """
+        Initializes empty timers and counters. Timing a stage only costs two clock reads, so it is always on, while the structured log is opt-in.
+        """
+        self.stages = {}
+        self.counters = {}
+        self.log_path = log_path
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **details):
+        """
+        Times the enclosed block as one run of the named stage, keeping its run count, last, longest and total duration in seconds. If the structured log is enabled, the run is also logged with the given details, which may be updated inside the block, e.g. with the number of rows processed.
+        """
+        start = time.perf_counter()
+        try:
+            yield details
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                stage = self.stages.setdefault(name, {'count': 0, 'last': 0.0, 'max': 0.0, 'total': 0.0})
+                stage['count'] += 1
+                stage['last'] = duration
+                stage['max'] = max(stage['max'], duration)
+                stage['total'] += duration
+            if self.log_path:
+                self.log({'stage': name, 'duration': duration, **details})
+
+    def count(self, name, amount=1):
+        """
+        Adds an amount to the named counter, such as the number of journal records written.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def log(self, entry):
+        """
+        Appends an entry to the structured log, timestamped, as a JSON line.
+        """
+        line = json.dumps({'time': time.time(), **entry}, default=str)
+        with self.lock:
+            with open(self.log_path, 'a') as f:
+                f.write(line + '\n')
+
+    def reset(self):
+        """
+        Clears every timer and counter.
+        """
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+
+    def snapshot(self):
+        """
+        Returns a copy of the timers and counters, as a dictionary that can be serialized to JSON.
+        """
+        with self.lock:
+            return {'stages': {name: dict(stage) for name, stage in self.stages.items()}, 'counters': dict(self.counters)}
+
+    def summary(self, names):
+        """
+        Returns a one-line readout of the last duration of the given stages, in milliseconds, leaving out stages that never ran.
+        """
+        with self.lock:
+            return ' | '.join(f"{name} {self.stages[name]['last'] * 1000:.1f} ms" for name in names if name in self.stages)
+
+    @staticmethod
+    def profile(profile_path, function, *args):
+        """
+        Runs a function under cProfile, saves the statistics to the given path, which can be opened with pstats or snakeviz, and returns a text report of the functions with the most cumulative time.
+        """
+        profiler = cProfile.Profile()
+        profiler.runcall(function, *args)
+        profiler.dump_stats(profile_path)
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_REPORT_SIZE)
+        return report.getvalue()
+
+
+# Shared by the change log and the main window, so their stages add up in the same readout
+INSTRUMENTATION = Instrumentation()
@@ -0,0 +1,327 @@
+from bisect import bisect_left
+from decimal import Decimal, ROUND_HALF_UP
+
+from core.day_ordinals import day_ordinal
+from core.trade_overlay import TradeOverlay
+from core.vectorized_positions import POSITIONS_BATCH_THRESHOLD, batch_available, load_batch
+from core.fixed_point import FixedPointOverflow, LIMIT, SCALE, QUOTIENT_LIMIT, to_fixed, to_decimal, check, quantize_product, divide
+
+# Half of 1e-8 in 1e-16 units, to round products half-up
+PRODUCT_HALF = SCALE // 2
+
+# Set the desired precision: 8 decimal places
+decimal_places = Decimal('1E-8')
+
+# 'fixed' replays trades with integers of 1e-8 units, falling back to Decimal for pairs that don't fit, 'decimal' always
+# uses Decimal, 'validate' runs both and raises PositionsMismatch if they ever disagree
+POSITIONS_ARITHMETIC = 'fixed'
+ARITHMETICS = ('fixed', 'decimal', 'validate')
+
+
+class PositionsMismatch(AssertionError):
+    pass
+
+
+class PositionsEngine:
+    def __init__(self, arithmetic=POSITIONS_ARITHMETIC, batch_threshold=POSITIONS_BATCH_THRESHOLD):
+        """
+        Initializes the engine with no trades. Each pair keeps its trades sorted by day ordinal, then insertion sequence, along with the running totals after every trade, so a change only replays the trades that follow it. Loading at least batch_threshold trades into an empty engine uses the vectorized backend, if NumPy is installed.
+        """
+        if arithmetic not in ARITHMETICS:
+            raise ValueError(f"Unknown arithmetic: {arithmetic}")
+        self.arithmetic = arithmetic
+        self.batch_threshold = batch_threshold
+        self.trades = {}
+        self.pairs = {}
+        self.sequences = {}
+        self.next_sequence = 0
+        # In validation mode, a Decimal engine is kept in sync to check every result against
+        self.reference = PositionsEngine('decimal') if arithmetic == 'validate' else None
+
+    def reset(self):
+        """
+        Forgets every trade and running total, to be called when a different data file is opened.
+        """
+        self.trades = {}
+        self.pairs = {}
+        self.sequences = {}
+        self.next_sequence = 0
+        if self.reference is not None:
+            self.reference.reset()
+
+    def sync(self, history_data):
+        """
+        Brings the engine in line with the given trade history, matching trades by UUID, and recomputes only the pairs touched by added, edited or deleted trades, starting from the earliest changed date. Same-date trades are replayed in the order of the history. Returns the set of affected pairs.
+        """
+        base = history_data.base if isinstance(history_data, TradeOverlay) else ()
+        if not self.trades and self.arithmetic != 'decimal' and batch_available() and len(history_data) >= self.batch_threshold:
+            loaded = load_batch(self, history_data)
+            if self.reference is not None:
+                self.reference.sync(history_data)
+                self.validate(loaded)
+            return loaded
+
+        dirty = {}
+        seen = set()
+
+        for trade in history_data:
+            trade_id = trade.trade_id
+            seen.add(trade_id)
+            known = self.trades.get(trade_id)
+            if known is None:
+                self.reset_sequence(trade_id, base)
+                self.insert(trade, dirty)
+            elif known[0] is not trade and known[0] != trade:
+                self.remove(trade_id, dirty)
+                self.insert(trade, dirty)
+
+        for trade_id in [trade_id for trade_id in self.trades if trade_id not in seen]:
+            self.remove(trade_id, dirty)
+
+        if isinstance(history_data, TradeOverlay):
+            self.order_added(history_data.added, dirty)
+
+        for pair, index in dirty.items():
+            self.recompute(pair, index)
+
+        if self.reference is not None:
+            self.reference.sync(history_data)
+            self.validate(dirty)
+
+        return set(dirty)
+
+    def apply_changes(self, changes, history_data=None):
+        """
+        Applies add, edit and delete changes in order, without scanning the trade history, and recomputes the affected pairs from the earliest changed date. Given the TradeOverlay the changes lead to, same-date trades are replayed in its order, as after processing the change log. Returns the set of affected pairs.
+        """
+        dirty = {}
+        base = history_data.base if isinstance(history_data, TradeOverlay) else ()
+
+        for change in changes:
+            original, new = change['original_data'], change['new_data']
+            # Like TradeStore.replace, editing a trade that was deleted meanwhile does nothing
+            if change['change_type'] == 'edit' and new.trade_id not in self.trades:
+                continue
+            if original is not None and original.trade_id in self.trades:
+                self.remove(original.trade_id, dirty)
+            if new is not None:
+                if new.trade_id in self.trades:
+                    self.remove(new.trade_id, dirty)
+                elif original is None or original.trade_id != new.trade_id:
+                    self.reset_sequence(new.trade_id, base)
+                self.insert(new, dirty)
+
+        if isinstance(history_data, TradeOverlay):
+            self.order_added(history_data.added, dirty)
+
+        for pair, index in dirty.items():
+            self.recompute(pair, index)
+
+        if self.reference is not None:
+            self.reference.apply_changes(changes, history_data)
+            self.validate(dirty)
+
+        return set(dirty)
+
+    def new_pair(self, pair):
+        """
+        Returns the sorted trades and running totals of a pair, creating them if needed. Pairs start with integer running totals, unless the engine always uses Decimal.
+        """
+        return self.pairs.setdefault(pair, {'keys': [], 'entries': [], 'states': [], 'fixed': self.arithmetic != 'decimal'})
+
+    @staticmethod
+    def entry(trade, key):
+        """
+        Returns the sorted entry of a trade: its key, UUID and side, its quantity and price as Decimals, and as integers of 1e-8 units, or None if they have more than 8 decimals.
+        """
+        quantity, price = trade.quantity, trade.price
+        if type(quantity) is not Decimal or type(price) is not Decimal:
+            quantity, price = Decimal(str(quantity)), Decimal(str(price))
+        return (key, trade.trade_id, trade.side.lower(), quantity, price, to_fixed(quantity), to_fixed(price))
+
+    def reset_sequence(self, trade_id, base):
+        """
+        Drops the insertion sequence a deleted trade kept, as it is added back, unless it is one of the base trades, of the data file. Those come back at their place in the data file, other trades after all of them.
+        """
+        if trade_id in self.sequences and trade_id not in base:
+            del self.sequences[trade_id]
+
+    def order_added(self, added, dirty):
+        """
+        Gives the trades added on top of the data file increasing insertion sequences, in the order of the overlay holding them. Undoing the deletion of a pending trade puts it back at its place among them, so trades out of order are inserted again with a new sequence, which costs the number of added trades.
+        """
+        previous = -1
+        for trade in added:
+            sequence = self.sequences[trade.trade_id]
+            if sequence < previous:
+                self.remove(trade.trade_id, dirty)
+                del self.sequences[trade.trade_id]
+                self.insert(trade, dirty)
+                sequence = self.sequences[trade.trade_id]
+            previous = sequence
+
+    def insert(self, trade, dirty):
+        """
+        Inserts a trade at its date position in its pair and marks the pair dirty from that position.
+        """
+        # Same-date trades keep the order in which they were first seen, like a stable sort of the history
+        sequence = self.sequences.get(trade.trade_id)
+        if sequence is None:
+            sequence = self.sequences[trade.trade_id] = self.next_sequence
+            self.next_sequence += 1
+        key = (day_ordinal(trade.date), sequence)
+
+        pair = self.new_pair(trade.pair)
+        index = bisect_left(pair['keys'], key)
+        pair['keys'].insert(index, key)
+        pair['entries'].insert(index, self.entry(trade, key))
+        pair['states'].insert(index, None)
+        self.trades[trade.trade_id] = (trade, key)
+        self.mark_dirty(dirty, trade.pair, index)
+
+    def remove(self, trade_id, dirty):
+        """
+        Removes a trade from its pair and marks the pair dirty from the position it occupied.
+        """
+        trade, key = self.trades.pop(trade_id)
+        pair = self.pairs[trade.pair]
+        index = bisect_left(pair['keys'], key)
+        del pair['keys'][index]
+        del pair['entries'][index]
+        del pair['states'][index]
+        self.mark_dirty(dirty, trade.pair, index)
+
+    @staticmethod
+    def mark_dirty(dirty, pair, index):
+        """
+        Records the earliest position from which a pair's running totals need to be replayed.
+        """
+        dirty[pair] = min(dirty.get(pair, index), index)
+
+    def recompute(self, pair, index):
+        """
+        Replays a pair's trades from the given position onwards, starting from the running totals of the trade just before it. A pair whose amounts don't fit the integer arithmetic is replayed from its first trade with Decimal, and stays that way.
+        """
+        position = self.pairs[pair]
+        if not position['entries']:
+            del self.pairs[pair]
+            return
+
+        if position['fixed']:
+            try:
+                self.recompute_fixed(position, index)
+                return
+            except FixedPointOverflow:
+                position['fixed'] = False
+                index = 0
+
+        self.recompute_decimal(position, index)
+
+    @staticmethod
+    def recompute_decimal(position, index):
+        """
+        Replays trades with Decimal, rounding to 8 decimals at every sell.
+        """
+        if index > 0:
+            total_quantity, total_value, total_pnl = position['states'][index - 1]
+        else:
+            total_quantity, total_value, total_pnl = Decimal('0'), Decimal('0'), Decimal('0')
+
+        states = position['states']
+        for i, (_, _, side, quantity, price, _, _) in enumerate(position['entries'][index:], start=index):
+            # Accumulate quantity and value for buy trades to calculate average buy price
+            if side == 'buy':
+                total_quantity += quantity
+                total_value += quantity * price
+            elif side == 'sell' and total_quantity > 0:
+                # Calculate PnL based on the difference from the average buy price
+                average_buy_price = (total_value / total_quantity).quantize(decimal_places, ROUND_HALF_UP)
+                pnl = ((price - average_buy_price) * quantity).quantize(decimal_places, ROUND_HALF_UP)
+                total_pnl += pnl
+                # Adjust total quantity and value after sell
+                total_quantity -= quantity
+                total_value -= quantity * average_buy_price
+            states[i] = (total_quantity, total_value, total_pnl)
+
+    @staticmethod
+    def recompute_fixed(position, index):
+        """
+        Replays trades with integers: quantities and PnL in 1e-8 units, values in 1e-16 units so products stay exact. Raises FixedPointOverflow as soon as an amount could have been rounded by the Decimal path, which leaves the states partly updated.
+        """
+        if index > 0:
+            total_quantity, total_value, total_pnl = position['states'][index - 1]
+        else:
+            # The PnL stays None until the first sell, the Decimal path then shows 0 instead of 0E-8
+            total_quantity, total_value, total_pnl = 0, 0, None
+
+        states = position['states']
+        for i, (_, _, side, _, _, quantity, price) in enumerate(position['entries'][index:], start=index):
+            if quantity is None or price is None:
+                raise FixedPointOverflow(i)
+            # Plain comparisons against LIMIT keep the common case inline, check only runs for larger amounts
+            if side == 'buy':
+                value = quantity * price
+                total_quantity += quantity
+                total_value += value
+                if not (-LIMIT < value < LIMIT and -LIMIT < total_value < LIMIT and total_quantity < LIMIT):
+                    check(value), check(total_value), check(total_quantity)
+            elif side == 'sell' and total_quantity > 0:
+                # Fast path of divide, away from ties the first rounding to the context precision doesn't matter
+                average_buy_price, remainder = divmod(total_value, total_quantity)
+                distance = 2 * remainder - total_quantity
+                if not (0 <= average_buy_price < QUOTIENT_LIMIT and (distance if distance > 0 else -distance) * SCALE > total_quantity):
+                    average_buy_price = divide(total_value, total_quantity)
+                elif distance > 0:
+                    average_buy_price += 1
+                product = (price - average_buy_price) * quantity
+                pnl = (product + PRODUCT_HALF) // SCALE if product >= 0 else -((PRODUCT_HALF - product) // SCALE)
+                total_pnl = (total_pnl or 0) + pnl
+                value = quantity * average_buy_price
+                total_quantity -= quantity
+                total_value -= value
+                if not (-LIMIT < product < LIMIT and -LIMIT < value < LIMIT and -LIMIT < total_value < LIMIT and -LIMIT < total_pnl < LIMIT and -LIMIT < total_quantity):
+                    check(product), check(value), check(total_value), check(total_pnl), check(total_quantity), quantize_product(product)
+            states[i] = (total_quantity, total_value, total_pnl)
+
+    def position(self, pair):
+        """
+        Returns the displayed values of a pair's position: quantity, average price, value and PnL, with '-' placeholders for closed positions, or None if the pair has no trades.
+        """
+        position = self.pairs.get(pair)
+        if position is None:
+            return None
+
+        total_quantity, total_value, total_pnl = position['states'][-1]
+        if position['fixed']:
+            total_pnl = Decimal('0') if total_pnl is None else to_decimal(total_pnl)
+            if total_quantity > 0:
+                try:
+                    average_price = divide(total_value, total_quantity)
+                except FixedPointOverflow:
+                    position['fixed'] = False
+                    self.recompute_decimal(position, 0)
+                    return self.position(pair)
+                return [to_decimal(total_quantity), to_decimal(average_price, total_value < 0), to_decimal(quantize_product(total_value), total_value < 0), total_pnl]
+            return ['-', '-', '-', total_pnl]
+
+        if total_quantity > Decimal('0'):
+            average_price = total_value / total_quantity
+            return [total_quantity.quantize(decimal_places, ROUND_HALF_UP), average_price.quantize(decimal_places, ROUND_HALF_UP), total_value.quantize(decimal_places, ROUND_HALF_UP), total_pnl]
+        return ['-', '-', '-', total_pnl]
+
+    def positions(self):
+        """
+        Returns the displayed values of every pair's position, keyed by pair.
+        """
+        return {pair: self.position(pair) for pair in self.pairs}
+
+    def validate(self, pairs):
+        """
+        In validation mode, raises PositionsMismatch if the given pairs' positions differ from the Decimal engine's, down to their string representation.
+        """
+        if self.reference is None:
+            return
+        for pair in pairs:
+            position, expected = self.position(pair), self.reference.position(pair)
+            if position != expected or list(map(str, position or ())) != list(map(str, expected or ())):
+                raise PositionsMismatch(f"{pair}: {position} instead of {expected}")
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from importlib.util import find_spec
+
+from core.fixed_point import SCALE
+
+# Decimals are sorted on integers of 1e-8 units, the precision trades are displayed with, since comparing ints is
+# several times faster than comparing Decimals
+SORT_KEY_SCALE = Decimal(SCALE)
+
+# NumPy is optional, without it keys are sorted by sorted(). It is only imported by the first large sort
+NUMPY_INSTALLED = find_spec('numpy') is not None
+np = None
+
+# Lists of at least this many integer keys are sorted by NumPy, when installed
+NUMPY_SORT_THRESHOLD = 20000
+
+
+def decimal_sort_key(value):
+    """
+    Returns the integer sort key of a Decimal, its value in 1e-8 units rounded toward zero. Keys keep the order of the values, only values closer than 1e-8 may compare equal.
+    """
+    return int(value * SORT_KEY_SCALE)
+
+
+def decimal_sort_keys(values):
+    """
+    Returns the integer sort keys of an iterable of Decimals as a list, like decimal_sort_key, computed by builtins without a Python call per value.
+    """
+    return list(map(int, map(SORT_KEY_SCALE.__mul__, values)))
+
+
+def sort_order(keys, descending=False):
+    """
+    Returns the indexes of a list of keys in sorted order, equal keys keeping the order of their indexes in both directions, like sorted(range(len(keys)), key=keys.__getitem__, reverse=descending). Large lists of integer keys fitting in 64 bits are sorted by NumPy when it is installed.
+    """
+    global np
+    if NUMPY_INSTALLED and len(keys) >= NUMPY_SORT_THRESHOLD and type(keys[0]) is int:
+        if np is None:
+            import numpy as np
+        try:
+            array = np.fromiter(keys, dtype=np.int64, count=len(keys))
+        except (OverflowError, TypeError):
+            array = None
+        # Descending keys are sorted negated, which the smallest int64 doesn't survive
+        if array is not None and not (descending and array.min() == np.iinfo(np.int64).min):
+            return np.argsort(np.negative(array) if descending else array, kind='stable').tolist()
+    return sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)
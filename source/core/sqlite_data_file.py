@@ -0,0 +1,124 @@
+import os
+import sqlite3
+from decimal import Decimal
+
+from core.trade import Trade
+
+SQLITE_MAGIC = b'SQLite format 3\x00'
+SQLITE_SCHEMA_VERSION = 1
+
+# Saving to a path with one of these extensions uses the SQLite backend
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+# Older files have indexes on pair and date that no query uses, they only slow down saving and are dropped on open
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    pair TEXT NOT NULL,
+    side TEXT NOT NULL,
+    date TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    price TEXT NOT NULL
+);
+DROP INDEX IF EXISTS trades_pair_date;
+DROP INDEX IF EXISTS trades_date;
+"""
+
+
+def is_sqlite_data_file(file):
+    """
+    Returns True if the file, opened in binary mode, is an SQLite database, leaving it positioned at the start.
+    """
+    magic = file.read(len(SQLITE_MAGIC))
+    file.seek(0)
+    return magic == SQLITE_MAGIC
+
+
+def is_sqlite_path(file_path):
+    """
+    Returns True if saving to the given path should use the SQLite backend, based on its extension.
+    """
+    return os.path.splitext(file_path)[1].lower() in SQLITE_EXTENSIONS
+
+
+class SQLiteDataFile:
+    def __init__(self, file_path):
+        """
+        Opens, or creates, an SQLite data file. Trades are stored one per row with quantities and prices as text, so Decimals round-trip exactly, and trades are looked up by UUID when saving changes.
+        """
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SQLITE_SCHEMA_VERSION:
+            self.connection.close()
+            raise ValueError(f"Wrong file version: {file_path} - {version} instead of {SQLITE_SCHEMA_VERSION}")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.connection.close()
+
+    def count(self):
+        """
+        Returns the number of trades in the file.
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def rows(self):
+        """
+        Yields the trades in insertion order.
+        """
+        for row in self.connection.execute("SELECT id, pair, side, date, quantity, price FROM trades ORDER BY seq"):
+            yield self.trade(row)
+
+    @staticmethod
+    def trade(row):
+        """
+        Converts a database row to a trade, turning quantity and price back into Decimals.
+        """
+        trade_id, pair, side, date, quantity, price = row
+        return Trade(trade_id, pair, side, date, Decimal(quantity), Decimal(price))
+
+    @staticmethod
+    def parameters(trade):
+        """
+        Converts a trade to the parameters of an insert or update statement.
+        """
+        trade_id, pair, side, date, quantity, price = trade
+        return trade_id, pair, side, date, str(quantity), str(price)
+
+    def replace_all(self, trades):
+        """
+        Replaces every trade in the file with the given ones, in a single transaction.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM trades")
+            self.connection.executemany("INSERT INTO trades (id, pair, side, date, quantity, price) VALUES (?, ?, ?, ?, ?, ?)", map(self.parameters, trades))
+
+    def apply_changes(self, changes):
+        """
+        Applies change log entries to the file in a single transaction, touching only the rows they add, edit or delete. Either all of them are applied or none is.
+        """
+        with self.connection:
+            for change in changes:
+                change_type = change['change_type']
+                if change_type == 'add':
+                    self.connection.execute("INSERT INTO trades (id, pair, side, date, quantity, price) VALUES (?, ?, ?, ?, ?, ?) "
+                                            "ON CONFLICT (id) DO UPDATE SET pair = excluded.pair, side = excluded.side, date = excluded.date, quantity = excluded.quantity, price = excluded.price",
+                                            self.parameters(change['new_data']))
+                elif change_type == 'edit':
+                    trade_id, *values = self.parameters(change['new_data'])
+                    self.connection.execute("UPDATE trades SET pair = ?, side = ?, date = ?, quantity = ?, price = ? WHERE id = ?", (*values, trade_id))
+                elif change_type == 'delete':
+                    self.connection.execute("DELETE FROM trades WHERE id = ?", (change['original_data'].trade_id,))
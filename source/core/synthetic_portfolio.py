@@ -0,0 +1,74 @@
+import math
+import uuid
+import random
+from datetime import date
+from decimal import Decimal
+
+from core.trade import Trade, BUY, SELL
+
+# Pair names used first, larger portfolios continue with numbered altcoins
+PAIR_NAMES = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT', 'XRPUSDT', 'ADAUSDT', 'DOGEUSDT', 'DOTUSDT', 'AVAXUSDT', 'LINKUSDT',
+              'MATICUSDT', 'LTCUSDT', 'ATOMUSDT', 'UNIUSDT', 'XLMUSDT', 'ETCUSDT', 'NEARUSDT', 'FILUSDT', 'AAVEUSDT', 'ALGOUSDT']
+
+# Prices start and stay between these bounds, the random walk bouncing back off them
+PRICE_RANGE = (1e-3, 10 ** 4.5)
+
+
+def pair_names(pair_count):
+    """
+    Returns the names of the given number of pairs.
+    """
+    return PAIR_NAMES[:pair_count] + [f"ALT{i}USDT" for i in range(len(PAIR_NAMES), pair_count)]
+
+
+def to_amount(value, digits=6):
+    """
+    Returns a float as a Decimal with about the given number of significant digits and at most 8 decimals, like the amounts typed in the trade dialogs. Amounts never round down to zero.
+    """
+    decimals = min(8, max(0, digits - 1 - math.floor(math.log10(value))))
+    return max(Decimal(f"{value:.{decimals}f}"), Decimal('1E-8'))
+
+
+def generate_trades(trade_count, pair_count=20, sell_ratio=0.3, start_date='2020-01-01', end_date='2024-12-31', seed=0):
+    """
+    Returns a reproducible list of synthetic trades for benchmarks, in chronological order. Trades are spread over the pairs with a long tail, a few pairs holding most of them like a real portfolio, and prices follow a random walk per pair, within PRICE_RANGE. About sell_ratio of the trades are sells of part or all of the position held, so positions never go negative and some of them are closed out.
+    """
+    generator = random.Random(seed)
+    names = pair_names(pair_count)
+    weights = [1 / (rank + 1) for rank in range(pair_count)]
+    prices = {name: 10 ** generator.uniform(math.log10(PRICE_RANGE[0]), math.log10(PRICE_RANGE[1])) for name in names}
+    held = {name: Decimal('0') for name in names}
+
+    first_day = date.fromisoformat(start_date).toordinal()
+    last_day = date.fromisoformat(end_date).toordinal()
+    days = sorted(generator.randint(first_day, last_day) for _ in range(trade_count))
+    pairs = generator.choices(names, weights, k=trade_count)
+
+    trades = []
+    for day, pair in zip(days, pairs):
+        prices[pair] *= math.exp(generator.gauss(0, 0.03))
+        # Without bounds, the walks of large portfolios drift to amounts the data files can't store
+        if prices[pair] < PRICE_RANGE[0]:
+            prices[pair] = PRICE_RANGE[0] ** 2 / prices[pair]
+        elif prices[pair] > PRICE_RANGE[1]:
+            prices[pair] = PRICE_RANGE[1] ** 2 / prices[pair]
+        price = to_amount(prices[pair])
+
+        if held[pair] > 0 and generator.random() < sell_ratio:
+            side = SELL
+            # Close out the position now and then, otherwise sell part of it
+            if generator.random() < 0.1:
+                quantity = held[pair]
+            else:
+                quantity = min(held[pair], to_amount(float(held[pair]) * generator.uniform(0.05, 0.9)))
+            held[pair] -= quantity
+        else:
+            side = BUY
+            # Orders worth between 10 and 5000 of the quote currency
+            quantity = to_amount(10 ** generator.uniform(1, 3.7) / prices[pair])
+            held[pair] += quantity
+
+        trade_id = str(uuid.UUID(int=generator.getrandbits(128), version=4))
+        trades.append(Trade(trade_id, pair, side, date.fromordinal(day).isoformat(), quantity, price))
+
+    return trades
@@ -0,0 +1,113 @@
+import sys
+from decimal import Decimal, Context, MAX_PREC
+
+from core.day_ordinals import canonical_day
+
+BUY = 'Buy'
+SELL = 'Sell'
+SIDES = (BUY, SELL)
+
+TRADE_FIELDS = ('trade_id', 'pair', 'side', 'date', 'quantity', 'price')
+
+# Amounts are made canonical without rounding, whatever their number of digits
+AMOUNT_CONTEXT = Context(prec=MAX_PREC)
+
+
+def canonical_amount(value):
+    """
+    Returns a Decimal amount without trailing zeros, and integers without an exponent, so '1.50' becomes 1.5 and '100.0' becomes 100, the form the binary format reads amounts back in. Other values are returned as is.
+    """
+    if type(value) is not Decimal or not value.is_finite():
+        return value
+    value = value.normalize(AMOUNT_CONTEXT)
+    if value == value.to_integral_value():
+        return Decimal(int(value))
+    return value
+
+
+class Trade:
+    __slots__ = TRADE_FIELDS
+
+    def __init__(self, trade_id, pair, side, date, quantity, price):
+        """
+        Initializes a trade. Pairs, sides and dates repeat across trades, so they are interned and every trade shares the same string objects instead of holding its own copies. Dates and amounts are stored in their canonical form, so a trade reads back identical from every data file format.
+        """
+        self.trade_id = trade_id
+        self.pair = sys.intern(pair)
+        self.side = sys.intern(side)
+        self.date = canonical_day(date)
+        self.quantity = canonical_amount(quantity)
+        self.price = canonical_amount(price)
+
+    @classmethod
+    def from_canonical(cls, trade_id, pair, side, date, quantity, price):
+        """
+        Returns a trade from a date and amounts already in their canonical form, such as those read from the binary format, skipping their conversion.
+        """
+        trade = cls.__new__(cls)
+        trade.trade_id = trade_id
+        trade.pair = sys.intern(pair)
+        trade.side = sys.intern(side)
+        trade.date = sys.intern(date)
+        trade.quantity = quantity
+        trade.price = price
+        return trade
+
+    @classmethod
+    def from_list(cls, values):
+        """
+        Returns a trade from a [trade_id, pair, side, date, quantity, price] list, as stored in data files and the change log, or the trade itself if it already is one.
+        """
+        if isinstance(values, cls):
+            return values
+        return cls(*values)
+
+    def to_list(self):
+        """
+        Returns the trade as a [trade_id, pair, side, date, quantity, price] list, ready to be serialized.
+        """
+        return [self.trade_id, self.pair, self.side, self.date, self.quantity, self.price]
+
+    def replace(self, **fields):
+        """
+        Returns a copy of the trade with the given fields changed.
+        """
+        values = {field: getattr(self, field) for field in TRADE_FIELDS}
+        values.update(fields)
+        return Trade(**values)
+
+    def __iter__(self):
+        """
+        Iterates over the fields in the order of the list representation, so trades can be unpacked like lists.
+        """
+        return iter((self.trade_id, self.pair, self.side, self.date, self.quantity, self.price))
+
+    def __len__(self):
+        """
+        Returns the number of fields, like the length of the list representation.
+        """
+        return len(TRADE_FIELDS)
+
+    def __getitem__(self, index):
+        """
+        Returns a field by its index in the list representation, for code that still indexes trades like lists.
+        """
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        return getattr(self, TRADE_FIELDS[index])
+
+    def __eq__(self, other):
+        """
+        Compares trades field by field. Trades also compare equal to lists and tuples holding the same values.
+        """
+        if isinstance(other, (Trade, list, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        """
+        Returns a representation of the trade that can be evaluated back into it.
+        """
+        return f"Trade({self.trade_id!r}, {self.pair!r}, {self.side!r}, {self.date!r}, {self.quantity!r}, {self.price!r})"
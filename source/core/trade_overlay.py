@@ -0,0 +1,116 @@
+from itertools import chain, filterfalse, tee
+
+from core.trade_store import TradeStore
+
+
+class TradeOverlay:
+    def __init__(self, base=()):
+        """
+        Initializes a view of base trades with the same interface as a TradeStore. The base store is shared rather than copied: adds, edits and deletes are recorded by UUID on top of it and never touch it, so replaying the change log costs the size of the changes rather than of the portfolio.
+        """
+        self.base = base if isinstance(base, TradeStore) else TradeStore(base)
+        # Base trades replaced or removed, by UUID, and the trades added on top of the base in insertion order
+        self.edited = {}
+        self.deleted = set()
+        self.added = TradeStore()
+
+    def __iter__(self):
+        """
+        Iterates over the trades in the order a TradeStore applying the same changes would, base trades first with edited ones in their original position, then added trades. The base is walked by builtins, without a Python call per trade.
+        """
+        trades = self.base.trades
+        if self.deleted:
+            ids, kept_ids = tee(filterfalse(self.deleted.__contains__, trades))
+            base_trades = map(self.edited.get, ids, map(trades.__getitem__, kept_ids))
+        elif self.edited:
+            base_trades = map(self.edited.get, trades, trades.values())
+        else:
+            base_trades = iter(trades.values())
+        return chain(base_trades, self.added)
+
+    def __len__(self):
+        """
+        Returns the number of trades in the view.
+        """
+        return len(self.base) - len(self.deleted) + len(self.added)
+
+    def __contains__(self, trade_id):
+        """
+        Returns True if a trade with the given UUID is in the view.
+        """
+        return trade_id in self.added or (trade_id in self.base and trade_id not in self.deleted)
+
+    def in_base(self, trade_id):
+        """
+        Returns True if the trade with the given UUID comes from the base and wasn't deleted.
+        """
+        return trade_id in self.base and trade_id not in self.deleted
+
+    def get(self, trade_id):
+        """
+        Returns the trade with the given UUID, or None if it isn't in the view.
+        """
+        if trade_id in self.added:
+            return self.added.get(trade_id)
+        if not self.in_base(trade_id):
+            return None
+        return self.edited.get(trade_id, self.base.get(trade_id))
+
+    def add(self, trade):
+        """
+        Appends a trade to the view, or replaces the trade sharing its UUID in place like TradeStore.add. A deleted base trade added again goes after the base, as it would in a store.
+        """
+        if self.in_base(trade.trade_id):
+            self.edited[trade.trade_id] = trade
+        else:
+            self.added.add(trade)
+
+    def replace(self, trade):
+        """
+        Replaces the trade sharing the given trade's UUID, keeping its position. Does nothing if no such trade is in the view.
+        """
+        if trade.trade_id in self.added:
+            self.added.replace(trade)
+        elif self.in_base(trade.trade_id):
+            self.edited[trade.trade_id] = trade
+
+    def remove(self, trade_id):
+        """
+        Removes the trade with the given UUID, if it is in the view.
+        """
+        if trade_id in self.added:
+            self.added.remove(trade_id)
+        elif self.in_base(trade_id):
+            self.deleted.add(trade_id)
+            self.edited.pop(trade_id, None)
+
+    def copy(self):
+        """
+        Returns a view of the same base with a copy of the changes on top of it.
+        """
+        overlay = TradeOverlay(self.base)
+        overlay.edited = self.edited.copy()
+        overlay.deleted = self.deleted.copy()
+        overlay.added = self.added.copy()
+        return overlay
+
+    def to_list(self):
+        """
+        Returns the trades as [trade_id, pair, side, date, quantity, price] lists in iteration order, ready to be serialized.
+        """
+        return [trade.to_list() for trade in self]
+
+    def materialize(self):
+        """
+        Applies the changes to the base store in place and returns it, leaving the view empty on top of it. Other views of the same base are invalidated, so this is only done once the view replaces the base, after saving.
+        """
+        for trade_id in self.deleted:
+            self.base.remove(trade_id)
+        for trade in self.edited.values():
+            self.base.replace(trade)
+        for trade in self.added:
+            self.base.add(trade)
+        self.edited = {}
+        self.deleted = set()
+        self.added = TradeStore()
+        return self.base
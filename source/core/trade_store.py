@@ -0,0 +1,63 @@
+class TradeStore:
+    def __init__(self, trades=()):
+        """
+        Initializes the store from trades, indexing them by UUID while keeping their insertion order.
+        """
+        self.trades = {trade.trade_id: trade for trade in trades}
+
+    def __iter__(self):
+        """
+        Iterates over the trades in insertion order, edited trades keeping their original position.
+        """
+        return iter(self.trades.values())
+
+    def __len__(self):
+        """
+        Returns the number of trades in the store.
+        """
+        return len(self.trades)
+
+    def __contains__(self, trade_id):
+        """
+        Returns True if a trade with the given UUID is in the store.
+        """
+        return trade_id in self.trades
+
+    def get(self, trade_id):
+        """
+        Returns the trade with the given UUID, or None if it isn't in the store.
+        """
+        return self.trades.get(trade_id)
+
+    def add(self, trade):
+        """
+        Appends a trade to the store.
+        """
+        self.trades[trade.trade_id] = trade
+
+    def replace(self, trade):
+        """
+        Replaces the trade sharing the given trade's UUID, keeping its position. Does nothing if no such trade is in the store.
+        """
+        if trade.trade_id in self.trades:
+            self.trades[trade.trade_id] = trade
+
+    def remove(self, trade_id):
+        """
+        Removes the trade with the given UUID, if it is in the store.
+        """
+        self.trades.pop(trade_id, None)
+
+    def copy(self):
+        """
+        Returns a shallow copy of the store, sharing the trade lists but not the index.
+        """
+        store = TradeStore()
+        store.trades = self.trades.copy()
+        return store
+
+    def to_list(self):
+        """
+        Returns the trades as [trade_id, pair, side, date, quantity, price] lists in insertion order, ready to be serialized.
+        """
+        return [trade.to_list() for trade in self.trades.values()]
@@ -0,0 +1,116 @@
+from importlib.util import find_spec
+
+from core.day_ordinals import day_ordinal
+from core.fixed_point import FixedPointOverflow, LIMIT, divide, quantize_product
+
+# NumPy is optional, without it every load goes through the per-trade path. It is only imported by the first bulk
+# load, so small files and the command line don't pay for the import
+NUMPY_INSTALLED = find_spec('numpy') is not None
+np = None
+
+# Full loads of at least this many trades are sorted and scanned in bulk, when NumPy is installed
+POSITIONS_BATCH_THRESHOLD = 20000
+
+
+def batch_available():
+    """
+    Returns True if NumPy is installed, so the vectorized backend can be used.
+    """
+    return NUMPY_INSTALLED
+
+
+def load_batch(engine, history_data):
+    """
+    Fills an empty engine with every trade at once: trades are grouped by pair and sorted by date with a single argsort, and each pair's running totals come from cumulative sums, only looping over its sells. Returns the set of loaded pairs.
+    """
+    global np
+    if np is None:
+        import numpy as np
+
+    trades = list(history_data)
+    days = np.array([day_ordinal(trade.date) for trade in trades], dtype=np.int64)
+
+    pair_names, pair_codes = np.unique(np.array([trade.pair for trade in trades], dtype=object), return_inverse=True)
+    # Stable sort on (pair, date), same-date trades keep their history order
+    order = np.lexsort((days, pair_codes))
+    bounds = np.flatnonzero(np.diff(pair_codes[order])) + 1
+
+    first_sequence = engine.next_sequence
+    engine.next_sequence += len(trades)
+
+    loaded = set()
+    for group in np.split(order, bounds):
+        if not len(group):
+            continue
+        pair = engine.new_pair(pair_names[pair_codes[group[0]]])
+        keys, entries = pair['keys'], pair['entries']
+        for index, day in zip(group.tolist(), days[group].tolist()):
+            trade = trades[index]
+            sequence = first_sequence + index
+            key = (day, sequence)
+            keys.append(key)
+            entries.append(engine.entry(trade, key))
+            engine.sequences[trade.trade_id] = sequence
+            engine.trades[trade.trade_id] = (trade, key)
+
+        pair['states'] = scan(entries) if pair['fixed'] else None
+        if pair['states'] is None:
+            # Amounts that don't fit, or sells of more than the position, are replayed one trade at a time
+            pair['states'] = [None] * len(entries)
+            engine.recompute(trades[group[0]].pair, 0)
+        loaded.add(trades[group[0]].pair)
+
+    return loaded
+
+
+def scan(entries):
+    """
+    Returns the running totals after each of a pair's sorted entries, as the integer replay computes them, or None if they can't be computed in bulk. The quantity is a cumulative sum. The value is the cumulative sum of the bought values, adjusted at every sell by the value sold at the average price, which is the only part computed one sell at a time.
+    """
+    _, _, sides, _, _, quantities, prices = zip(*entries)
+    if None in quantities or None in prices:
+        return None
+
+    sides = np.array(sides)
+    buys = sides == 'buy'
+    sells = np.flatnonzero(sides == 'sell')
+    signs = buys.astype(np.int64) - (sides == 'sell')
+
+    # Python integers in object arrays keep the sums exact, NumPy only drives the loops
+    total_quantities = np.cumsum(np.array(quantities, dtype=object) * signs)
+    # The replay ignores sells while the position is empty, the cumulative quantity doesn't apply to those
+    if len(sells) and (sells[0] == 0 or min(total_quantities[sells - 1]) <= 0):
+        return None
+    bought_values = np.array(quantities, dtype=object) * np.array(prices, dtype=object) * buys
+    cumulative_values = np.cumsum(bought_values)
+
+    total_quantity_list = total_quantities.tolist()
+    cumulative_value_list = cumulative_values.tolist()
+    adjustments = [0] * len(entries)
+    pnls = [0] * len(entries)
+    adjustment = 0
+    try:
+        for i in sells.tolist():
+            total_quantity = total_quantity_list[i - 1]
+            quantity = quantities[i]
+            average_buy_price = divide(cumulative_value_list[i - 1] + adjustment, total_quantity)
+            product = (prices[i] - average_buy_price) * quantity
+            value = quantity * average_buy_price
+            if not (-LIMIT < product < LIMIT and -LIMIT < value < LIMIT):
+                return None
+            pnls[i] = quantize_product(product)
+            adjustments[i] = -value
+            adjustment -= value
+    except FixedPointOverflow:
+        return None
+
+    total_values = (cumulative_values + np.cumsum(np.array(adjustments, dtype=object))).tolist()
+    total_pnls = np.cumsum(np.array(pnls, dtype=object)).tolist()
+    for amounts in (total_quantity_list, bought_values, total_values, total_pnls):
+        if not (-LIMIT < min(amounts) and max(amounts) < LIMIT):
+            return None
+
+    # The PnL stays None until the first sell
+    first_sell = sells[0] if len(sells) else len(entries)
+    total_pnls[:first_sell] = [None] * first_sell
+    return list(zip(total_quantity_list, total_values, total_pnls))
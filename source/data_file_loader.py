@@ -0,0 +1,47 @@
+import threading
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from core import read_data_file, LoadCancelled, TradeStore
+
+
+class DataFileLoader(QObject):
+    progress = pyqtSignal(int)
+    loaded = pyqtSignal(str, object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_path, parent=None):
+        """
+        Initializes a worker that reads the given data file off the GUI thread. Move it to a QThread and connect the thread's started signal to run.
+        """
+        super().__init__(parent)
+        self.file_path = file_path
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        """
+        Reads the data file and emits loaded with the file path and the resulting TradeStore, failed with an error message, or cancelled if cancel was called in the meantime.
+        """
+        try:
+            store = read_data_file(self.file_path, self.report_progress, self.cancel_event.is_set)
+        except FileNotFoundError:
+            # File doesn't exist, start empty, it is created on save
+            self.loaded.emit(self.file_path, TradeStore())
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.loaded.emit(self.file_path, store)
+
+    def report_progress(self, done, total):
+        """
+        Emits the progress as a percentage of rows converted.
+        """
+        self.progress.emit(done * 100 // total if total else 100)
+
+    def cancel(self):
+        """
+        Asks the worker to stop, it is safe to call from the GUI thread while the worker is running.
+        """
+        self.cancel_event.set()
@@ -1,24 +1,26 @@
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPalette, QFont
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QTableWidget, QHeaderView, QComboBox
-from datetime import datetime
 from decimal import Decimal, InvalidOperation
 
-from constants import red, green, light_gray
+from constants import light_gray
 from custom_double_validator import CustomDoubleValidator
+from side_color_delegate import side_color
+from core import Trade, day_ordinal
 
 
 class EditTradeDialog(QDialog):
-    def __init__(self, trade_data, uuid, parent=None):
+    def __init__(self, trade, parent=None):
         """
-        Initialize the dialog for editing a trade with the provided trade data and UUID.
+        Initialize the dialog for editing the provided trade.
         """
         super().__init__(parent)
         self.setWindowTitle(f"Edit trade")
         self.setFixedSize(600, 220)
 
         self.new_data = None
-        self.uuid = uuid
+        self.uuid = trade.trade_id
+        trade_data = [trade.pair, trade.side, trade.date, str(trade.quantity), str(trade.price)]
 
         layout = QVBoxLayout(self)
 
@@ -91,15 +93,14 @@ class EditTradeDialog(QDialog):
 
     def update_row_color(self, table, row, text):
         """
-        Update the row color in the table based on the text value. The row color is green for 'Buy', red for 'Sell', and light gray otherwise.
+        Update the row color in the table based on the text value. The row color is green for 'Buy', red for 'Sell', and light gray otherwise, set through a single palette shared by the row's widgets.
         """
-        color = green if text == 'Buy' else red if text == 'Sell' else light_gray
+        palette = table.palette()
+        palette.setColor(QPalette.ColorRole.Base, side_color(text, light_gray))
 
         for col in range(table.columnCount()):
             widget = table.cellWidget(row, col)
             if widget is not None:
-                palette = widget.palette()
-                palette.setColor(QPalette.ColorRole.Base, color)
                 widget.setPalette(palette)
 
     def validate_and_save_trade(self):
@@ -120,8 +121,8 @@ class EditTradeDialog(QDialog):
 
             # Third column (2) is "Date", and it's a line edit widget
             date_cell_widget = self.table.cellWidget(0, 2)
-            date = date_cell_widget.text()
-            datetime.strptime(date.replace(" ", ""), '%Y-%m-%d')  # Validates date format
+            date = date_cell_widget.text().replace(" ", "")
+            day_ordinal(date)  # Validates date format, and caches its ordinal for the positions engine
 
             # For "Quantity" and "Price", they are line edit widgets
             quantity_cell_widget = self.table.cellWidget(0, 3)
@@ -136,7 +137,7 @@ class EditTradeDialog(QDialog):
             except InvalidOperation:
                 raise ValueError("Invalid price")
 
-            self.new_data = [trade_id, pair, side, date, quantity, price]
+            self.new_data = Trade(trade_id, pair, side, date, quantity, price)
 
             self.accept()  # Close the dialog successfully
         except ValueError as e:
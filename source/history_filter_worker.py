@@ -0,0 +1,36 @@
+import threading
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from core import filter_rows, FilterCancelled
+
+
+class HistoryFilterWorker(QObject):
+    filtered = pyqtSignal(int, object)
+
+    def __init__(self, generation, text, rows, trades, pairs, parent=None):
+        """
+        Initializes a worker that filters a snapshot of the history rows off the GUI thread, keeping those whose trade is of one of the pairs matching the filter text. Move it to a QThread and connect the thread's started signal to run.
+        """
+        super().__init__(parent)
+        self.generation = generation
+        self.text = text
+        self.rows = rows
+        self.trades = trades
+        self.pairs = pairs
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        """
+        Filters the rows and emits filtered with the generation of the query and the rows kept, or nothing if cancel was called in the meantime.
+        """
+        try:
+            rows = filter_rows(self.rows, self.trades, self.pairs, self.cancel_event.is_set)
+        except FilterCancelled:
+            return
+        self.filtered.emit(self.generation, rows)
+
+    def cancel(self):
+        """
+        Asks the worker to stop, it is safe to call from the GUI thread while the worker is running.
+        """
+        self.cancel_event.set()
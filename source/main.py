@@ -1,28 +1,42 @@
 import os
 import sys
-import json
-from decimal import Decimal, ROUND_HALF_UP
-from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QHeaderView, QFileDialog, QMessageBox, QLabel, QLineEdit, QTableWidgetItem, QAbstractItemView, QStyle, QCheckBox, QToolBar, QSizePolicy, QDialog, QPushButton
-from PyQt6.QtCore import Qt, QEvent, QCoreApplication, QSettings
+from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableView, QHeaderView, QFileDialog, QMessageBox, QLabel, QLineEdit, QTableWidgetItem, QAbstractItemView, QStyle, QCheckBox, QToolBar, QSizePolicy, QDialog, QPushButton, QProgressDialog
+from PyQt6.QtCore import Qt, QEvent, QCoreApplication, QSettings, QThread, QTimer
 from PyQt6.QtGui import QShortcut, QKeySequence, QIcon, QPixmap, QAction
 
 from decimal_table_widget_item import DecimalTableWidgetItem
-from decimal_encoder import DecimalEncoder
 from add_trade_dialog import AddTradeDialog
 from edit_trade_dialog import EditTradeDialog
-from change_log import ChangeLog
-from datetime import datetime
+from core import ChangeLog, PositionsEngine, FilterIndex, TradeStore, TradeOverlay, write_data_file, write_json_data_file, INSTRUMENTATION, read_csv_file, load_csv_layouts
+from data_file_loader import DataFileLoader
 from confirm_change_dialog import ConfirmChangeDialog
-from constants import red, green
+from trade_history_model import TradeHistoryModel
+from trade_history_proxy_model import TradeHistoryProxyModel
+from side_color_delegate import SideColorDelegate
 
 CRYPTO_TRADES_TRACKER_VERSION = '1.0.3'
-DATA_FILE_VERSION = '1'
 SETTINGS_FILE = 'ctt_settings.ini'
 
-UUIDRole = Qt.ItemDataRole.UserRole + 1
+# Output of the cProfile capture of a single refresh, statistics and text report
+PROFILE_FILE = 'ctt_update_data.prof'
+PROFILE_REPORT_FILE = 'ctt_update_data.txt'
 
-# Set the desired precision: 8 decimal places
-decimal_places = Decimal('1E-8')
+# Stages shown by the debug readout, in pipeline order
+DEBUG_STAGES = ['update_data', 'apply_changes', 'process', 'write_changes', 'update_history', 'update_positions', 'filter_table', 'filter_history', 'save_data']
+
+DATA_FILE_FILTER = "Crypto Trades Tracker files (*.ctt);;Compressed Crypto Trades Tracker files (*.ctt.gz *.ctt.xz *.ctt.bz2);;SQLite databases (*.sqlite *.sqlite3 *.db)"
+OPEN_FILE_FILTER = "Crypto Trades Tracker files (*.ctt *.json *.sqlite *.sqlite3 *.db *.gz *.xz *.bz2);;All files (*)"
+JSON_FILE_FILTER = "JSON files (*.json);;Compressed JSON files (*.json.gz *.json.xz *.json.bz2)"
+CSV_FILE_FILTER = "CSV files (*.csv);;All files (*)"
+
+# Invalid rows listed when confirming an import, the others are only counted
+IMPORT_ERRORS_SHOWN = 10
+
+# Filters are applied once typing pauses for this long, in milliseconds
+FILTER_DEBOUNCE_MS = 200
+
+# Undoing or redoing more trades than this refreshes the tables from scratch, cheaper than one notification per row
+INCREMENTAL_CHANGES_LIMIT = 1000
 
 
 class MainWindow(QMainWindow):
@@ -37,9 +51,15 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(icon)
         self.center_window()
 
-        self.full_history_data = []
+        self.full_history_data = TradeStore()
+        # Trades currently displayed, the pending changes layered over the data file's trades
+        self.current_history = TradeOverlay(self.full_history_data)
         self.change_log = ChangeLog()
+        self.positions_engine = PositionsEngine()
+        # Pairs of the positions table, rebuilt with its rows, to resolve its filter text
+        self.positions_filter_index = FilterIndex()
         self.file_path = ''
+        self.data_file_loader = None
 
         self.update_title()
 
@@ -54,10 +74,14 @@ class MainWindow(QMainWindow):
         self.setup_button_bar()
         self.setup_tables()
         self.setup_shortcuts()
+        self.setup_debug_readout()
 
         # Load settings
         self.read_settings()
 
+        # Forget the changes of data files deleted a while ago
+        self.change_log.cleanup([self.file_path])
+
         # Load last data
         self.load_last_used_file()
 
@@ -77,7 +101,7 @@ class MainWindow(QMainWindow):
 
     def setup_button_bar(self):
         """
-        Configures the toolbar with actions for new file, open, save, save as, add trade, and help, including shortcuts and connections for their respective functionalities.
+        Configures the toolbar with actions for new file, open, save, save as, export JSON, add trade, and help, including shortcuts and connections for their respective functionalities.
         """
         toolbar = QToolBar("Main Toolbar")
         self.addToolBar(toolbar)
@@ -87,6 +111,8 @@ class MainWindow(QMainWindow):
         load_action = QAction("Open", self)
         save_action = QAction("Save", self)
         save_as_action = QAction("Save As...", self)
+        export_json_action = QAction("Export JSON...", self)
+        import_csv_action = QAction("Import CSV...", self)
         add_trade_action = QAction("Add Trade", self)
         help_action = QAction("?", self)
 
@@ -102,6 +128,8 @@ class MainWindow(QMainWindow):
         load_action.triggered.connect(lambda: self.load_data(None))
         save_action.triggered.connect(self.save)
         save_as_action.triggered.connect(self.save_as)
+        export_json_action.triggered.connect(self.export_json)
+        import_csv_action.triggered.connect(self.import_csv)
         add_trade_action.triggered.connect(self.add_trade)
         help_action.triggered.connect(self.help)
 
@@ -110,6 +138,8 @@ class MainWindow(QMainWindow):
         toolbar.addAction(load_action)
         toolbar.addAction(save_action)
         toolbar.addAction(save_as_action)
+        toolbar.addAction(export_json_action)
+        toolbar.addAction(import_csv_action)
         toolbar.addAction(add_trade_action)
 
         # Spacer widget
@@ -196,20 +226,26 @@ class MainWindow(QMainWindow):
             self.style().standardIcon(QStyle.StandardPixmap.SP_LineEditClearButton),
             QLineEdit.ActionPosition.TrailingPosition
         )
-        history_clear_action.triggered.connect(lambda: self.clear_filter(self.history_table, self.history_filter_text_box))
-
-        # History Table
-        self.history_table = QTableWidget(0, 6)
-        self.history_table.setHorizontalHeaderLabels(["Pair", "Side", "Date", "Quantity", "Price", "Value"])
+        history_clear_action.triggered.connect(self.history_filter_text_box.clear)
+
+        # History Table, a view over the trades so only visible rows are rendered
+        self.history_model = TradeHistoryModel(self)
+        self.history_proxy_model = TradeHistoryProxyModel(self)
+        self.history_proxy_model.setSourceModel(self.history_model)
+        self.history_table = QTableView()
+        self.history_table.setModel(self.history_proxy_model)
+        self.history_table.setItemDelegate(SideColorDelegate(1, parent=self.history_table))
         self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.history_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.history_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.history_table.sortItems(2, Qt.SortOrder.DescendingOrder)
+        self.history_table.setSortingEnabled(True)
+        self.history_table.sortByColumn(2, Qt.SortOrder.DescendingOrder)
         self.history_table.installEventFilter(self)
         history_layout.addWidget(self.history_table)
 
         # Connect double-click signal to edit_trade
-        self.history_table.itemDoubleClicked.connect(self.edit_trade)
+        self.history_table.doubleClicked.connect(self.edit_trade)
 
         # Add History Section to Main Layout
         self.tables_layout.addWidget(history_section)
@@ -217,9 +253,17 @@ class MainWindow(QMainWindow):
         # Add the tables container to the main window layout
         self.main_layout.addWidget(self.tables_container)
 
-        # Connect the filter's textChanged signal to the filtering function
-        self.positions_filter_text_box.textChanged.connect(lambda: self.filter_table(self.positions_table, self.positions_filter_text_box.text(), self.hide_closed_positions_checkbox.isChecked()))
-        self.history_filter_text_box.textChanged.connect(lambda: self.filter_table(self.history_table, self.history_filter_text_box.text()))
+        # Connect the filter's textChanged signal to the filtering function, once typing pauses
+        self.positions_filter_timer = QTimer(self)
+        self.positions_filter_timer.setSingleShot(True)
+        self.positions_filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.positions_filter_timer.timeout.connect(lambda: self.filter_table(self.positions_table, self.positions_filter_text_box.text(), self.hide_closed_positions_checkbox.isChecked()))
+        self.positions_filter_text_box.textChanged.connect(self.positions_filter_timer.start)
+        self.history_filter_timer = QTimer(self)
+        self.history_filter_timer.setSingleShot(True)
+        self.history_filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.history_filter_timer.timeout.connect(lambda: self.history_proxy_model.set_filter_text(self.history_filter_text_box.text()))
+        self.history_filter_text_box.textChanged.connect(self.history_filter_timer.start)
         self.hide_closed_positions_checkbox.stateChanged.connect(lambda: self.filter_table(self.positions_table, self.positions_filter_text_box.text(), self.hide_closed_positions_checkbox.isChecked()))
 
         self.positions_table.setFocus()
@@ -236,6 +280,49 @@ class MainWindow(QMainWindow):
         redo_shortcut = QShortcut(QKeySequence('Ctrl+Y'), self)
         redo_shortcut.activated.connect(self.redo_next_change)
 
+        # Hidden debug readout of the refresh timings: CTRL-SHIFT-D
+        debug_shortcut = QShortcut(QKeySequence('Ctrl+Shift+D'), self)
+        debug_shortcut.activated.connect(self.toggle_debug_readout)
+
+        # Hidden profile of a single refresh: CTRL-SHIFT-P
+        profile_shortcut = QShortcut(QKeySequence('Ctrl+Shift+P'), self)
+        profile_shortcut.activated.connect(self.profile_update_data)
+
+    def setup_debug_readout(self):
+        """
+        Sets up the status bar readout of the last duration of every refresh stage, hidden until toggled with its shortcut.
+        """
+        self.debug_label = QLabel()
+        self.statusBar().addWidget(self.debug_label)
+        self.statusBar().hide()
+
+    def toggle_debug_readout(self):
+        """
+        Shows or hides the status bar readout of the refresh timings.
+        """
+        self.statusBar().setHidden(not self.statusBar().isHidden())
+        self.update_debug_readout()
+
+    def update_debug_readout(self):
+        """
+        Refreshes the status bar readout with the last duration of every stage and the journal counters, if it is shown.
+        """
+        if self.statusBar().isHidden():
+            return
+        counters = INSTRUMENTATION.snapshot()['counters']
+        journal = f"journal {counters.get('journal_records', 0)} records, {counters.get('journal_bytes', 0)} bytes"
+        self.debug_label.setText(' | '.join(filter(None, [INSTRUMENTATION.summary(DEBUG_STAGES), journal])))
+
+    def profile_update_data(self):
+        """
+        Runs a single refresh under cProfile, then saves the statistics and a text report of the slowest functions to the current directory.
+        """
+        report = INSTRUMENTATION.profile(PROFILE_FILE, self.update_data)
+        with open(PROFILE_REPORT_FILE, 'w') as f:
+            f.write(report)
+        self.statusBar().show()
+        self.statusBar().showMessage(f"Profile saved to {os.path.abspath(PROFILE_FILE)} and {os.path.abspath(PROFILE_REPORT_FILE)}", 10000)
+
     def clear_filter(self, table_widget, filter_text_box):
         """
         Clears the filter text box and applies the updated (empty) filter to the specified table widget.
@@ -245,38 +332,92 @@ class MainWindow(QMainWindow):
 
     def load_data(self, file_path=None):
         """
-        Loads trading data from a JSON file, updates the application's data structures, and refreshes the UI, handling any errors that occur during the file loading process.
+        Loads trading data from a binary or JSON data file on a background thread, showing a cancellable progress dialog, and refreshes the UI once the file is read. The file is read once, its format and version being checked from the first bytes.
         """
         if file_path is None:
-            file_path, _ = QFileDialog.getOpenFileName(self, "Open JSON File", "", "JSON files (*.json)")
+            file_path, _ = QFileDialog.getOpenFileName(self, "Open File", "", OPEN_FILE_FILTER)
 
         if file_path:
-            self.save_last_used_file_path(file_path)
+            # A load still in progress is replaced, its result is dropped
+            if self.data_file_loader is not None:
+                self.data_file_loader.blockSignals(True)
+                self.data_file_loader.cancel()
+                self.stop_data_file_loader()
+
+            self.load_progress_dialog = QProgressDialog(f"Loading {os.path.basename(file_path)}...", "Cancel", 0, 100, self)
+            self.load_progress_dialog.setWindowTitle("Loading")
+            self.load_progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            self.load_progress_dialog.setMinimumDuration(500)
+            self.load_progress_dialog.setAutoClose(False)
+            self.load_progress_dialog.setAutoReset(False)
+
+            self.load_thread = QThread(self)
+            self.data_file_loader = DataFileLoader(file_path)
+            self.data_file_loader.moveToThread(self.load_thread)
+            self.load_thread.started.connect(self.data_file_loader.run)
+            self.data_file_loader.progress.connect(self.load_progress_dialog.setValue)
+            self.data_file_loader.loaded.connect(self.data_loaded)
+            self.data_file_loader.failed.connect(self.data_load_failed)
+            self.data_file_loader.cancelled.connect(self.data_load_cancelled)
+            # The loader's thread is busy reading until the load ends, so cancelling runs on the GUI thread
+            self.load_progress_dialog.canceled.connect(self.data_file_loader.cancel, Qt.ConnectionType.DirectConnection)
+            self.load_thread.start()
+
+    def data_loaded(self, file_path, history_data):
+        """
+        Replaces the application's data with the trades read by the background loader, then loads the file's change log and refreshes the tables and title.
+        """
+        if self.sender() is not self.data_file_loader:
+            return
+        self.stop_data_file_loader()
+        self.full_history_data = history_data
+        self.reset_positions()
+        self.save_last_used_file_path(file_path)
+        self.load_changes_with_prompt()
+        self.update_data()
+        self.update_title()
 
-            if not self.check_data_file_version(file_path):
-                return
+    def data_load_failed(self, error):
+        """
+        Reports an error raised by the background loader, keeping the previously loaded data.
+        """
+        if self.sender() is not self.data_file_loader:
+            return
+        self.stop_data_file_loader()
+        QMessageBox.critical(self, "Error", f"Error loading file: {error}")
+        self.data_load_ended()
 
-            try:
-                with open(self.file_path, 'r') as file:
-                    data = json.load(file)
-                    self.full_history_data = data['data'] if data['data'] else []
-
-                    # Convert specific fields back to Decimal
-                    for row in self.full_history_data:
-                        row[4] = Decimal(row[4])  # Quantity is at index 4
-                        row[5] = Decimal(row[5])  # Price is at index 5
-
-                    self.load_changes_with_prompt()
-                    self.update_data()
-                    self.update_title()
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Error loading file: {e}")
+    def data_load_cancelled(self):
+        """
+        Handles a load cancelled from its progress dialog, ignoring loads that were replaced by a newer one.
+        """
+        if self.sender() is self.data_file_loader:
+            self.data_load_ended()
+
+    def data_load_ended(self):
+        """
+        Handles a load that didn't complete. If nothing was ever loaded, for instance when opening the last used file at startup failed or was cancelled, starts a new file instead.
+        """
+        self.stop_data_file_loader()
+        if self.change_log.file_path is None:
+            self.new()
+
+    def stop_data_file_loader(self):
+        """
+        Tears down the background loader, its thread and its progress dialog, if one is running.
+        """
+        if self.data_file_loader is not None:
+            self.load_progress_dialog.close()
+            self.load_thread.quit()
+            self.load_thread.wait()
+            self.data_file_loader = None
 
     def new(self):
         """
         Resets the application to a new state, clearing historical data and any associated file path references.
         """
-        self.full_history_data = []
+        self.full_history_data = TradeStore()
+        self.reset_positions()
 
         self.save_last_used_file_path("")
         self.load_changes_with_prompt()
@@ -294,26 +435,86 @@ class MainWindow(QMainWindow):
 
     def save_as(self):
         """
-        Prompts the user to select a file path and saves the current data to the specified JSON file.
+        Prompts the user to select a file path and saves the current data to the specified file.
         """
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save JSON File", "", "JSON files (*.json)")
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save File", "", DATA_FILE_FILTER)
         if file_path:
             self.save_data(file_path)
 
-    def save_data(self, file_path):
+    def export_json(self):
+        """
+        Prompts the user to select a file path and exports the current data, including unsaved changes, to a JSON file. The change log and the current file are left untouched.
+        """
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export JSON File", "", JSON_FILE_FILTER)
+        if file_path:
+            try:
+                write_json_data_file(file_path, self.change_log.apply_pending(self.full_history_data))
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Error exporting file: {e}")
+
+    def import_csv(self):
         """
-        Saves the current application data to a specified file path in JSON format, handling exceptions and updating the application title with the new file path.
+        Prompts the user to select an exchange export, reads its trades with a cancellable progress dialog, then asks for confirmation before recording them as a single batch change. Invalid rows and trades imported before are reported and skipped.
         """
-        self.check_data_file_version(file_path)
+        file_path, _ = QFileDialog.getOpenFileName(self, "Import CSV File", "", CSV_FILE_FILTER)
+        if not file_path:
+            return
+
+        progress_dialog = QProgressDialog(f"Importing {os.path.basename(file_path)}...", "Cancel", 0, 100, self)
+        progress_dialog.setWindowTitle("Importing")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def report_progress(done, total):
+            progress_dialog.setValue(int(done * 100 / total) if total else 0)
+            QApplication.processEvents()
 
         try:
-            with open(file_path, 'w') as file:
-                processed_history = self.change_log.process(self.file_path, self.full_history_data, True)
-                data = {"version": DATA_FILE_VERSION, "data": processed_history}
-                json.dump(data, file, indent=2, cls=DecimalEncoder)
-                self.full_history_data = processed_history
-                self.save_last_used_file_path(file_path)
-                self.update_title()
+            result = read_csv_file(file_path, load_csv_layouts(), self.current_history, report_progress, progress_dialog.wasCanceled)
+        except Exception as e:
+            if not progress_dialog.wasCanceled():
+                QMessageBox.critical(self, "Error", f"Error importing file: {e}")
+            return
+        finally:
+            progress_dialog.close()
+
+        message = f"{len(result.trades)} trades read from the {result.layout} export."
+        if result.duplicates:
+            message += f"\n{result.duplicates} trades were already imported and are skipped."
+        if result.errors:
+            message += f"\n{len(result.errors)} invalid rows are skipped:\n"
+            message += "\n".join(f"Line {line_number}: {error}" for line_number, error in result.errors[:IMPORT_ERRORS_SHOWN])
+            if len(result.errors) > IMPORT_ERRORS_SHOWN:
+                message += "\n..."
+
+        if not result.trades:
+            QMessageBox.information(self, "Import CSV", message)
+            return
+
+        response = QMessageBox.question(self, "Import CSV", message + "\n\nImport them?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if response == QMessageBox.StandardButton.Yes:
+            self.change_log.add_batch(self.file_path, result.trades)
+            self.update_data()
+            self.update_title()
+
+    def save_data(self, file_path):
+        """
+        Saves the current application data to a specified file path in the binary format, migrating JSON files, or to an SQLite file where only the pending changes are written, handling exceptions and updating the application title with the new file path.
+        """
+        try:
+            with INSTRUMENTATION.stage('save_data', file=os.path.basename(file_path)):
+                # Only mark the changes as applied once the file was written successfully
+                processed_history = self.change_log.process(self.file_path, self.full_history_data)
+                write_data_file(file_path, processed_history, self.file_path, self.change_log.pending())
+                # Committed under the saved path, so a save as moves the change log to the new file right away
+                self.change_log.commit(file_path)
+                # The saved trades become the new base, the only time the pending changes are copied into it
+                self.full_history_data = processed_history.materialize()
+                self.current_history = TradeOverlay(self.full_history_data)
+                self.change_log.compact()
+            self.save_last_used_file_path(file_path)
+            self.update_title()
+            self.update_debug_readout()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Error saving file: {e}")
 
@@ -332,8 +533,10 @@ class MainWindow(QMainWindow):
         trade_dialog = AddTradeDialog(self, selected_pair)
         if trade_dialog.exec():
             new_data = trade_dialog.new_data
-            for data in new_data:
-                self.change_log.add(self.file_path, 'add', None, data)
+            # All rows are written at once and undone together
+            with self.change_log.transaction(self.file_path):
+                for data in new_data:
+                    self.change_log.add(self.file_path, 'add', None, data)
             self.update_data()
 
         self.update_title()
@@ -342,20 +545,16 @@ class MainWindow(QMainWindow):
         """
         Opens a dialog to edit a selected trade, updates the change log if changes are made, and refreshes the displayed data and title.
         """
-        selected_items = self.history_table.selectedItems()
-        if not selected_items:
+        if not self.history_table.selectionModel().hasSelection():
             return
-        selected_row = self.history_table.currentRow()
-        trade_data = [self.history_table.item(selected_row, col).text() for col in range(self.history_table.columnCount())]
+        trade_data = self.get_trade_from_index(self.history_table.currentIndex())
 
-        trade_dialog = EditTradeDialog(trade_data[:-1], self.get_trade_id_from_row(selected_row), self)
-        trade_data[3] = Decimal(trade_data[3])
-        trade_data[4] = Decimal(trade_data[4])
+        trade_dialog = EditTradeDialog(trade_data, self)
 
         if trade_dialog.exec():
             edited_data = trade_dialog.new_data
-            if edited_data and edited_data[1:] != trade_data[:-1]:
-                self.change_log.add(self.file_path, 'edit', [edited_data[0]] + trade_data[:-1], edited_data)
+            if edited_data and edited_data != trade_data:
+                self.change_log.add(self.file_path, 'edit', trade_data, edited_data)
                 self.update_data()
 
         self.update_title()
@@ -368,126 +567,83 @@ class MainWindow(QMainWindow):
         if selected_rows:
             response = QMessageBox.question(self, "Delete Confirmation", "Are you sure you want to delete the selected trade(s)?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if response == QMessageBox.StandardButton.Yes:
-                for model_index in selected_rows:
-                    row = model_index.row()
-                    trade_id = self.get_trade_id_from_row(row)
-                    if trade_id is not None:
-                        pair_item = self.history_table.item(row, 0)
-                        side_item = self.history_table.item(row, 1)
-                        date_item = self.history_table.item(row, 2)
-                        quantity_item = self.history_table.item(row, 3)
-                        price_item = self.history_table.item(row, 4)
-
-                        # Convert quantity and price back to Decimal
-                        quantity = Decimal(quantity_item.text())
-                        price = Decimal(price_item.text())
-
-                        original_data = [trade_id, pair_item.text(), side_item.text(), date_item.text(), quantity, price]
-
-                        self.change_log.add(self.file_path, 'delete', original_data, None)
+                # Resolve every trade before logging, the model changes once update_data runs
+                original_data = [self.get_trade_from_index(model_index) for model_index in selected_rows]
+                # All trades are written at once and undone together
+                with self.change_log.transaction(self.file_path):
+                    for data in original_data:
+                        self.change_log.add(self.file_path, 'delete', data, None)
 
                 self.update_data()
 
         self.update_title()
 
-    def add_history_row(self, row):
+    def update_history(self, history_data):
         """
-        Inserts a new row into the trade history table, including calculated trade value and color-coding based on the trade type, while also storing the trade's UUID.
+        Synchronizes the trade history model with the provided data, letting it notify the view about the rows that were added, edited or removed.
         """
-        value = (Decimal(row[4]) * Decimal(row[5])).quantize(decimal_places, ROUND_HALF_UP)
-
-        table_row = self.history_table.rowCount()
-        self.history_table.insertRow(table_row)
-
-        # Determine the color based on the 'Side' value
-        row_color = green if row[2] == 'Buy' else red if row[2] == 'Sell' else None
-
-        # Insert cells, skipping UUID
-        for col_index in range(1, 7):  # Adjust for skipping UUID and include Value
-            if col_index in (4, 5):  # Quantity or Price
-                item = DecimalTableWidgetItem(row[col_index])
-            elif col_index == 6:  # Value, calculated
-                item = DecimalTableWidgetItem(value)
-            else:
-                item = QTableWidgetItem(str(row[col_index]))
-
-            if row_color:
-                item.setBackground(row_color)
-
-            # If this is the first column, store the UUID
-            if col_index == 1:
-                item.setData(UUIDRole, row[0])
+        with INSTRUMENTATION.stage('update_history', trades=len(history_data)):
+            self.history_model.set_trades(history_data)
 
-            self.history_table.setItem(table_row, col_index - 1, item)
-
-    def update_history(self, history_data):
+    def update_positions(self, history_data):
         """
-        Clears and repopulates the trade history table with provided data, temporarily disabling sorting to improve performance.
+        Updates the positions table from the provided trade history. The positions engine only replays the pairs touched by added, edited or deleted trades, and only their rows are rewritten. Full loads of large files are computed in bulk by the vectorized backend when NumPy is installed.
         """
-        self.history_table.setSortingEnabled(False)
-        self.history_table.setRowCount(0)
-
-        for row in history_data:
-            self.add_history_row(row)
-
-        self.filter_table(self.history_table, self.history_filter_text_box.text())
-        self.history_table.setSortingEnabled(True)
+        with INSTRUMENTATION.stage('update_positions', trades=len(history_data)) as details:
+            changed_pairs = self.positions_engine.sync(history_data)
+            details['pairs'] = len(changed_pairs)
+            self.update_position_rows(changed_pairs)
 
-    def update_positions(self, history_data):
+    def update_position_rows(self, changed_pairs):
         """
-        Updates the positions table by calculating and displaying the accumulated quantity, average price, total value, and total profit/loss for each trading pair based on the provided trade history.
+        Rewrites the positions table rows of the given pairs from the positions engine, adding and removing rows as pairs are opened or closed out.
         """
+        if not changed_pairs:
+            return
+
         self.positions_table.setSortingEnabled(False)
-        self.positions_table.setRowCount(0)  # Clear existing rows
-
-        # Sort self.full_history_data by date (date is at index 3)
-        sorted_history_data = sorted(history_data, key=lambda x: datetime.strptime(x[3], '%Y-%m-%d'))
-
-        history = {}
-
-        for row in sorted_history_data:
-            # Assuming the format is [trade_id, pair, side, date, quantity, price]
-            _, pair, side, _, quantity, price = row
-            quantity = Decimal(str(quantity))
-            price = Decimal(str(price))
-
-            if pair not in history:
-                history[pair] = {'trades': [], 'total_pnl': Decimal('0'), 'total_quantity': Decimal('0'), 'total_value': Decimal('0')}
-
-            # Accumulate quantity and value for buy trades to calculate average buy price
-            if side.lower() == 'buy':
-                history[pair]['total_quantity'] += quantity
-                history[pair]['total_value'] += quantity * price
-            elif side.lower() == 'sell' and history[pair]['total_quantity'] > 0:
-                # Calculate PnL based on the difference from the average buy price
-                average_buy_price = (history[pair]['total_value'] / history[pair]['total_quantity']).quantize(decimal_places, ROUND_HALF_UP)
-                pnl = ((price - average_buy_price) * quantity).quantize(decimal_places, ROUND_HALF_UP)
-                history[pair]['total_pnl'] += pnl
-                # Adjust total quantity and value after sell
-                history[pair]['total_quantity'] -= quantity
-                # Optionally adjust total_value if you want to track value after sells
-                history[pair]['total_value'] -= quantity * average_buy_price
-
-        for pair, info in history.items():
-            row_position = self.positions_table.rowCount()
-            self.positions_table.insertRow(row_position)
-
-            if info['total_quantity'] > Decimal('0'):
-                average_price = info['total_value'] / info['total_quantity']
-                values = [pair, info['total_quantity'].quantize(decimal_places, ROUND_HALF_UP), average_price.quantize(decimal_places, ROUND_HALF_UP), info['total_value'].quantize(decimal_places, ROUND_HALF_UP), info['total_pnl']]
-            else:
-                values = [pair, '-', '-', '-', info['total_pnl']]
-
-            for col, value in enumerate(values):
-                if col in [1, 2, 3, 4] and value != '-':
+
+        rows = {}
+        for row in range(self.positions_table.rowCount()):
+            rows[self.positions_table.item(row, 0).text()] = row
+
+        # Remove closed out pairs, bottom-up so the remaining row numbers stay valid
+        removed_rows = [rows[pair] for pair in changed_pairs if pair in rows and self.positions_engine.position(pair) is None]
+        for row in sorted(removed_rows, reverse=True):
+            self.positions_table.removeRow(row)
+        if removed_rows:
+            rows = {self.positions_table.item(row, 0).text(): row for row in range(self.positions_table.rowCount())}
+
+        for pair in changed_pairs:
+            position = self.positions_engine.position(pair)
+            if position is None:
+                continue
+
+            row_position = rows.get(pair)
+            if row_position is None:
+                row_position = self.positions_table.rowCount()
+                self.positions_table.insertRow(row_position)
+                self.positions_table.setItem(row_position, 0, QTableWidgetItem(pair))
+
+            for col, value in enumerate(position, start=1):
+                if value != '-':
                     item = DecimalTableWidgetItem(value)
                 else:
                     item = QTableWidgetItem(str(value))
                 self.positions_table.setItem(row_position, col, item)
 
+        self.positions_filter_index = FilterIndex(self.positions_table.item(row, 0).text() for row in range(self.positions_table.rowCount()))
         self.filter_table(self.positions_table, self.positions_filter_text_box.text(), self.hide_closed_positions_checkbox.isChecked())
         self.positions_table.setSortingEnabled(True)
 
+    def reset_positions(self):
+        """
+        Clears the positions table and the engine's running totals, so the next update recomputes every pair from scratch.
+        """
+        self.positions_engine.reset()
+        self.positions_table.setRowCount(0)
+        self.positions_filter_index = FilterIndex()
+
     def save_last_used_file_path(self, file_path):
         """
         Stores the last used file path in the application settings for future access.
@@ -498,14 +654,14 @@ class MainWindow(QMainWindow):
 
     def load_last_used_file(self):
         """
-        Loads data from the last used file path if available, otherwise prompts for changes, and updates the application's data and title accordingly.
+        Loads data from the last used file path if available, in the background, otherwise prompts for changes, and updates the application's data and title accordingly.
         """
         if self.file_path:
             self.load_data(self.file_path)
         else:
             self.load_changes_with_prompt()
-        self.update_data()
-        self.update_title()
+            self.update_data()
+            self.update_title()
 
     def load_changes_with_prompt(self):
         """
@@ -528,30 +684,33 @@ class MainWindow(QMainWindow):
 
     def filter_table(self, table_widget, filter_text, hide_closed=False):
         """
-        Filters the rows of a given table widget based on a text filter and an option to hide rows with closed positions.
+        Filters the rows of a given table widget based on a text filter and an option to hide rows with closed positions. The text is resolved to the matching pairs with the positions' filter index, and only rows whose visibility changes are touched, with updates disabled until all of them are.
         """
-        for row in range(table_widget.rowCount()):
-            item = table_widget.item(row, 0)
-            quantity_item = table_widget.item(row, 1)
+        with INSTRUMENTATION.stage('filter_table', rows=table_widget.rowCount()):
+            matching_pairs = None
+            if filter_text:
+                matching_pairs = self.positions_filter_index.match(filter_text)
+            table_widget.setUpdatesEnabled(False)
+            for row in range(table_widget.rowCount()):
+                item = table_widget.item(row, 0)
+                quantity_item = table_widget.item(row, 1)
 
-            show_row = True
-            if item:
-                if filter_text and filter_text.lower() not in item.text().lower():
-                    show_row = False
-                if hide_closed and quantity_item and quantity_item.text() == '-':
-                    show_row = False
+                show_row = True
+                if item:
+                    if matching_pairs is not None and item.text() not in matching_pairs:
+                        show_row = False
+                    if hide_closed and quantity_item and quantity_item.text() == '-':
+                        show_row = False
 
-            table_widget.setRowHidden(row, not show_row)
+                if table_widget.isRowHidden(row) == show_row:
+                    table_widget.setRowHidden(row, not show_row)
+            table_widget.setUpdatesEnabled(True)
 
-    def get_trade_id_from_row(self, row):
+    def get_trade_from_index(self, index):
         """
-        Retrieves the trade ID (UUID) stored in the first column of a specified row in the history table.
+        Retrieves the trade displayed at a given index of the history table, mapping it through the sort and filter proxy.
         """
-        # UUID is stored in the first column
-        item = self.history_table.item(row, 0)
-        if item:
-            return item.data(UUIDRole)
-        return None
+        return self.history_model.trade(self.history_proxy_model.mapToSource(index).row())
 
     def eventFilter(self, source, event):
         """
@@ -571,9 +730,29 @@ class MainWindow(QMainWindow):
         """
         Processes changes to the trade history, then updates both the history and positions tables with the processed data.
         """
-        processed_history = self.change_log.process(self.file_path, self.full_history_data)
-        self.update_history(processed_history)
-        self.update_positions(processed_history)
+        with INSTRUMENTATION.stage('update_data'):
+            processed_history = self.change_log.process(self.file_path, self.full_history_data)
+            self.update_history(processed_history)
+            self.update_positions(processed_history)
+            self.current_history = processed_history
+        self.update_debug_readout()
+
+    def apply_changes(self, changes):
+        """
+        Applies changes to the displayed trades, history rows and positions without processing the change log again, so undoing or redoing costs the size of the change rather than of the portfolio. Large changes, such as an import, refresh the tables from scratch instead.
+        """
+        if len(changes) > INCREMENTAL_CHANGES_LIMIT:
+            self.update_data()
+            return
+
+        with INSTRUMENTATION.stage('apply_changes', changes=len(changes)) as details:
+            # Replaying the pending changes costs their number, and puts trades back in the order processing them gives
+            self.current_history = self.change_log.apply_pending(self.full_history_data)
+            self.history_model.apply_changes(changes)
+            changed_pairs = self.positions_engine.apply_changes(changes, self.current_history)
+            details['pairs'] = len(changed_pairs)
+            self.update_position_rows(changed_pairs)
+        self.update_debug_readout()
 
     def update_title(self):
         """
@@ -606,6 +785,7 @@ class MainWindow(QMainWindow):
             elif response == QMessageBox.StandardButton.No:
                 self.change_log.clear_not_applied(self.file_path)
 
+        self.history_proxy_model.cancel_filter()
         self.write_settings()
         super().closeEvent(event)
 
@@ -625,6 +805,10 @@ class MainWindow(QMainWindow):
         """
         settings = QSettings(SETTINGS_FILE, QSettings.Format.IniFormat)
         self.file_path = settings.value("lastUsedFile")
+        # Opt-in structured log of the refresh timings, set instrumentationLog to a file path to enable it
+        INSTRUMENTATION.log_path = settings.value("instrumentationLog") or None
+        # Number of saved changes that can still be undone
+        self.change_log.history_size = int(settings.value("undoHistorySize", self.change_log.history_size))
         geometry = settings.value("geometry")
         if geometry:
             self.restoreGeometry(geometry)
@@ -634,15 +818,14 @@ class MainWindow(QMainWindow):
 
     def undo_last_change(self):
         """
-        Undoes the last change in the change log after confirmation, then updates the data and title to reflect this action.
+        Undoes the last change in the change log after confirmation, then applies its inverse to the data and updates the title to reflect this action.
         """
         last_change = self.change_log.get_last_to_undo()
         if last_change is not None:
             dialog = ConfirmChangeDialog(last_change, "undo")
 
             if dialog.get_result():
-                self.change_log.undo()
-                self.update_data()
+                self.apply_changes(self.change_log.undo(self.file_path))
                 self.update_title()
 
     def redo_next_change(self):
@@ -654,38 +837,9 @@ class MainWindow(QMainWindow):
             dialog = ConfirmChangeDialog(next_change, "redo")
 
             if dialog.get_result():
-                self.change_log.redo()
-                self.update_data()
+                self.apply_changes(self.change_log.redo(self.file_path))
                 self.update_title()
 
-    def check_data_file_version(self, file_path):
-        """
-        Checks and updates the version of the data file, ensuring compatibility or initializing the file if necessary, and handles version mismatch errors.
-        """
-        # Try to read the existing data
-        try:
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            # File doesn't exist, create a new structure
-            data = {}
-        except json.JSONDecodeError:
-            # File exists but is not valid JSON, start afresh
-            data = {}
-
-        # Check and update the version
-        if "version" not in data:
-            data["version"] = DATA_FILE_VERSION
-            with open(file_path, 'w') as file:
-                json.dump(data, file, indent=2, cls=DecimalEncoder)
-            return True
-        elif data["version"] == DATA_FILE_VERSION:
-            return True
-        else:
-            QMessageBox.critical(self, "Error", f"Wrong file version: {file_path} - {data["version"]} instead of {DATA_FILE_VERSION}")
-            return False
-            # Eventually add migration to future versions
-
     def help(self):
         """
         Displays a help dialog with instructions and keyboard shortcuts for the application.
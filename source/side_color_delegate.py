@@ -0,0 +1,32 @@
+from PyQt6.QtGui import QBrush
+from PyQt6.QtWidgets import QStyledItemDelegate
+
+from constants import red, green
+from core import BUY, SELL
+
+
+def side_color(side, neutral=None):
+    """
+    Returns the background color of a trade row for its side: green for 'Buy', red for 'Sell' and the neutral color otherwise.
+    """
+    return green if side == BUY else red if side == SELL else neutral
+
+
+class SideColorDelegate(QStyledItemDelegate):
+    def __init__(self, side_column, neutral=None, parent=None):
+        """
+        Initializes a delegate painting the background of each cell in the color of its row's side, read from the side column when the cell is painted. Rows without a side are painted in the neutral color, if any.
+        """
+        super().__init__(parent)
+        self.side_column = side_column
+        self.brushes = {BUY: QBrush(green), SELL: QBrush(red)}
+        self.neutral = None if neutral is None else QBrush(neutral)
+
+    def initStyleOption(self, option, index):
+        """
+        Fills the style option of a cell like the base class, then sets its background brush from the side of its row, so the model stores no color and only painted cells look up their side.
+        """
+        super().initStyleOption(option, index)
+        brush = self.brushes.get(index.siblingAtColumn(self.side_column).data(), self.neutral)
+        if brush is not None:
+            option.backgroundBrush = brush
@@ -0,0 +1,198 @@
+from decimal import ROUND_HALF_UP
+from operator import attrgetter, mul
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from constants import decimal_places
+from core import day_ordinal, decimal_sort_key, decimal_sort_keys
+
+UUIDRole = Qt.ItemDataRole.UserRole + 1
+
+HISTORY_HEADERS = ["Pair", "Side", "Date", "Quantity", "Price", "Value"]
+
+# Trade fields shown in the columns before Value
+HISTORY_FIELDS = ("pair", "side", "date", "quantity", "price")
+
+
+class TradeHistoryModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        """
+        Initializes the model with an empty trade list. Trades are only read when the view asks for a cell.
+        """
+        super().__init__(parent)
+        self.trades = []
+        self.values = []
+        # Row of each trade UUID, built on the first incremental change
+        self.rows = None
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Returns the number of trades in the model, or 0 for child indexes since the model is flat.
+        """
+        return 0 if parent.isValid() else len(self.trades)
+
+    def columnCount(self, parent=QModelIndex()):
+        """
+        Returns the number of displayed columns, or 0 for child indexes since the model is flat.
+        """
+        return 0 if parent.isValid() else len(HISTORY_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        """
+        Returns the column titles for the horizontal header and lets the base class handle everything else.
+        """
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return HISTORY_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        """
+        Returns the text or UUID of a cell, computed from the underlying trade only when the view requests it. Rows are colored by the view's delegate from the side column.
+        """
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        trade = self.trades[row]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self.value(row, index.column()))
+        if role == UUIDRole:
+            return trade.trade_id
+        return None
+
+    def value(self, row, column):
+        """
+        Returns the raw value of a cell: a Decimal for the numeric columns and a string otherwise, skipping the UUID.
+        """
+        if column == 5:  # Value, calculated and cached
+            value = self.values[row]
+            if value is None:
+                trade = self.trades[row]
+                value = (trade.quantity * trade.price).quantize(decimal_places, ROUND_HALF_UP)
+                self.values[row] = value
+            return value
+        value = getattr(self.trades[row], HISTORY_FIELDS[column])
+        return value if column in (3, 4) else str(value)
+
+    def sort_key(self, row, column):
+        """
+        Returns the sort key of a cell, ordered like its value but cheaper to compare: the day ordinal of dates, integer keys of the numeric columns, the value being keyed on the unrounded product of the quantity and price, and the string itself otherwise.
+        """
+        trade = self.trades[row]
+        if column == 2:
+            return day_ordinal(trade.date)
+        if column == 5:
+            return decimal_sort_key(trade.quantity * trade.price)
+        value = getattr(trade, HISTORY_FIELDS[column])
+        return decimal_sort_key(value) if column in (3, 4) else value
+
+    def sort_keys(self, column):
+        """
+        Returns the sort key of every row for a column, like sort_key, computed in bulk by builtins rather than with a Python call per row.
+        """
+        if column == 2:
+            return list(map(day_ordinal, map(attrgetter('date'), self.trades)))
+        if column == 5:
+            return decimal_sort_keys(map(mul, map(attrgetter('quantity'), self.trades), map(attrgetter('price'), self.trades)))
+        values = map(attrgetter(HISTORY_FIELDS[column]), self.trades)
+        return decimal_sort_keys(values) if column in (3, 4) else list(values)
+
+    def trade(self, row):
+        """
+        Returns the trade displayed at the given source row.
+        """
+        return self.trades[row]
+
+    def set_trades(self, trades):
+        """
+        Synchronizes the model with the given trades, matching them by UUID and emitting targeted remove, change and insert notifications instead of rebuilding the whole table.
+        """
+        new_trades = {trade.trade_id: trade for trade in trades}
+
+        # Nothing in common, a reset is cheaper than removing everything
+        if not any(trade.trade_id in new_trades for trade in self.trades):
+            self.beginResetModel()
+            self.trades = list(trades)
+            self.values = [None] * len(self.trades)
+            self.rows = None
+            self.endResetModel()
+            return
+
+        # Remove deleted trades, bottom-up so the rows moved into their place are kept
+        for row in reversed([row for row, trade in enumerate(self.trades) if trade.trade_id not in new_trades]):
+            self.remove_row(row)
+
+        # Replace edited trades in place
+        for row, trade in enumerate(self.trades):
+            new_trade = new_trades[trade.trade_id]
+            if new_trade is not trade and new_trade != trade:
+                self.trades[row] = new_trade
+                self.values[row] = None
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            else:
+                self.trades[row] = new_trade
+
+        # Append added trades
+        known_ids = {trade.trade_id for trade in self.trades}
+        added_trades = [trade for trade in trades if trade.trade_id not in known_ids]
+        if added_trades:
+            first = len(self.trades)
+            self.beginInsertRows(QModelIndex(), first, first + len(added_trades) - 1)
+            self.trades.extend(added_trades)
+            self.values.extend([None] * len(added_trades))
+            self.endInsertRows()
+            if self.rows is not None:
+                self.rows.update((trade.trade_id, row) for row, trade in enumerate(added_trades, start=first))
+
+    def apply_changes(self, changes):
+        """
+        Applies add, edit and delete changes in order, touching only their rows: added trades are appended, edited trades replaced in place and deleted trades replaced by the last row.
+        """
+        for change in changes:
+            change_type = change['change_type']
+            if change_type == 'delete' or change_type == 'edit':
+                row = self.row(change['original_data'].trade_id)
+            else:
+                row = self.row(change['new_data'].trade_id)
+
+            if change_type == 'delete':
+                if row is not None:
+                    self.remove_row(row)
+            elif row is not None:
+                self.trades[row] = change['new_data']
+                self.values[row] = None
+                self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+            elif change_type == 'add':
+                row = len(self.trades)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.trades.append(change['new_data'])
+                self.values.append(None)
+                self.endInsertRows()
+                self.rows[change['new_data'].trade_id] = row
+
+    def remove_row(self, row):
+        """
+        Removes a row by moving the last trade into it, then removing the last row, so no other row is renumbered. The order of the rows only matters for trades with equal values once sorted, which then keep a stable but arbitrary order.
+        """
+        last = len(self.trades) - 1
+        removed = self.trades[row]
+        if row != last:
+            self.trades[row] = self.trades[last]
+            self.values[row] = self.values[last]
+            if self.rows is not None:
+                self.rows[self.trades[row].trade_id] = row
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+        self.beginRemoveRows(QModelIndex(), last, last)
+        del self.trades[last]
+        del self.values[last]
+        self.endRemoveRows()
+        if self.rows is not None:
+            del self.rows[removed.trade_id]
+
+    def row(self, trade_id):
+        """
+        Returns the row of the trade with the given UUID, or None if it isn't in the model.
+        """
+        if self.rows is None:
+            self.rows = {trade.trade_id: row for row, trade in enumerate(self.trades)}
+        return self.rows.get(trade_id)
@@ -0,0 +1,377 @@
+from PyQt6.QtCore import Qt, QAbstractProxyModel, QModelIndex, QThread
+
+from core import FilterIndex, filter_rows, sort_order, INSTRUMENTATION
+from history_filter_worker import HistoryFilterWorker
+
+# Filtering more rows than this runs on a background thread, smaller histories are filtered right away
+FILTER_THREAD_THRESHOLD = 50000
+
+# Inserting more rows than this at once sorts the whole history again instead of placing each row
+PROXY_INSERT_LIMIT = 1000
+
+# Persistent indexes on up to this many rows, such as the current row and the ends of the selected ranges, are
+# followed after a layout change by searching the rows, more are looked up in a map of every row
+RELAYOUT_SEARCH_LIMIT = 16
+
+
+class TradeHistoryProxyModel(QAbstractProxyModel):
+    def __init__(self, parent=None):
+        """
+        Initializes the proxy used to sort and filter the trade history, filtering case-insensitively on the pair column. Rows are kept as lists of source rows in display order, so sorting and filtering replace a list in one go and single trades are placed by binary search, instead of Qt calling back into Python for every comparison or row.
+        """
+        super().__init__(parent)
+        self.sort_column = -1
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        # Sort value of every source row for the sort column, None when unsorted
+        self.keys = None
+        # Every source row in display order, and those accepted by the filter, the same list when not filtering
+        self.sorted_rows = []
+        self.rows = self.sorted_rows
+        # Proxy row of each source row, built when first needed
+        self.proxy_rows = None
+
+        self.filter_index = FilterIndex()
+        # Text and pairs the displayed rows were filtered with, the pairs being None when not filtering
+        self.filter_text = ''
+        self.filter_pairs = None
+        # Queries run on a background thread are numbered, only the result of the latest one is applied if the rows
+        # didn't change in the meantime
+        self.filter_generation = 0
+        self.filter_revision = 0
+        self.revision = 0
+        self.filter_thread = None
+        self.filter_worker = None
+
+    def setSourceModel(self, source_model):
+        """
+        Sets the trade history model to sort and filter, and follows its resets, removals, insertions and edits.
+        """
+        self.beginResetModel()
+        super().setSourceModel(source_model)
+        source_model.modelAboutToBeReset.connect(self.beginResetModel)
+        source_model.modelReset.connect(self.source_reset)
+        source_model.rowsAboutToBeRemoved.connect(self.source_rows_about_to_be_removed)
+        source_model.rowsRemoved.connect(self.source_rows_removed)
+        source_model.rowsInserted.connect(self.source_rows_inserted)
+        source_model.dataChanged.connect(self.source_data_changed)
+        self.source_reset()
+
+    def index(self, row, column, parent=QModelIndex()):
+        """
+        Returns the index of a displayed cell, or an invalid index outside of the table since the model is flat.
+        """
+        if parent.isValid() or not 0 <= row < len(self.rows) or not 0 <= column < self.columnCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        """
+        Returns an invalid index for every cell since the model is flat, or the parent object when called without an index.
+        """
+        if index is None:
+            return super().parent()
+        return QModelIndex()
+
+    def sibling(self, row, column, index):
+        """
+        Returns the index of another cell of the table.
+        """
+        return self.index(row, column)
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Returns the number of displayed trades, or 0 for child indexes since the model is flat.
+        """
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        """
+        Returns the number of columns of the source model, or 0 for child indexes since the model is flat.
+        """
+        return 0 if parent.isValid() or self.sourceModel() is None else self.sourceModel().columnCount()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        """
+        Returns the column titles of the source model, and the source row numbers for the vertical header.
+        """
+        if orientation == Qt.Orientation.Vertical and 0 <= section < len(self.rows):
+            section = self.rows[section]
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def mapToSource(self, proxy_index):
+        """
+        Returns the source index of a displayed cell.
+        """
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self.rows[proxy_index.row()], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        """
+        Returns the displayed index of a source cell, or an invalid index if its row is filtered out.
+        """
+        if not source_index.isValid():
+            return QModelIndex()
+        if self.proxy_rows is None:
+            self.proxy_rows = dict(zip(self.rows, range(len(self.rows))))
+        proxy_row = self.proxy_rows.get(source_index.row())
+        return QModelIndex() if proxy_row is None else self.index(proxy_row, source_index.column())
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """
+        Sorts the rows on a column's sort keys, computed in bulk once per row rather than once per comparison and kept while the column stays the same, so reversing the order only sorts again. Equal values keep the order of the source model, and a column of -1 restores it.
+        """
+        order = order if column >= 0 else Qt.SortOrder.AscendingOrder
+        # The rows are kept sorted as the source model changes, and the view asks for the same sort more than once
+        if column == self.sort_column and order == self.sort_order:
+            return
+        if column != self.sort_column:
+            self.keys = None
+        self.sort_column = column
+        self.sort_order = order
+        self.revision += 1
+        self.relayout(self.rebuild)
+
+    def set_filter_text(self, text, background=True):
+        """
+        Only shows the trades whose pair contains the text, case-insensitively, or every trade if the text is empty. The text is first resolved to the matching pairs with the filter index, then large histories are filtered on a background thread unless background is False, a newer filter cancelling the query in progress.
+        """
+        self.cancel_filter()
+        pairs = self.filter_index.match(text) if text else None
+
+        # Narrowing the filter only needs to look at the rows shown so far
+        rows = self.rows if pairs is not None and self.filter_pairs is not None and pairs <= self.filter_pairs else self.sorted_rows
+        if pairs is None or not background or len(rows) < FILTER_THREAD_THRESHOLD:
+            self.apply_filter(text, pairs, self.sorted_rows if pairs is None else filter_rows(rows, self.sourceModel().trades, pairs))
+            return
+
+        self.filter_generation += 1
+        self.filter_revision = self.revision
+        self.filter_thread = QThread()
+        self.filter_worker = HistoryFilterWorker(self.filter_generation, text, list(rows), list(self.sourceModel().trades), pairs)
+        self.filter_worker.moveToThread(self.filter_thread)
+        self.filter_thread.started.connect(self.filter_worker.run)
+        self.filter_worker.filtered.connect(self.filter_finished)
+        self.filter_thread.start()
+
+    def filter_finished(self, generation, rows):
+        """
+        Applies the result of a background filter, unless a newer filter was set since. If the rows changed while it ran, the filter is run again.
+        """
+        if generation != self.filter_generation:
+            return
+        text, pairs = self.filter_worker.text, self.filter_worker.pairs
+        self.cancel_filter()
+        if self.filter_revision != self.revision:
+            self.set_filter_text(text)
+        else:
+            self.apply_filter(text, pairs, rows)
+
+    def cancel_filter(self):
+        """
+        Stops the background filter in progress, if any, and waits for its thread to finish. To be called before the proxy is destroyed.
+        """
+        if self.filter_thread is not None:
+            self.filter_worker.cancel()
+            self.filter_thread.quit()
+            self.filter_thread.wait()
+            self.filter_thread = None
+            self.filter_worker = None
+        self.filter_generation += 1
+
+    def apply_filter(self, text, pairs, rows):
+        """
+        Replaces the displayed rows with the filtered ones as a single layout change.
+        """
+        def update():
+            self.filter_text = text
+            self.filter_pairs = pairs
+            self.rows = rows
+
+        with INSTRUMENTATION.stage('filter_history', rows=len(rows)):
+            self.relayout(update)
+
+    def relayout(self, update):
+        """
+        Runs a function replacing the displayed rows between layout change notifications, moving the persistent indexes, such as the selection, along with their trades.
+        """
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        source_rows = [self.rows[index.row()] for index in persistent]
+        update()
+        self.proxy_rows = None
+        if persistent:
+            moved_rows = set(source_rows)
+            if len(moved_rows) > RELAYOUT_SEARCH_LIMIT:
+                positions = self.proxy_rows = dict(zip(self.rows, range(len(self.rows))))
+            else:
+                positions = {}
+                for row in moved_rows:
+                    try:
+                        positions[row] = self.rows.index(row)
+                    except ValueError:
+                        pass
+            self.changePersistentIndexList(persistent, [
+                self.index(positions[row], index.column()) if row in positions else QModelIndex()
+                for row, index in zip(source_rows, persistent)
+            ])
+        self.layoutChanged.emit()
+
+    def rebuild(self):
+        """
+        Sorts and filters all the rows, computing the sort values of every source row unless they are already known.
+        """
+        model = self.sourceModel()
+        count = model.rowCount()
+        if self.sort_column < 0:
+            self.keys = None
+            self.sorted_rows = list(range(count))
+        else:
+            if self.keys is None:
+                self.keys = model.sort_keys(self.sort_column)
+            self.sorted_rows = sort_order(self.keys, self.sort_order == Qt.SortOrder.DescendingOrder)
+        self.rows = self.sorted_rows if self.filter_pairs is None else filter_rows(self.sorted_rows, model.trades, self.filter_pairs)
+
+    def source_reset(self):
+        """
+        Indexes the pairs of the new trades, then sorts and filters them from scratch.
+        """
+        self.cancel_filter()
+        self.revision += 1
+        self.filter_index = FilterIndex({trade.pair for trade in self.sourceModel().trades})
+        self.filter_pairs = self.filter_index.match(self.filter_text) if self.filter_text else None
+        self.keys = None
+        self.rebuild()
+        self.proxy_rows = None
+        self.endResetModel()
+
+    def index_pair(self, pair):
+        """
+        Adds a pair to the filter index, and to the pairs of the current filter if it matches.
+        """
+        self.filter_index.add(pair)
+        if self.filter_pairs is not None and pair not in self.filter_pairs and self.filter_text.lower() in pair.lower():
+            self.filter_pairs.add(pair)
+
+    def key(self, row):
+        """
+        Returns the sort value of a source row, its number when unsorted.
+        """
+        return row if self.keys is None else self.keys[row]
+
+    def insertion_point(self, rows, row, key):
+        """
+        Returns the position of a source row with the given sort value in a list of rows in display order, by binary search. Rows with equal values are ordered by source row, so a row present in the list is found at its own position.
+        """
+        descending = self.sort_order == Qt.SortOrder.DescendingOrder
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = rows[middle]
+            other_key = self.key(other)
+            if other_key == key:
+                before = other < row
+            else:
+                before = other_key > key if descending else other_key < key
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def accepts(self, row):
+        """
+        Returns True if a source row passes the filter the displayed rows were computed with.
+        """
+        return self.filter_pairs is None or self.sourceModel().trades[row].pair in self.filter_pairs
+
+    def remove_source_row(self, row):
+        """
+        Removes a source row from the sorted rows and, with notifications, from the displayed rows, using its current sort value.
+        """
+        key = self.key(row)
+        if self.rows is not self.sorted_rows:
+            position = self.insertion_point(self.sorted_rows, row, key)
+            del self.sorted_rows[position]
+        position = self.insertion_point(self.rows, row, key)
+        if position < len(self.rows) and self.rows[position] == row:
+            self.beginRemoveRows(QModelIndex(), position, position)
+            del self.rows[position]
+            self.proxy_rows = None
+            self.endRemoveRows()
+
+    def insert_source_row(self, row):
+        """
+        Inserts a source row at its place in the sorted rows and, with notifications, in the displayed rows if it passes the filter.
+        """
+        key = self.key(row)
+        if self.rows is not self.sorted_rows:
+            self.sorted_rows.insert(self.insertion_point(self.sorted_rows, row, key), row)
+        if self.accepts(row):
+            position = self.insertion_point(self.rows, row, key)
+            self.beginInsertRows(QModelIndex(), position, position)
+            self.rows.insert(position, row)
+            self.proxy_rows = None
+            self.endInsertRows()
+
+    def source_rows_about_to_be_removed(self, parent, first, last):
+        """
+        Removes the rows about to be removed from the source model, while their sort values are still known.
+        """
+        self.revision += 1
+        for row in range(last, first - 1, -1):
+            self.remove_source_row(row)
+
+    def source_rows_removed(self, parent, first, last):
+        """
+        Drops the sort values of the removed source rows and renumbers the rows that followed them. The history model only removes its last rows, which needs no renumbering.
+        """
+        if self.keys is not None:
+            del self.keys[first:last + 1]
+        if first < self.sourceModel().rowCount():
+            count = last - first + 1
+            self.sorted_rows[:] = [row - count if row > last else row for row in self.sorted_rows]
+            if self.rows is not self.sorted_rows:
+                self.rows[:] = [row - count if row > last else row for row in self.rows]
+            self.proxy_rows = None
+
+    def source_rows_inserted(self, parent, first, last):
+        """
+        Places rows inserted in the source model at their sorted position, indexing new pairs. Large insertions sort every row again instead.
+        """
+        self.revision += 1
+        model = self.sourceModel()
+        for row in range(first, last + 1):
+            self.index_pair(model.trades[row].pair)
+
+        if last - first + 1 > PROXY_INSERT_LIMIT or first < model.rowCount() - (last - first + 1):
+            self.beginResetModel()
+            self.keys = None
+            self.rebuild()
+            self.proxy_rows = None
+            self.endResetModel()
+            return
+
+        for row in range(first, last + 1):
+            if self.keys is not None:
+                self.keys.append(model.sort_key(row, self.sort_column))
+            self.insert_source_row(row)
+
+    def source_data_changed(self, top_left, bottom_right, roles=()):
+        """
+        Forwards the edits of rows that keep their place, and moves the other edited rows to their new sorted position, or in or out of the displayed rows if their pair changed.
+        """
+        self.revision += 1
+        model = self.sourceModel()
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self.index_pair(model.trades[row].pair)
+            key = self.key(row)
+            new_key = key if self.keys is None else model.sort_key(row, self.sort_column)
+            position = self.insertion_point(self.rows, row, key)
+            if new_key == key and position < len(self.rows) and self.rows[position] == row and self.accepts(row):
+                self.dataChanged.emit(self.index(position, 0), self.index(position, self.columnCount() - 1))
+                continue
+            self.remove_source_row(row)
+            if self.keys is not None:
+                self.keys[row] = new_key
+            self.insert_source_row(row)
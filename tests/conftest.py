@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application runs from source/, its modules import each other and the core package from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source'))
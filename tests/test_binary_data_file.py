@@ -0,0 +1,91 @@
+import uuid
+import random
+from decimal import Decimal
+
+import pytest
+
+from core import Trade, TradeStore, read_data_file, write_data_file, generate_trades, DataFileVersionError
+from core.binary_data_file import BINARY_MAGIC, HEADER, BinaryFormatUnsupported, write_binary_data_file
+
+
+def values(trades):
+    """
+    Returns trades as lists of their fields' representations, so amounts equal in value but not in representation differ.
+    """
+    return [list(map(repr, trade)) for trade in trades]
+
+
+def magic(file_path):
+    """
+    Returns the first bytes of a file.
+    """
+    with open(file_path, 'rb') as file:
+        return file.read(len(BINARY_MAGIC))
+
+
+def test_round_trip(tmp_path):
+    """
+    Checks a portfolio saved to the binary format reads back identical, down to the representation of every value.
+    """
+    trades = TradeStore(generate_trades(5000, seed=1))
+    file_path = str(tmp_path / 'trades.ctt')
+    write_data_file(file_path, trades)
+    assert magic(file_path) == BINARY_MAGIC
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+def test_canonical_values_round_trip(tmp_path):
+    """
+    Checks trailing zeros, exponents and unpadded dates read back the same from the binary format and from JSON, since trades store them in canonical form.
+    """
+    generator = random.Random(0)
+    trades = TradeStore(Trade(str(uuid.UUID(int=generator.getrandbits(128))), 'BTCUSDT', 'Buy', date, Decimal(quantity), Decimal(price))
+                        for date, quantity, price in [('2024-1-5', '1.50', '100.0'), ('2024-01-06', '1E+2', '0.00000010'), (' 2024-02-29 ', '-0', '20000')])
+    assert [trade.date for trade in trades] == ['2024-01-05', '2024-01-06', '2024-02-29']
+
+    for name in ('trades.ctt', 'trades.json'):
+        file_path = str(tmp_path / name)
+        write_data_file(file_path, trades)
+        assert values(read_data_file(file_path)) == values(trades)
+
+
+@pytest.mark.parametrize('trade', [
+    Trade('6f1c2e4a-1b2c-4d5e-8f90-123456789abc', 'BTCUSDT', 'Buy', '2024-01-01', Decimal('0.123456789'), Decimal('1')),
+    Trade('6f1c2e4a-1b2c-4d5e-8f90-123456789abc', 'BTCUSDT', 'Buy', '2024-01-01', Decimal('1E+12'), Decimal('1')),
+    Trade('6F1C2E4A-1B2C-4D5E-8F90-123456789ABC', 'BTCUSDT', 'Buy', '2024-01-01', Decimal('1'), Decimal('1')),
+    Trade('my-trade-1', 'BTCUSDT', 'Buy', '2024-01-01', Decimal('1'), Decimal('1')),
+    Trade('6f1c2e4a-1b2c-4d5e-8f90-123456789abc', 'BTCUSDT', 'Buy', 'yesterday', Decimal('1'), Decimal('1')),
+])
+def test_json_fallback(tmp_path, trade):
+    """
+    Checks trades the binary format can't hold make the writer raise BinaryFormatUnsupported before creating the file, and saving falls back to JSON, which reads them back unchanged.
+    """
+    trades = TradeStore([trade])
+    file_path = str(tmp_path / 'trades.ctt')
+    with pytest.raises(BinaryFormatUnsupported):
+        write_binary_data_file(file_path, trades)
+    assert not (tmp_path / 'trades.ctt').exists()
+
+    write_data_file(file_path, trades)
+    assert magic(file_path) == b'{\n  '
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+@pytest.mark.parametrize('name, binary', [('trades.ctt', True), ('trades', True), ('trades.json', False), ('trades.JSON', False)])
+def test_format_follows_extension(tmp_path, name, binary):
+    """
+    Checks paths named .json are saved as JSON and other paths in the binary format.
+    """
+    file_path = str(tmp_path / name)
+    write_data_file(file_path, TradeStore(generate_trades(10)))
+    assert (magic(file_path) == BINARY_MAGIC) == binary
+
+
+def test_newer_version_is_rejected(tmp_path):
+    """
+    Checks a binary file of a newer version raises DataFileVersionError.
+    """
+    file_path = tmp_path / 'trades.ctt'
+    file_path.write_bytes(HEADER.pack(BINARY_MAGIC, 3, 0, 0, 0))
+    with pytest.raises(DataFileVersionError):
+        read_data_file(str(file_path))
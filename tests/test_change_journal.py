@@ -0,0 +1,135 @@
+import os
+import random
+from decimal import Decimal
+
+import pytest
+
+from core import ChangeLog, Trade, TradeStore, BUY, SELL
+from core.change_journal import ChangeJournal
+
+DATA_FILE = 'trades.ctt'
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """
+    Runs every test in its own directory, where the change logs and journals are written.
+    """
+    monkeypatch.chdir(tmp_path)
+
+
+def plain(changes):
+    """
+    Returns changes with their trades as lists, including those held by batch changes, so they compare by value.
+    """
+    return [{key: value.to_list() if isinstance(value, Trade) else plain(value) if key == 'changes' else value for key, value in change.items()} for change in changes]
+
+
+def random_trade(generator, trade_id):
+    """
+    Returns a random trade with the given UUID.
+    """
+    return Trade(trade_id, generator.choice(('BTCUSDT', 'ETHUSDT')), generator.choice((BUY, SELL)), f"2024-01-{generator.randint(1, 28):02d}",
+                 Decimal(generator.randint(1, 10 ** 6)).scaleb(-4), Decimal(generator.randint(1, 10 ** 6)).scaleb(-2))
+
+
+def replayed(journal=None):
+    """
+    Returns the changes a new change log loads for the data file, from the change log file and the journal.
+    """
+    change_log = ChangeLog()
+    if journal is not None:
+        change_log.journal = journal
+    change_log.load(DATA_FILE)
+    return plain(change_log.changes)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_journal_replays_changes(seed):
+    """
+    Adds, edits and deletes trades, clears unsaved changes and saves at random, checking after every step that the journal replays to the changes in memory, compacted or not.
+    """
+    generator = random.Random(seed)
+    change_log = ChangeLog()
+    change_log.load(DATA_FILE)
+    base = TradeStore(random_trade(generator, f"base-{i}") for i in range(10))
+
+    for step in range(50):
+        trades = list(change_log.apply_pending(base))
+        action = generator.choice(('add', 'add', 'edit', 'delete', 'clear', 'save', 'compact'))
+        if action == 'add' or not trades:
+            change_log.add(DATA_FILE, 'add', None, random_trade(generator, f"trade-{step}"))
+        elif action == 'edit':
+            trade = generator.choice(trades)
+            change_log.add(DATA_FILE, 'edit', trade, trade.replace(price=trade.price + 1))
+        elif action == 'delete':
+            change_log.add(DATA_FILE, 'delete', generator.choice(trades), None)
+        elif action == 'clear':
+            change_log.clear_not_applied(DATA_FILE)
+        elif action == 'save':
+            base = change_log.process(DATA_FILE, base).materialize()
+            change_log.commit(DATA_FILE)
+        else:
+            change_log.compact(background=False)
+
+        assert replayed() == plain(change_log.changes)
+
+
+def test_append_cost_does_not_grow():
+    """
+    Checks every change appends a single line to the journal, however many changes were recorded before.
+    """
+    change_log = ChangeLog()
+    change_log.load(DATA_FILE)
+    generator = random.Random(0)
+    journal_file = change_log.journal.journal_file(DATA_FILE)
+
+    sizes = []
+    for i in range(200):
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, f"{i:04d}"))
+        sizes.append(os.path.getsize(journal_file))
+    growth = [after - before for before, after in zip(sizes, sizes[1:])]
+    assert max(growth) - min(growth) < 20
+    with open(journal_file) as file:
+        assert len(file.readlines()) == 200
+
+
+def test_background_compaction():
+    """
+    Checks a journal growing past its size threshold is compacted in the background into the change log file, without losing records appended meanwhile.
+    """
+    journal = ChangeJournal(compact_size=2000)
+    change_log = ChangeLog()
+    change_log.journal = journal
+    change_log.load(DATA_FILE)
+    generator = random.Random(0)
+
+    for i in range(100):
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, str(i)))
+    journal.wait()
+
+    # Appends made while a compaction runs don't start another one, so only part of the records may be folded
+    with open(journal.journal_file(DATA_FILE)) as file:
+        assert len(file.readlines()) < 100
+    assert os.path.exists(journal.log_file(DATA_FILE))
+    assert replayed(ChangeJournal()) == plain(change_log.changes)
+
+
+def test_truncated_record_is_skipped():
+    """
+    Checks a record left incomplete by an interrupted write is skipped, the records before it being replayed.
+    """
+    change_log = ChangeLog()
+    change_log.load(DATA_FILE)
+    generator = random.Random(0)
+    change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'a'))
+    expected = plain(change_log.changes)
+
+    change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'b'))
+    journal_file = change_log.journal.journal_file(DATA_FILE)
+    with open(journal_file) as file:
+        content = file.read()
+    with open(journal_file, 'w') as file:
+        file.write(content[:-10])
+
+    assert replayed() == expected
@@ -0,0 +1,262 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from core import ChangeLog, PositionsEngine, Trade, TradeStore, BUY, SELL
+
+DATA_FILE = 'trades.ctt'
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """
+    Runs every test in its own directory, where the change logs and journals are written.
+    """
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def change_log():
+    """
+    Returns a change log loaded for the data file, with no changes.
+    """
+    change_log = ChangeLog()
+    change_log.load(DATA_FILE)
+    return change_log
+
+
+def random_trade(generator, trade_id, pairs=('BTCUSDT', 'ETHUSDT'), days=28):
+    """
+    Returns a random trade with the given UUID, of one of the given pairs and dated within the given number of days.
+    """
+    return Trade(trade_id, generator.choice(pairs), generator.choice((BUY, SELL)), f"2024-01-{generator.randint(1, days):02d}",
+                 Decimal(generator.randint(1, 10 ** 6)).scaleb(-4), Decimal(generator.randint(1, 10 ** 6)).scaleb(-2))
+
+
+def journal_records(change_log):
+    """
+    Returns the number of records in the journal of the data file.
+    """
+    with open(change_log.journal.journal_file(DATA_FILE)) as file:
+        return len(file.readlines())
+
+
+def test_transaction_is_one_change(change_log):
+    """
+    Checks the changes of a transaction are written as a single journal record, recorded as one batch change and undone and redone as one unit.
+    """
+    generator = random.Random(0)
+    trades = [random_trade(generator, str(i)) for i in range(5)]
+    change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'before'))
+    records = journal_records(change_log)
+
+    with change_log.transaction(DATA_FILE):
+        for trade in trades:
+            change_log.add(DATA_FILE, 'add', None, trade)
+        assert journal_records(change_log) == records
+    assert journal_records(change_log) == records + 1
+    assert change_log.changes[-1]['change_type'] == 'batch'
+
+    undone = change_log.undo(DATA_FILE)
+    assert [(change['change_type'], change['original_data']) for change in undone] == [('delete', trade) for trade in reversed(trades)]
+    assert change_log.get_last_to_undo()['new_data'].trade_id == 'before'
+    assert [change['new_data'] for change in change_log.redo(DATA_FILE)] == trades
+    assert [trade.trade_id for trade in change_log.apply_pending(TradeStore())] == ['before'] + [trade.trade_id for trade in trades]
+
+
+def test_transaction_edge_cases(change_log):
+    """
+    Checks a transaction raising records nothing, an empty one records nothing, a single change is recorded as is and a nested transaction joins the outer one.
+    """
+    generator = random.Random(0)
+    with pytest.raises(ValueError):
+        with change_log.transaction(DATA_FILE):
+            change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'a'))
+            raise ValueError()
+    with change_log.transaction(DATA_FILE):
+        pass
+    assert change_log.changes == []
+
+    with change_log.transaction(DATA_FILE):
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'b'))
+    assert change_log.changes[-1]['change_type'] == 'add'
+
+    with change_log.transaction(DATA_FILE):
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'c'))
+        with change_log.transaction(DATA_FILE):
+            change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'd'))
+    assert len(change_log.changes) == 2
+    assert [change['new_data'].trade_id for change in change_log.changes[-1]['changes']] == ['c', 'd']
+
+
+def test_batch_survives_reload(change_log):
+    """
+    Checks a batch change replays from the journal with its trades, and that add_batch records a single change.
+    """
+    generator = random.Random(0)
+    trades = [random_trade(generator, str(i)) for i in range(3)]
+    change_log.add_batch(DATA_FILE, trades)
+
+    reloaded = ChangeLog()
+    reloaded.load(DATA_FILE)
+    assert len(reloaded.changes) == 1
+    assert [change['new_data'] for change in reloaded.changes[0]['changes']] == trades
+
+
+def contents(trades):
+    """
+    Returns trades as sorted lists. Undoing a delete adds the trade back after the others, where replaying the change log leaves it in place, so trades are compared regardless of order.
+    """
+    return sorted(trades.to_list())
+
+
+def plain(changes):
+    """
+    Returns changes with their trades as lists, including those held by batch changes, so they compare by value.
+    """
+    return [{key: value.to_list() if isinstance(value, Trade) else plain(value) if key == 'changes' else value for key, value in change.items()} for change in changes]
+
+
+def replayed():
+    """
+    Returns the changes a new change log loads for the data file, from the change log file and the journal.
+    """
+    change_log = ChangeLog()
+    change_log.load(DATA_FILE)
+    return plain(change_log.changes)
+
+
+def random_action(generator, change_log, trades, step, **trade_options):
+    """
+    Performs a random user action on the change log, as the main window does, added trades being drawn with the given options of random_trade. Undo and redo return the changes to apply to the current trades, other actions None, the trades being processed again.
+    """
+    action = generator.choice(('add', 'add', 'edit', 'delete', 'transaction', 'undo', 'undo', 'redo', 'redo'))
+    if action == 'undo':
+        return change_log.undo(DATA_FILE)
+    if action == 'redo':
+        return change_log.redo(DATA_FILE)
+    if action == 'add' or not trades:
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, f"trade-{step}", **trade_options))
+    elif action == 'edit':
+        trade = generator.choice(trades)
+        change_log.add(DATA_FILE, 'edit', trade, trade.replace(price=trade.price + 1))
+    elif action == 'delete':
+        change_log.add(DATA_FILE, 'delete', generator.choice(trades), None)
+    else:
+        with change_log.transaction(DATA_FILE):
+            for trade in generator.sample(trades, min(3, len(trades))):
+                change_log.add(DATA_FILE, 'delete', trade, None)
+            change_log.add(DATA_FILE, 'add', None, random_trade(generator, f"batch-{step}", **trade_options))
+    return None
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_undo_redo_matches_processing(seed):
+    """
+    Performs random actions, undos, redos and saves, checking after every step that applying the changes undo and redo return gives the same trades as processing the whole change log, and that the journal replays to the changes in memory.
+    """
+    generator = random.Random(seed)
+    change_log = ChangeLog(history_size=5)
+    change_log.load(DATA_FILE)
+    base = TradeStore(random_trade(generator, f"base-{i}") for i in range(20))
+    current = change_log.apply_pending(base)
+
+    for step in range(60):
+        if generator.random() < 0.1:
+            base = change_log.process(DATA_FILE, base).materialize()
+            change_log.commit(DATA_FILE)
+            current = change_log.apply_pending(base)
+        else:
+            changes = random_action(generator, change_log, list(current), step)
+            if changes is None:
+                current = change_log.apply_pending(base)
+            else:
+                ChangeLog.apply_changes(current, changes)
+
+        assert contents(current) == contents(change_log.apply_pending(base))
+        assert replayed() == plain(change_log.changes)
+
+
+def test_undo_redo_round_trip(change_log):
+    """
+    Undoes every change, including saved ones and a transaction, back to an empty history, then redoes them all, checking the trades after each step match those before the matching undo.
+    """
+    base = TradeStore()
+    generator = random.Random(0)
+
+    change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'a'))
+    change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'b'))
+    base = change_log.process(DATA_FILE, base).materialize()
+    change_log.commit(DATA_FILE)
+    with change_log.transaction(DATA_FILE):
+        change_log.add(DATA_FILE, 'delete', base.get('a'), None)
+        change_log.add(DATA_FILE, 'edit', base.get('b'), base.get('b').replace(quantity=Decimal('7')))
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'c'))
+    change_log.add(DATA_FILE, 'add', None, random_trade(generator, 'd'))
+
+    current = change_log.apply_pending(base)
+    states = []
+    while change_log.get_last_to_undo() is not None:
+        states.append(contents(current))
+        ChangeLog.apply_changes(current, change_log.undo(DATA_FILE))
+        assert contents(current) == contents(change_log.apply_pending(base))
+    assert contents(current) == []
+    assert replayed() == plain(change_log.changes)
+
+    while change_log.get_next_to_redo() is not None:
+        ChangeLog.apply_changes(current, change_log.redo(DATA_FILE))
+        assert contents(current) == states.pop()
+    assert states == []
+    assert replayed() == plain(change_log.changes)
+
+
+def test_history_size():
+    """
+    Checks only the last history_size saved changes can still be undone, after saving and after reloading the journal.
+    """
+    change_log = ChangeLog(history_size=3)
+    change_log.load(DATA_FILE)
+    generator = random.Random(0)
+    for i in range(6):
+        change_log.add(DATA_FILE, 'add', None, random_trade(generator, str(i)))
+    assert len(change_log.process(DATA_FILE, TradeStore(), True)) == 6
+
+    reloaded = ChangeLog(history_size=3)
+    reloaded.load(DATA_FILE)
+    for change_log in (change_log, reloaded):
+        undone = 0
+        while change_log.get_last_to_undo() is not None:
+            change_log.undo(DATA_FILE)
+            undone += 1
+        assert undone == 3
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_positions_after_undo_match_processing(seed):
+    """
+    Keeps a positions engine up to date like the main window, syncing processed trades after actions and saves and applying the changes undo and redo return, and checks it against an engine synced from scratch. Same-date trades of a single pair make the order in which deleted trades come back matter.
+    """
+    generator = random.Random(seed)
+    change_log = ChangeLog()
+    change_log.load(DATA_FILE)
+    base = TradeStore(random_trade(generator, f"base-{i}", ('ETHUSDT',), 1) for i in range(10))
+    engine = PositionsEngine('decimal')
+    engine.sync(change_log.process(DATA_FILE, base))
+
+    for step in range(40):
+        if generator.random() < 0.15:
+            base = change_log.process(DATA_FILE, base).materialize()
+            change_log.commit(DATA_FILE)
+            engine.sync(base)
+        else:
+            trades = list(change_log.apply_pending(base))
+            changes = random_action(generator, change_log, trades, step, pairs=('ETHUSDT',), days=1)
+            if changes is None:
+                engine.sync(change_log.process(DATA_FILE, base))
+            else:
+                engine.apply_changes(changes, change_log.apply_pending(base))
+
+        expected = PositionsEngine('decimal')
+        expected.sync(change_log.process(DATA_FILE, base))
+        assert engine.positions() == expected.positions()
@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+from core import TradeStore, read_data_file, write_data_file, write_json_data_file, generate_trades
+from core.compression import COMPRESSIONS, detect_compression, path_compression
+
+COMPRESSED_NAMES = [('trades.ctt.gz', 'gzip'), ('trades.ctt.bz2', 'bz2'), ('trades.ctt.xz', 'xz'), ('trades.json.gz', 'gzip'), ('trades.JSON.XZ', 'xz')]
+
+
+def values(trades):
+    """
+    Returns trades as lists of their fields' representations.
+    """
+    return [list(map(repr, trade)) for trade in trades]
+
+
+@pytest.mark.parametrize('compression', list(COMPRESSIONS))
+def test_detect_compression(compression):
+    """
+    Checks each compression is detected from its first bytes, leaving the file at its start.
+    """
+    module = COMPRESSIONS[compression][1]
+    file = io.BytesIO(module.compress(b'{"data": []}'))
+    assert detect_compression(file) == compression
+    assert file.tell() == 0
+    assert detect_compression(io.BytesIO(b'{"data": []}')) is None
+    assert detect_compression(io.BytesIO(b'')) is None
+
+
+@pytest.mark.parametrize('name, compression', COMPRESSED_NAMES)
+def test_round_trip(tmp_path, name, compression):
+    """
+    Checks saving to a path with a compression extension compresses the file, and that it reads back the same trades.
+    """
+    trades = TradeStore(generate_trades(2000))
+    file_path = str(tmp_path / name)
+    write_data_file(file_path, trades)
+    with open(file_path, 'rb') as file:
+        assert detect_compression(file) == compression
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+@pytest.mark.parametrize('compression', list(COMPRESSIONS))
+def test_compression_is_detected_from_content(tmp_path, compression):
+    """
+    Checks a compressed file without a compression extension is opened, and keeps its compression when saved over.
+    """
+    trades = TradeStore(generate_trades(100))
+    file_path = str(tmp_path / 'trades.ctt')
+    with open(file_path, 'wb') as file:
+        source = tmp_path / 'source.json'
+        write_json_data_file(str(source), trades)
+        file.write(COMPRESSIONS[compression][1].compress(source.read_bytes()))
+
+    assert values(read_data_file(file_path)) == values(trades)
+    assert path_compression(file_path) == compression
+    write_data_file(file_path, trades)
+    with open(file_path, 'rb') as file:
+        assert detect_compression(file) == compression
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+def test_progress_of_compressed_files(tmp_path):
+    """
+    Checks compressed files report their progress in compressed bytes, up to the size of the file.
+    """
+    file_path = tmp_path / 'trades.json.gz'
+    write_json_data_file(str(file_path), TradeStore(generate_trades(30000)))
+    progress = []
+    read_data_file(str(file_path), lambda done, total: progress.append((done, total)))
+    assert len(progress) > 2
+    assert progress[-1] == (file_path.stat().st_size, file_path.stat().st_size)
@@ -0,0 +1,177 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from core import read_csv_file, load_csv_layouts, CSVImportError, CSV_LAYOUTS, BUY, SELL
+from core.csv_importer import CSV_LAYOUTS_FILE
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """
+    Runs every test in its own directory, where a layouts file may be written.
+    """
+    monkeypatch.chdir(tmp_path)
+
+
+def write_csv(tmp_path, lines, name='export.csv', encoding='utf-8'):
+    """
+    Writes the given lines to a CSV file and returns its path.
+    """
+    file_path = str(tmp_path / name)
+    with open(file_path, 'w', newline='', encoding=encoding) as file:
+        file.write('\r\n'.join(lines) + '\r\n')
+    return file_path
+
+
+def fields(trade):
+    """
+    Returns the fields of a trade other than its UUID.
+    """
+    return trade.pair, trade.side, trade.date, trade.quantity, trade.price
+
+
+@pytest.mark.parametrize('layout, lines', [
+    ('Kraken', ['txid,ordertxid,pair,time,type,ordertype,price,cost,fee,vol',
+                'TX1,O1,XBT/USD,2024-01-05 10:00:00.1234,buy,limit,42000.5,21000.25,1,0.5',
+                'TX2,O2,XBT/USD,2024-01-06 11:00:00.5678,sell,limit,43000,10750,1,0.25']),
+    ('Coinbase', ['Trade ID,Product,Side,Created At,Size,Size Unit,Price,Fee',
+                  '17,XBT-USD,BUY,2024-01-05T10:00:00.000Z,0.5,BTC,42000.5,1',
+                  '18,XBT-USD,SELL,2024-01-06T11:00:00.000Z,0.25,BTC,43000,1']),
+    ('Binance', ['Date(UTC),Pair,Side,Price,Executed,Amount,Fee',
+                 '2024-01-05 10:00:00,XBTUSD,BUY,"42,000.50",0.5BTC,21000.25USDT,0.001BTC',
+                 '2024-01-06 11:00:00,XBTUSD,SELL,43000,0.25BTC,10750USDT,10.75USDT']),
+    ('Binance (legacy)', ['Date(UTC),Market,Type,Price,Amount,Total,Fee,Fee Coin',
+                          '2024-01-05 10:00:00,XBTUSD,BUY,42000.5,0.5,21000.25,0.001,BTC',
+                          '2024-01-06 11:00:00,XBTUSD,SELL,43000,0.25,10750,10.75,USDT']),
+    ('Generic', ['pair,side,date,quantity,price',
+                 'xbt_usd,Buy,2024-01-05,0.5,42000.5',
+                 'xbt_usd,Sell,2024-01-06,0.25,43000']),
+])
+def test_layout_detection(tmp_path, layout, lines):
+    """
+    Checks the layout of each supported exchange export is detected from its header and its rows read into the same trades, pairs being normalized and times dropped.
+    """
+    result = read_csv_file(write_csv(tmp_path, lines), CSV_LAYOUTS)
+    assert result.layout == layout
+    assert result.errors == []
+    assert [fields(trade) for trade in result.trades] == [('XBTUSD', BUY, '2024-01-05', Decimal('0.5'), Decimal('42000.5')),
+                                                          ('XBTUSD', SELL, '2024-01-06', Decimal('0.25'), Decimal('43000'))]
+
+
+def test_byte_order_mark_and_header_case(tmp_path):
+    """
+    Checks a byte order mark is dropped and header columns are matched regardless of case and surrounding spaces.
+    """
+    file_path = write_csv(tmp_path, [' PAIR , Side,DATE,Quantity ,price', 'BTCUSDT,buy,2024-01-05,1,100'], encoding='utf-8-sig')
+    result = read_csv_file(file_path, CSV_LAYOUTS)
+    assert result.layout == 'Generic'
+    assert [fields(trade) for trade in result.trades] == [('BTCUSDT', BUY, '2024-01-05', Decimal(1), Decimal(100))]
+
+
+def test_unknown_layout(tmp_path):
+    """
+    Checks a file whose header matches no layout, or with no header at all, is refused.
+    """
+    with pytest.raises(CSVImportError, match='Unknown CSV layout'):
+        read_csv_file(write_csv(tmp_path, ['when,what,how much', '2024-01-05,BTC,1']), CSV_LAYOUTS)
+    empty_path = str(tmp_path / 'empty.csv')
+    open(empty_path, 'w').close()
+    with pytest.raises(CSVImportError, match='empty'):
+        read_csv_file(empty_path, CSV_LAYOUTS)
+
+
+def test_invalid_rows_are_reported(tmp_path):
+    """
+    Checks invalid rows are reported with their line numbers and messages while the valid ones are still imported, blank lines being skipped.
+    """
+    lines = ['pair,side,date,quantity,price',
+             'BTCUSDT,Buy,2024-01-05,1,100',
+             'BTCUSDT,Hold,2024-01-05,1,100',
+             'BTCUSDT,Buy,2024-02-30,1,100',
+             ',Buy,2024-01-05,1,100',
+             'BTCUSDT,Buy,2024-01-05,abc,100',
+             'BTCUSDT,Buy,2024-01-05,1,-100',
+             'BTCUSDT,Buy,2024-01-05,0.000000001,100',
+             'BTCUSDT,Buy,2024-01-05',
+             ',,,,',
+             'BTCUSDT,Sell,2024-01-06,0.5,110']
+    result = read_csv_file(write_csv(tmp_path, lines), CSV_LAYOUTS)
+    assert [fields(trade) for trade in result.trades] == [('BTCUSDT', BUY, '2024-01-05', Decimal(1), Decimal(100)),
+                                                          ('BTCUSDT', SELL, '2024-01-06', Decimal('0.5'), Decimal(110))]
+    assert [line_number for line_number, _ in result.errors] == [3, 4, 5, 6, 7, 8, 9]
+    messages = [message for _, message in result.errors]
+    assert messages[0] == "Invalid side: 'Hold'"
+    assert messages[2] == "Pair cannot be empty"
+    assert messages[3] == "Invalid quantity: 'abc'"
+    assert messages[4] == "Invalid price: '-100'"
+    assert messages[5] == "Quantity has more than 8 decimals: '0.000000001'"
+    assert messages[6] == "Missing columns"
+
+
+@pytest.mark.parametrize('lines', [
+    ['txid,pair,time,type,vol,price', 'TX1,XBTUSD,2024-01-05,buy,1,100', 'TX2,XBTUSD,2024-01-05,buy,1,100'],
+    ['pair,side,date,quantity,price', 'BTCUSDT,Buy,2024-01-05,1,100', 'BTCUSDT,Buy,2024-01-05,1,100'],
+])
+def test_duplicates_on_reimport(tmp_path, lines):
+    """
+    Checks importing the same export twice yields the same UUIDs, so the second import only finds duplicates, while identical fills within an export without IDs are kept apart.
+    """
+    file_path = write_csv(tmp_path, lines)
+    first = read_csv_file(file_path, CSV_LAYOUTS)
+    assert len(first.trades) == 2 and first.duplicates == 0
+    assert len({trade.trade_id for trade in first.trades}) == 2
+
+    again = read_csv_file(file_path, CSV_LAYOUTS)
+    assert [trade.trade_id for trade in again.trades] == [trade.trade_id for trade in first.trades]
+
+    existing = {trade.trade_id for trade in first.trades}
+    second = read_csv_file(file_path, CSV_LAYOUTS, existing=existing)
+    assert second.trades == [] and second.duplicates == 2
+
+
+def test_repeated_ids_are_duplicates(tmp_path):
+    """
+    Checks a row repeating the exchange ID of an earlier row of the same export is counted as a duplicate.
+    """
+    lines = ['txid,pair,time,type,vol,price', 'TX1,XBTUSD,2024-01-05,buy,1,100', 'TX1,XBTUSD,2024-01-05,buy,1,100', 'TX2,XBTUSD,2024-01-06,sell,1,100']
+    result = read_csv_file(write_csv(tmp_path, lines), CSV_LAYOUTS)
+    assert len(result.trades) == 2 and result.duplicates == 1
+
+
+def test_custom_layouts(tmp_path):
+    """
+    Checks the layouts of the layouts file are tried before the built-in ones, which remain available.
+    """
+    custom = {'My exchange': {'id': 'ref', 'pair': 'symbol', 'side': 'direction', 'date': 'day', 'quantity': 'qty', 'price': 'rate'},
+              'Generic': {'pair': 'pair', 'side': 'side', 'date': 'date', 'quantity': 'quantity', 'price': 'price', 'id': 'fill'}}
+    with open(CSV_LAYOUTS_FILE, 'w') as file:
+        json.dump(custom, file)
+    layouts = load_csv_layouts()
+    assert list(layouts)[:2] == list(custom)
+    assert set(CSV_LAYOUTS) <= set(layouts)
+
+    result = read_csv_file(write_csv(tmp_path, ['ref,symbol,direction,day,qty,rate', 'R1,ETH/USDT,sell,2024-03-01,2,3000']))
+    assert result.layout == 'My exchange'
+    assert [fields(trade) for trade in result.trades] == [('ETHUSDT', SELL, '2024-03-01', Decimal(2), Decimal(3000))]
+
+    # The overridden Generic layout requires its fill column, so a plain generic export falls through to no layout
+    with pytest.raises(CSVImportError):
+        read_csv_file(write_csv(tmp_path, ['pair,side,date,quantity,price', 'BTCUSDT,Buy,2024-01-05,1,100'], name='generic.csv'))
+
+
+def test_progress_and_cancellation(tmp_path):
+    """
+    Checks progress is reported after each chunk, up to the file size, and cancelling stops the import.
+    """
+    file_path = write_csv(tmp_path, ['pair,side,date,quantity,price'] + [f'BTCUSDT,Buy,2024-01-05,{i},100' for i in range(1, 101)])
+    reports = []
+    result = read_csv_file(file_path, CSV_LAYOUTS, progress=lambda done, total: reports.append((done, total)), chunk_size=10)
+    assert len(result.trades) == 100
+    assert len(reports) == 10
+    assert [done for done, _ in reports] == sorted(done for done, _ in reports)
+    assert all(done <= total for done, total in reports)
+
+    with pytest.raises(CSVImportError, match='cancelled'):
+        read_csv_file(file_path, CSV_LAYOUTS, is_cancelled=lambda: True, chunk_size=10)
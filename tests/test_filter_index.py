@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from core import FilterIndex, FilterCancelled, filter_rows, TradeStore, generate_trades
+from core.filter_index import FILTER_NGRAM_SIZE
+
+PAIRS = ['BTCUSDT', 'ETHUSDT', 'ETHBTC', 'btcusdt', 'SOLUSDC', 'DOGEUSDT', 'XRPEUR', 'USDTTRY', 'BTCEUR', 'A', 'AB', 'ABC']
+
+
+def brute_force_match(pairs, text):
+    """
+    Returns the pair names containing the text case-insensitively, by comparing every one of them.
+    """
+    return {pair for pair in pairs if text.lower() in pair.lower()}
+
+
+def test_match_against_brute_force():
+    """
+    Checks every substring of the indexed pairs, in every case, and texts of no pair match the same pairs as a plain substring search, including texts shorter than the n-grams.
+    """
+    index = FilterIndex(PAIRS)
+    texts = {pair[start:end] for pair in PAIRS for start in range(len(pair)) for end in range(start, len(pair) + 1)}
+    texts |= {'', 'x', 'zzz', 'usdtx', 'BTCUSDTBTC', 'ethbtcusdt'}
+    for text in texts:
+        for variant in (text, text.lower(), text.upper(), text.swapcase()):
+            assert index.match(variant) == brute_force_match(PAIRS, variant), variant
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_match_against_brute_force(seed):
+    """
+    Checks random texts over a small alphabet, which share many n-grams with the pairs, match the same pairs as a plain substring search.
+    """
+    generator = random.Random(seed)
+    pairs = [''.join(generator.choice('abcABC') for _ in range(generator.randint(1, 8))) for _ in range(50)]
+    index = FilterIndex()
+    for pair in pairs:
+        index.add(pair)
+    for _ in range(500):
+        text = ''.join(generator.choice('abcAB') for _ in range(generator.randint(0, FILTER_NGRAM_SIZE + 3)))
+        assert index.match(text) == brute_force_match(pairs, text), text
+
+
+def test_pairs_differing_in_case():
+    """
+    Checks pair names differing only in case are all indexed and matched, and adding a pair twice changes nothing.
+    """
+    index = FilterIndex(['BTCUSDT', 'btcusdt'])
+    index.add('BTCUSDT')
+    assert 'BTCUSDT' in index and 'btcusdt' in index and 'BtcUsdt' not in index
+    assert index.match('cus') == {'BTCUSDT', 'btcusdt'}
+    assert index.pairs == {'btcusdt': {'BTCUSDT', 'btcusdt'}}
+
+
+def test_filter_rows():
+    """
+    Checks the rows kept are those whose trade is of one of the pairs, in the order given, whatever the chunk size.
+    """
+    trades = list(TradeStore(generate_trades(1000, seed=0)))
+    rows = list(range(len(trades)))
+    random.Random(0).shuffle(rows)
+    pairs = FilterIndex(trade.pair for trade in trades).match('ot')
+    expected = [row for row in rows if trades[row].pair in pairs]
+    assert expected and len(expected) < len(rows)
+    for chunk_size in (1, 7, 1000, 5000):
+        assert filter_rows(rows, trades, pairs, chunk_size=chunk_size) == expected
+    assert filter_rows(rows, trades, set()) == []
+
+
+def test_filter_rows_cancelled():
+    """
+    Checks cancelling raises FilterCancelled at the next chunk, rather than after all rows.
+    """
+    trades = list(TradeStore(generate_trades(100, seed=0)))
+    rows = list(range(len(trades)))
+    checks = []
+
+    def is_cancelled():
+        """
+        Cancels at the third check.
+        """
+        checks.append(True)
+        return len(checks) == 3
+
+    with pytest.raises(FilterCancelled):
+        filter_rows(rows, trades, {trade.pair for trade in trades}, is_cancelled, chunk_size=10)
+    assert len(checks) == 3
@@ -0,0 +1,145 @@
+import io
+import json
+import random
+from decimal import Decimal
+
+import pytest
+
+from core import read_data_file, LoadCancelled, DataFileVersionError
+from core.data_file import DataFileReader, read_data
+
+PAIRS = ['BTCUSDT', 'ETHUSDT', 'ÉTHÉR€', '比特币USDT']
+
+
+def random_rows(generator, count):
+    """
+    Returns random [trade_id, pair, side, date, quantity, price] rows, with non-ASCII pairs and numbers of varying length.
+    """
+    return [[f"id-{i}", generator.choice(PAIRS), generator.choice(('Buy', 'Sell')), f"2024-01-{generator.randint(1, 28):02d}",
+             str(generator.randint(1, 10 ** 12) / 10 ** generator.randint(0, 8)), str(generator.randint(1, 10 ** 6))] for i in range(count)]
+
+
+def stream(document, chunk_size):
+    """
+    Returns a reader over a document encoded in UTF-8, reading it chunk_size bytes at a time.
+    """
+    return DataFileReader(io.BytesIO(document.encode('utf-8')), chunk_size)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 65536])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_rows_match_json_load(chunk_size, indent):
+    """
+    Checks streaming a document yields the rows json.loads decodes, whatever the chunk size, values and multi-byte characters being split across chunks.
+    """
+    document = {'version': '1', 'data': random_rows(random.Random(chunk_size), 50), 'comment': 'after the data'}
+    reader = stream(json.dumps(document, indent=indent, ensure_ascii=False), chunk_size)
+    assert list(reader.rows()) == document['data']
+    assert reader.header == {'version': '1', 'comment': 'after the data'}
+
+
+@pytest.mark.parametrize('document', ['{}', '{"data": []}', ' { "data" : [ ] , "version" : "1" } ', '{"version": "1", "data": []}'])
+def test_empty_documents(document):
+    """
+    Checks documents without rows yield nothing.
+    """
+    assert list(stream(document, 4).rows()) == []
+
+
+def test_memory_is_bounded():
+    """
+    Checks the reader only holds about a chunk of the document at a time, however long the data array is.
+    """
+    document = json.dumps({'version': '1', 'data': random_rows(random.Random(0), 5000)})
+    reader = stream(document, 1024)
+    largest = 0
+    for _ in reader.rows():
+        largest = max(largest, len(reader.buffer))
+    assert largest < 2048 < len(document)
+
+
+@pytest.mark.parametrize('document', ['[]', '{"data": [1, 2', '{"version": "1" "data": []}'])
+def test_invalid_documents(document):
+    """
+    Checks documents that aren't a data file raise ValueError.
+    """
+    with pytest.raises(ValueError):
+        list(stream(document, 4).rows())
+
+
+def test_read_data_file(tmp_path):
+    """
+    Checks a JSON data file is read into trades with Decimal amounts, reporting its progress up to its size, and that a load can be cancelled.
+    """
+    rows = random_rows(random.Random(0), 25000)
+    file_path = tmp_path / 'trades.json'
+    file_path.write_text(json.dumps({'version': '1', 'data': rows}, indent=2, ensure_ascii=False), encoding='utf-8')
+
+    progress = []
+    store = read_data_file(str(file_path), lambda done, total: progress.append((done, total)))
+    assert [trade.trade_id for trade in store] == [row[0] for row in rows]
+    assert all(type(trade.quantity) is Decimal and trade.quantity == Decimal(row[4]) for trade, row in zip(store, rows))
+    assert progress[-1] == (file_path.stat().st_size, file_path.stat().st_size)
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+    with pytest.raises(LoadCancelled):
+        read_data_file(str(file_path), is_cancelled=lambda: True)
+
+
+class CountingFile(io.FileIO):
+    """
+    A file counting the bytes read from it.
+    """
+    bytes_read = 0
+
+    def read(self, size=-1):
+        """
+        Reads like FileIO.read, adding the size of what was read to bytes_read.
+        """
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_wrong_version_fails_before_rows(tmp_path):
+    """
+    Checks a wrong version at the start of the file raises DataFileVersionError before any row is decoded, the rows after it not even being valid JSON.
+    """
+    file_path = tmp_path / 'trades.json'
+    file_path.write_text('{"version": "9", "data": [not json at all')
+    with pytest.raises(DataFileVersionError):
+        read_data_file(str(file_path))
+
+
+@pytest.mark.parametrize('version, valid', [('1', True), ('2', True), ('9', False)])
+def test_version_after_data(tmp_path, version, valid):
+    """
+    Checks a version written after the data, as other tools may do, is still checked once the rows are read.
+    """
+    file_path = tmp_path / 'trades.json'
+    file_path.write_text(json.dumps({'data': random_rows(random.Random(0), 10), 'version': version}))
+    if valid:
+        assert len(read_data_file(str(file_path))) == 10
+    else:
+        with pytest.raises(DataFileVersionError):
+            read_data_file(str(file_path))
+
+
+def test_unversioned_file(tmp_path):
+    """
+    Checks files from before versioning, without a version, are read.
+    """
+    file_path = tmp_path / 'trades.json'
+    file_path.write_text(json.dumps({'data': random_rows(random.Random(0), 10)}))
+    assert len(read_data_file(str(file_path))) == 10
+
+
+def test_single_pass(tmp_path):
+    """
+    Checks checking the version and reading the rows reads the file only once.
+    """
+    file_path = tmp_path / 'trades.json'
+    file_path.write_text(json.dumps({'version': '1', 'data': random_rows(random.Random(0), 2000)}, indent=2, ensure_ascii=False), encoding='utf-8')
+    with CountingFile(str(file_path), 'rb') as file:
+        assert len(read_data(str(file_path), file, file)) == 2000
+        assert file.bytes_read < file_path.stat().st_size + 64
@@ -0,0 +1,141 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from core import PositionsEngine, Trade, BUY, SELL
+from core.vectorized_positions import batch_available
+
+# Amounts mostly on a coarse grid, so average prices and PnL regularly land exactly halfway between two 1e-8 units
+AMOUNTS = ['1', '2', '3', '0.5', '0.00000001', '0.00000003', '0.00000005', '1.5', '0.1']
+
+
+def random_amount(generator):
+    """
+    Returns a random amount with at most 8 decimals, often a small multiple of a grid value to produce rounding ties.
+    """
+    if generator.random() < 0.5:
+        return Decimal(generator.choice(AMOUNTS)) * generator.randint(1, 9)
+    return Decimal(generator.randint(1, 10 ** 10)).scaleb(-generator.randint(0, 8))
+
+
+def random_trades(generator, count, pair_count=4, days=20):
+    """
+    Returns random trades over a few pairs and few dates, so many trades share a date, and sells sometimes exceed the position held.
+    """
+    return [Trade(str(i), f"P{generator.randrange(pair_count)}", generator.choice((BUY, BUY, SELL)), f"2024-01-{generator.randint(1, days):02d}",
+                  random_amount(generator), random_amount(generator)) for i in range(count)]
+
+
+def displayed(engine):
+    """
+    Returns the engine's positions with their values as strings, so Decimals equal in value but not in representation differ.
+    """
+    return {pair: list(map(str, position)) for pair, position in engine.positions().items()}
+
+
+def decimal_positions(trades):
+    """
+    Returns the positions the Decimal path computes for the given trades.
+    """
+    engine = PositionsEngine('decimal')
+    engine.sync(trades)
+    return displayed(engine)
+
+
+@pytest.mark.parametrize('arithmetic', ['fixed', 'validate'])
+@pytest.mark.parametrize('seed', range(20))
+def test_random_portfolios_match_decimal(arithmetic, seed):
+    """
+    Loads random portfolios, then edits, deletes and adds trades, checking the positions against the Decimal path after every step.
+    """
+    generator = random.Random(seed)
+    trades = random_trades(generator, 200)
+    engine = PositionsEngine(arithmetic)
+    engine.sync(trades)
+    assert displayed(engine) == decimal_positions(trades)
+
+    for _ in range(10):
+        index = generator.randrange(len(trades))
+        trades[index] = trades[index].replace(quantity=random_amount(generator), date=f"2024-01-{generator.randint(1, 20):02d}")
+        del trades[generator.randrange(len(trades))]
+        trades.extend(random_trades(generator, 3))
+        trades[-3:] = [trade.replace(trade_id=f"new-{len(trades)}-{i}") for i, trade in enumerate(trades[-3:])]
+        engine.sync(trades)
+        assert displayed(engine) == decimal_positions(trades)
+
+
+def test_rounding_ties():
+    """
+    Checks average prices and PnL falling exactly halfway between two 1e-8 units round half-up like the Decimal path.
+    """
+    trades = [
+        Trade('1', 'A', BUY, '2024-01-01', Decimal('1'), Decimal('0.00000001')),
+        Trade('2', 'A', BUY, '2024-01-01', Decimal('1'), Decimal('0.00000002')),
+        Trade('3', 'A', SELL, '2024-01-02', Decimal('0.5'), Decimal('0.00000003')),
+        Trade('4', 'B', BUY, '2024-01-01', Decimal('0.5'), Decimal('0.00000001')),
+        Trade('5', 'B', SELL, '2024-01-02', Decimal('0.5'), Decimal('0.00000002')),
+    ]
+    engine = PositionsEngine('validate')
+    engine.sync(trades)
+    assert displayed(engine) == decimal_positions(trades)
+
+
+@pytest.mark.parametrize('quantity', [Decimal('0.123456789'), Decimal('12345678901.23456789')])
+def test_overflow_falls_back_to_decimal(quantity):
+    """
+    Checks a pair with more than 8 decimals, or amounts beyond the Decimal context precision, is replayed with Decimal and matches it, while other pairs stay on integers.
+    """
+    trades = [
+        Trade('1', 'A', BUY, '2024-01-01', Decimal('2'), Decimal('10.5')),
+        Trade('2', 'A', BUY, '2024-01-02', quantity, Decimal('12345.67891234')),
+        Trade('3', 'A', SELL, '2024-01-03', Decimal('1'), Decimal('11')),
+        Trade('4', 'B', BUY, '2024-01-01', Decimal('3'), Decimal('7')),
+    ]
+    engine = PositionsEngine('validate')
+    engine.sync(trades)
+    assert displayed(engine) == decimal_positions(trades)
+    assert not engine.pairs['A']['fixed']
+    assert engine.pairs['B']['fixed']
+
+
+@pytest.mark.skipif(not batch_available(), reason='NumPy is not installed')
+@pytest.mark.parametrize('arithmetic', ['fixed', 'validate'])
+@pytest.mark.parametrize('seed', range(5))
+def test_bulk_loads_match_decimal(arithmetic, seed):
+    """
+    Loads random portfolios through the vectorized backend, including a pair that overflows, then changes them incrementally, checking the positions against the Decimal path.
+    """
+    generator = random.Random(seed)
+    trades = random_trades(generator, 500)
+    trades.append(Trade('overflow', 'P0', BUY, '2024-01-05', Decimal('12345678901.23456789'), Decimal('12345.67891234')))
+    engine = PositionsEngine(arithmetic, batch_threshold=100)
+    engine.sync(trades)
+    assert displayed(engine) == decimal_positions(trades)
+    assert not engine.pairs['P0']['fixed']
+
+    del trades[generator.randrange(len(trades))]
+    trades.append(Trade('added', 'P1', SELL, '2024-01-03', Decimal('0.5'), Decimal('4')))
+    engine.sync(trades)
+    assert displayed(engine) == decimal_positions(trades)
+
+
+def test_apply_changes_matches_sync():
+    """
+    Checks applying add, edit and delete changes gives the same positions as syncing the resulting history.
+    """
+    generator = random.Random(0)
+    trades = random_trades(generator, 100)
+    engine = PositionsEngine('validate')
+    engine.sync(trades)
+
+    edited = trades[10].replace(price=Decimal('0.00000005'))
+    added = Trade('added', 'P2', BUY, '2024-01-01', Decimal('4'), Decimal('2.5'))
+    engine.apply_changes([
+        {'change_type': 'edit', 'original_data': trades[10], 'new_data': edited},
+        {'change_type': 'delete', 'original_data': trades[20], 'new_data': None},
+        {'change_type': 'add', 'original_data': None, 'new_data': added},
+    ])
+    trades[10] = edited
+    del trades[20]
+    assert displayed(engine) == decimal_positions(trades + [added])
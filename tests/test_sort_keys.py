@@ -0,0 +1,112 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from core import TradeStore, generate_trades, decimal_sort_key, decimal_sort_keys, sort_order
+from core import sort_keys
+from core.sort_keys import NUMPY_SORT_THRESHOLD
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def reference_order(keys, descending=False):
+    """
+    Returns the indexes of the keys in sorted order the way sort_order documents it, with sorted().
+    """
+    return sorted(range(len(keys)), key=keys.__getitem__, reverse=descending)
+
+
+def random_decimals(generator, count):
+    """
+    Returns random positive and negative Decimals of at most 8 decimals, many of them equal.
+    """
+    return [Decimal(generator.randint(-10 ** 6, 10 ** 6)).scaleb(-generator.randint(0, 8)) for _ in range(count)]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'sorted'])
+def numpy_installed(request, monkeypatch):
+    """
+    Runs a test with NumPy sorting large lists, when it is installed, and without it.
+    """
+    if request.param:
+        pytest.importorskip('numpy')
+    monkeypatch.setattr(sort_keys, 'NUMPY_INSTALLED', request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_decimal_sort_keys_order_like_values(seed):
+    """
+    Checks the keys of Decimals of at most 8 decimals are equal exactly when the values are and ordered like them, and the bulk keys are the same as the single ones.
+    """
+    generator = random.Random(seed)
+    values = random_decimals(generator, 2000)
+    keys = decimal_sort_keys(values)
+    assert keys == list(map(decimal_sort_key, values))
+    for _ in range(5000):
+        a, b = generator.randrange(len(values)), generator.randrange(len(values))
+        assert (keys[a] < keys[b]) == (values[a] < values[b])
+        assert (keys[a] == keys[b]) == (values[a] == values[b])
+
+
+def test_finer_decimals_keep_their_order():
+    """
+    Checks values finer than 1e-8 only ever compare equal, never in the wrong order, on both sides of zero.
+    """
+    values = sorted(Decimal(n).scaleb(-10) for n in range(-500, 500, 7))
+    keys = decimal_sort_keys(values)
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize('size', [10, NUMPY_SORT_THRESHOLD - 1, NUMPY_SORT_THRESHOLD, NUMPY_SORT_THRESHOLD * 2])
+@pytest.mark.parametrize('descending', [False, True])
+def test_sort_order_matches_sorted(numpy_installed, size, descending):
+    """
+    Checks the order of integer keys with many ties is the one of sorted() below and above the NumPy threshold, equal keys keeping the order of their indexes in both directions.
+    """
+    generator = random.Random(size)
+    keys = [generator.randint(-100, 100) for _ in range(size)]
+    assert sort_order(keys, descending) == reference_order(keys, descending)
+
+
+@pytest.mark.parametrize('extreme', [INT64_MIN, INT64_MAX, INT64_MIN - 1, INT64_MAX + 1, 10 ** 30])
+@pytest.mark.parametrize('descending', [False, True])
+def test_sort_order_extreme_keys(numpy_installed, extreme, descending):
+    """
+    Checks keys at or beyond the 64-bit range, including the smallest int64 that negating for a descending sort overflows, are still sorted like sorted() does.
+    """
+    generator = random.Random(0)
+    keys = [generator.randint(-10, 10) for _ in range(NUMPY_SORT_THRESHOLD)]
+    keys[generator.randrange(len(keys))] = extreme
+    keys[generator.randrange(len(keys))] = extreme
+    assert sort_order(keys, descending) == reference_order(keys, descending)
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_sort_order_other_keys(numpy_installed, descending):
+    """
+    Checks large lists of string keys, which NumPy doesn't sort, are sorted like sorted() does.
+    """
+    generator = random.Random(0)
+    keys = [generator.choice(['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'Buy', 'Sell']) for _ in range(NUMPY_SORT_THRESHOLD)]
+    assert sort_order(keys, descending) == reference_order(keys, descending)
+
+
+@pytest.mark.parametrize('column', range(6))
+@pytest.mark.parametrize('descending', [False, True])
+def test_history_sort_keys_order_like_values(column, descending):
+    """
+    Checks sorting the trade history on the keys of a column orders its rows like their displayed values, the bulk keys being the same as the single ones.
+    """
+    pytest.importorskip('PyQt6')
+    from trade_history_model import TradeHistoryModel
+
+    model = TradeHistoryModel()
+    model.set_trades(list(TradeStore(generate_trades(NUMPY_SORT_THRESHOLD + 1000, seed=column))))
+    keys = model.sort_keys(column)
+    assert keys == [model.sort_key(row, column) for row in range(model.rowCount())]
+
+    values = [model.value(row, column) for row in sort_order(keys, descending)]
+    assert values == sorted(values, reverse=descending)
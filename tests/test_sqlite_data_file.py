@@ -0,0 +1,160 @@
+import random
+import sqlite3
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from core import ChangeLog, Trade, TradeStore, read_data_file, write_data_file, generate_trades, BUY, SELL
+from core.sqlite_data_file import SQLITE_MAGIC, SQLITE_SCHEMA_VERSION, SQLiteDataFile
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    """
+    Runs every test in its own directory, where the change logs and journals are written.
+    """
+    monkeypatch.chdir(tmp_path)
+
+
+def values(trades):
+    """
+    Returns trades as lists of their fields' representations, so amounts equal in value but not in representation differ.
+    """
+    return [list(map(repr, trade)) for trade in trades]
+
+
+def sequences(file_path):
+    """
+    Returns the insertion sequence of every row of an SQLite data file, by trade UUID.
+    """
+    connection = sqlite3.connect(file_path)
+    try:
+        return dict(connection.execute("SELECT id, seq FROM trades"))
+    finally:
+        connection.close()
+
+
+def random_trade(generator, trade_id=None):
+    """
+    Returns a random trade, with a new UUID unless one is given.
+    """
+    return Trade(trade_id or str(uuid.UUID(int=generator.getrandbits(128))), generator.choice(('BTCUSDT', 'ETHUSDT')), generator.choice((BUY, SELL)),
+                 f"2024-01-{generator.randint(1, 28):02d}", Decimal(generator.randint(1, 10 ** 6)).scaleb(-4), Decimal(generator.randint(1, 10 ** 6)).scaleb(-2))
+
+
+def test_round_trip(tmp_path):
+    """
+    Checks a portfolio saved to an SQLite file reads back identical and in the same order.
+    """
+    trades = TradeStore(generate_trades(2000, seed=1))
+    file_path = str(tmp_path / 'trades.sqlite')
+    write_data_file(file_path, trades)
+    with open(file_path, 'rb') as file:
+        assert file.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+def test_save_as_replaces_all_trades(tmp_path):
+    """
+    Checks saving to an existing SQLite file from another file writes every trade rather than applying the changes on top of its rows.
+    """
+    file_path = str(tmp_path / 'trades.db')
+    write_data_file(file_path, TradeStore(generate_trades(100, seed=1)))
+    trades = TradeStore(generate_trades(50, seed=2))
+    write_data_file(file_path, trades, source_path=str(tmp_path / 'other.ctt'), changes=[])
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_save(tmp_path, seed):
+    """
+    Checks saving an SQLite file to itself only writes the pending changes, including the inverses of undone saved changes, leaving the other rows untouched and ending up with the trades the change log processes to.
+    """
+    generator = random.Random(seed)
+    file_path = str(tmp_path / 'trades.sqlite')
+    write_data_file(file_path, TradeStore(generate_trades(200, seed=seed)))
+    change_log = ChangeLog()
+    change_log.load(file_path)
+
+    for _ in range(3):
+        before = sequences(file_path)
+        original_data = read_data_file(file_path)
+        trade_ids = [trade.trade_id for trade in original_data]
+        touched = set()
+        for _ in range(20):
+            action = generator.random()
+            if action < 0.4 or not trade_ids:
+                trade = random_trade(generator)
+                change_log.add(file_path, 'add', new_data=trade)
+                trade_ids.append(trade.trade_id)
+            elif action < 0.7:
+                trade_id = trade_ids.pop(generator.randrange(len(trade_ids)))
+                change_log.add(file_path, 'delete', original_data=change_log.apply_pending(original_data).get(trade_id))
+            elif action < 0.9:
+                trade_id = generator.choice(trade_ids)
+                change_log.add(file_path, 'edit', original_data=change_log.apply_pending(original_data).get(trade_id), new_data=random_trade(generator, trade_id))
+            elif change_log.get_last_to_undo() is not None:
+                change_log.undo(file_path)
+                trade_ids = [trade.trade_id for trade in change_log.apply_pending(original_data)]
+        for change in change_log.pending():
+            touched.add((change['new_data'] or change['original_data']).trade_id)
+
+        processed_data = change_log.process(file_path, original_data)
+        # The trades themselves are not passed, so only the changes can bring the file up to date
+        write_data_file(file_path, [], source_path=file_path, changes=change_log.pending())
+        change_log.commit(file_path)
+
+        saved = read_data_file(file_path)
+        assert sorted(values(saved)) == sorted(values(processed_data))
+        after = sequences(file_path)
+        assert all(after[trade_id] == seq for trade_id, seq in before.items() if trade_id not in touched)
+
+
+def test_failed_incremental_save_is_rolled_back(tmp_path):
+    """
+    Checks the changes are applied in a single transaction, so a change failing to apply leaves the file as it was.
+    """
+    generator = random.Random(0)
+    file_path = str(tmp_path / 'trades.sqlite')
+    trades = TradeStore(generate_trades(10, seed=0))
+    write_data_file(file_path, trades)
+    first, second = list(trades)[:2]
+    changes = [{'change_type': 'delete', 'original_data': first, 'new_data': None},
+               {'change_type': 'add', 'original_data': None, 'new_data': random_trade(generator)},
+               {'change_type': 'edit', 'original_data': second, 'new_data': None}]
+    with pytest.raises(TypeError):
+        write_data_file(file_path, [], source_path=file_path, changes=changes)
+    assert values(read_data_file(file_path)) == values(trades)
+
+
+def test_newer_version_is_rejected(tmp_path):
+    """
+    Checks an SQLite file written by a newer version is refused rather than having its schema changed.
+    """
+    file_path = str(tmp_path / 'trades.sqlite')
+    write_data_file(file_path, TradeStore(generate_trades(10, seed=0)))
+    with sqlite3.connect(file_path) as connection:
+        connection.execute(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION + 1}")
+    connection.close()
+    with pytest.raises(ValueError, match='Wrong file version'):
+        SQLiteDataFile(file_path)
+    with pytest.raises(ValueError, match='Wrong file version'):
+        read_data_file(file_path)
+
+
+def test_unused_indexes_are_dropped(tmp_path):
+    """
+    Checks the pair and date indexes of older files are dropped when they are opened.
+    """
+    file_path = str(tmp_path / 'trades.sqlite')
+    write_data_file(file_path, TradeStore(generate_trades(10, seed=0)))
+    with sqlite3.connect(file_path) as connection:
+        connection.execute("CREATE INDEX trades_pair_date ON trades (pair, date)")
+        connection.execute("CREATE INDEX trades_date ON trades (date)")
+    connection.close()
+    SQLiteDataFile(file_path).close()
+    with sqlite3.connect(file_path) as connection:
+        indexes = [name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'trades_%'")]
+    connection.close()
+    assert indexes == []
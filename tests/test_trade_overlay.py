@@ -0,0 +1,118 @@
+import random
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from core import Trade, TradeStore, TradeOverlay, generate_trades, BUY, SELL
+
+
+def random_trade(generator, trade_id=None):
+    """
+    Returns a random trade, with a new UUID unless one is given.
+    """
+    return Trade(trade_id or str(uuid.UUID(int=generator.getrandbits(128))), generator.choice(('BTCUSDT', 'ETHUSDT')), generator.choice((BUY, SELL)),
+                 f"2024-01-{generator.randint(1, 28):02d}", Decimal(generator.randint(1, 10 ** 6)).scaleb(-4), Decimal(generator.randint(1, 10 ** 6)).scaleb(-2))
+
+
+def random_changes(generator, trade_ids, count):
+    """
+    Yields random (method, argument) operations on trades with the given UUIDs or new ones, adding back, replacing and removing trades whether or not they are still there.
+    """
+    trade_ids = list(trade_ids)
+    for _ in range(count):
+        action = generator.random()
+        if action < 0.3:
+            trade = random_trade(generator)
+            trade_ids.append(trade.trade_id)
+            yield 'add', trade
+        elif action < 0.45:
+            yield 'add', random_trade(generator, generator.choice(trade_ids))
+        elif action < 0.7:
+            yield 'replace', random_trade(generator, generator.choice(trade_ids))
+        else:
+            yield 'remove', generator.choice(trade_ids)
+
+
+def check_same(overlay, store, trade_ids):
+    """
+    Checks a view holds the same trades as a store, in the same order, and answers the same lookups for the given UUIDs.
+    """
+    assert list(overlay) == list(store)
+    assert len(overlay) == len(store)
+    assert overlay.to_list() == store.to_list()
+    for trade_id in trade_ids:
+        assert (trade_id in overlay) == (trade_id in store)
+        assert overlay.get(trade_id) == store.get(trade_id)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_matches_trade_store(seed):
+    """
+    Checks a view applying random adds, edits and deletes iterates in the order of a store applying the same changes, without touching its base.
+    """
+    generator = random.Random(seed)
+    base = TradeStore(generate_trades(200, seed=seed))
+    base_trades = list(base)
+    store = base.copy()
+    overlay = TradeOverlay(base)
+    trade_ids = [trade.trade_id for trade in base]
+    for method, argument in random_changes(generator, trade_ids, 300):
+        getattr(store, method)(argument)
+        getattr(overlay, method)(argument)
+        if isinstance(argument, Trade) and argument.trade_id not in trade_ids:
+            trade_ids.append(argument.trade_id)
+    check_same(overlay, store, trade_ids + ['unknown'])
+    assert list(base) == base_trades
+    for trade_id in trade_ids:
+        assert overlay.in_base(trade_id) == (trade_id in base and trade_id in store and trade_id not in overlay.added)
+
+
+def test_deleted_trade_added_again_goes_last():
+    """
+    Checks a base trade deleted then added again moves after every other trade, as it does in a store, and is no longer in the base.
+    """
+    trades = list(generate_trades(5, seed=0))
+    overlay = TradeOverlay(trades)
+    overlay.remove(trades[1].trade_id)
+    edited = Trade(trades[1].trade_id, 'ETHUSDT', SELL, '2024-02-01', Decimal(1), Decimal(2))
+    overlay.replace(edited)
+    assert trades[1].trade_id not in overlay
+    overlay.add(edited)
+    assert list(overlay) == [trades[0], trades[2], trades[3], trades[4], edited]
+    assert not overlay.in_base(trades[1].trade_id)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_copy_is_independent(seed):
+    """
+    Checks changes to a copy of a view leave the view as it was, both sharing the same base.
+    """
+    generator = random.Random(seed)
+    base = TradeStore(generate_trades(100, seed=seed))
+    overlay = TradeOverlay(base)
+    for method, argument in random_changes(generator, [trade.trade_id for trade in base], 50):
+        getattr(overlay, method)(argument)
+    before = list(overlay)
+    copy = overlay.copy()
+    assert copy.base is base and list(copy) == before
+    for method, argument in random_changes(generator, [trade.trade_id for trade in copy], 50):
+        getattr(copy, method)(argument)
+    assert list(overlay) == before
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_materialize(seed):
+    """
+    Checks materializing a view applies its changes to the base in place, in the view's order, and leaves the view empty on top of it.
+    """
+    generator = random.Random(seed)
+    base = TradeStore(generate_trades(100, seed=seed))
+    overlay = TradeOverlay(base)
+    for method, argument in random_changes(generator, [trade.trade_id for trade in base], 100):
+        getattr(overlay, method)(argument)
+    expected = list(overlay)
+    assert overlay.materialize() is base
+    assert list(base) == expected
+    assert list(overlay) == expected
+    assert not overlay.edited and not overlay.deleted and len(overlay.added) == 0